@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the per-msg overhead of the two ``Channel`` receive
+paths: async iterating the channel (which resumes two nested async
+generators per msg) vs. the batched ``Channel.recv_batch()`` loop used
+by the actor msg loop.
+"""
+import time
+
+import msgpack
+import trio
+from tractor._ipc import Channel
+
+
+N = 200_000
+MSG = {'cid': '1', 'yield': 10}
+
+
+async def send_all(stream: trio.SocketStream, n: int) -> None:
+    # pre-encoded such that (mostly) only receiving is measured
+    frames = msgpack.packb(MSG) * 1000
+    for _ in range(n // 1000):
+        await stream.send_all(frames)
+    await stream.send_all(msgpack.packb(None))
+
+
+async def recv_iter(chan: Channel) -> int:
+    count = 0
+    async for msg in chan:
+        if msg is None:
+            break
+        count += 1
+    return count
+
+
+async def recv_batched(chan: Channel) -> int:
+    count = 0
+    while True:
+        for msg in await chan.recv_batch():
+            if msg is None:
+                return count
+            count += 1
+
+
+async def bench(recv, n: int = N) -> float:
+    """Return the mean ns spent receiving each of ``n`` msgs.
+    """
+    listeners = await trio.open_tcp_listeners(0, host='127.0.0.1')
+    listener = listeners[0]
+    port = listener.socket.getsockname()[1]
+    async with listener:
+        client = await trio.open_tcp_stream('127.0.0.1', port)
+        server = Channel(stream=await listener.accept())
+        async with client, trio.open_nursery() as n_:
+            start = time.perf_counter_ns()
+            n_.start_soon(send_all, client, n)
+            assert await recv(server) == n
+            took = time.perf_counter_ns() - start
+
+        await server.aclose()
+
+    return took / n
+
+
+async def main():
+    for name, recv in [
+        ('async for msg in chan', recv_iter),
+        ('chan.recv_batch()', recv_batched),
+    ]:
+        # best of a few runs
+        ns = min([await bench(recv) for _ in range(3)])
+        print(f'{name:<24} {ns:8.1f} ns/msg')
+
+
+if __name__ == '__main__':
+    trio.run(main)
@@ -0,0 +1,58 @@
+"""
+Benchmark of the per actor startup time and memory (max RSS) cost
+along with which of the (optional) heavy deps a plain subactor imports.
+
+Pass a spawn method (eg. ``zygote``) as the first argument to compare
+spawning backends.
+"""
+import resource
+import sys
+
+import trio
+import tractor
+
+
+N = 8
+
+# only imported on demand (eg. in debug mode or when arrays are sent)
+HEAVY_MODULES = ['pdbpp', 'pygments', 'colorlog', 'msgpack_numpy', 'numpy']
+
+
+def footprint():
+    """Return this actor's max RSS (KiB) and the heavy modules it
+    imported.
+    """
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        [mod for mod in HEAVY_MODULES if mod in sys.modules],
+    )
+
+
+async def main(start_method=None):
+    async with tractor.open_nursery(start_method=start_method) as n:
+        portals = []
+        for i in range(N):
+            # one at a time such that actors don't compete for cpu
+            portals += await n.start_actors(
+                [f'actor_{i}'], enable_modules=[__name__])
+
+        footprints = [await p.run(footprint) for p in portals]
+        timings = list(n.spawn_timings.values())
+        await n.cancel()
+
+    def mean(values):
+        values = list(values)
+        return sum(values) / len(values)
+
+    for phase in ('exec', 'connect', 'load', 'register', 'total'):
+        ms = mean(getattr(t, phase) for t in timings) * 1000
+        print(f'{phase:<10} {ms:8.1f} ms/actor')
+
+    rss = mean(rss for rss, _ in footprints)
+    imported = set().union(*(mods for _, mods in footprints))
+    print(f'{"max rss":<10} {rss:8.0f} KiB/actor')
+    print(f'{"imported":<10} {sorted(imported)}')
+
+
+if __name__ == '__main__':
+    trio.run(main, *sys.argv[1:])
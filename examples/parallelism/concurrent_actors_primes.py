@@ -9,14 +9,11 @@ is ``tractor``'s channels.
 
 """
 from contextlib import asynccontextmanager
-from typing import List, Callable
-import itertools
 import math
 import time
 
 import tractor
 import trio
-from async_generator import aclosing
 
 
 PRIMES = [
@@ -56,8 +53,6 @@ async def worker_pool(workers=4):
     async with tractor.open_nursery() as tn:
 
         portals = []
-        snd_chan, recv_chan = trio.open_memory_channel(len(PRIMES))
-
         for i in range(workers):
 
             # this starts a new sub-actor (process + trio runtime) and
@@ -69,31 +64,9 @@ async def worker_pool(workers=4):
                 )
             )
 
-        async def _map(
-            worker_func: Callable[[int], bool],
-            sequence: List[int]
-        ) -> List[bool]:
-
-            # define an async (local) task to collect results from workers
-            async def send_result(func, value, portal):
-                await snd_chan.send((value, await portal.run(func, n=value)))
-
-            async with trio.open_nursery() as n:
-
-                for value, portal in zip(sequence, itertools.cycle(portals)):
-                    n.start_soon(
-                        send_result,
-                        worker_func,
-                        value,
-                        portal
-                    )
-
-                # deliver results as they arrive
-                for _ in range(len(sequence)):
-                    yield await recv_chan.receive()
-
-        # deliver the parallel "worker mapper" to user code
-        yield _map
+        # deliver the parallel "worker mapper" to user code; jobs are
+        # always sent to the least busy worker
+        yield tractor.PortalGroup(portals)
 
         # tear down all "workers" on pool close
         await tn.cancel()
@@ -101,14 +74,16 @@ async def worker_pool(workers=4):
 
 async def main():
 
-    async with worker_pool() as actor_map:
+    async with worker_pool() as group:
 
         start = time.time()
 
-        async with aclosing(actor_map(is_prime, PRIMES)) as results:
-            async for number, prime in results:
+        # results are delivered in input order
+        numbers = iter(PRIMES)
+        async with group.imap(is_prime, PRIMES, key='n') as results:
+            async for prime in results:
 
-                print(f'{number} is prime: {prime}')
+                print(f'{next(numbers)} is prime: {prime}')
 
         print(f'processing took {time.time() - start} seconds')
 
@@ -44,6 +44,7 @@ setup(
         'colorlog',
         'wrapt',
         'trio_typing',
+        'outcome',
         'pdbpp',
     ],
     tests_require=['pytest'],
@@ -67,7 +67,7 @@ def pytest_configure(config):
 
     if backend == 'mp':
         tractor._spawn.try_set_start_method('spawn')
-    elif backend == 'trio':
+    elif backend in ('trio', 'zygote'):
         tractor._spawn.try_set_start_method(backend)
 
 
@@ -101,7 +101,7 @@ def pytest_generate_tests(metafunc):
     if not spawn_backend:
         # XXX some weird windows bug with `pytest`?
         spawn_backend = 'mp'
-    assert spawn_backend in ('mp', 'trio')
+    assert spawn_backend in ('mp', 'trio', 'zygote')
 
     if 'start_method' in metafunc.fixturenames:
         if spawn_backend == 'mp':
@@ -112,8 +112,8 @@ def pytest_generate_tests(metafunc):
                 # removing XXX: the fork method is in general
                 # incompatible with trio's global scheduler state
                 methods.remove('fork')
-        elif spawn_backend == 'trio':
-            methods = ['trio']
+        elif spawn_backend in ('trio', 'zygote'):
+            methods = [spawn_backend]
 
         metafunc.parametrize("start_method", methods, scope='module')
 
@@ -91,6 +91,48 @@ async def test_trynamic_trio(func, start_method, arb_addr):
         print("CUTTTT CUUTT CUT!!?! Donny!! You're supposed to say...")
 
 
+async def say_hello_thrice(other_actor):
+    chans = set()
+    for _ in range(3):
+        async with tractor.find_actor(other_actor) as portal:
+            assert await portal.run(hi) == the_line.format(other_actor)
+            chans.add(portal.channel)
+
+    return len(chans), tractor.current_actor().state_stats()['pooled_conns']
+
+
+async def pooled_conns():
+    return tractor.current_actor().state_stats()['pooled_conns']
+
+
+@tractor_test
+async def test_lookups_reuse_connections(arb_addr):
+    """Repeated lookups of an actor go through a single (pooled)
+    connection with each user getting its own portal.
+    """
+    async with tractor.open_nursery() as n:
+        gretchen = await n.start_actor(
+            'gretchen', enable_modules=[__name__])
+        donny = await n.start_actor('donny', enable_modules=[__name__])
+
+        # the connection used to register isn't kept around
+        assert await gretchen.run(pooled_conns) == 0
+
+        # one connection to gretchen and one to the arbiter (us)
+        assert await donny.run(
+            say_hello_thrice, other_actor='gretchen') == (1, 2)
+
+        # every user gets its own portal through the shared channel
+        async with tractor.find_actor('gretchen') as portal:
+            assert await portal.run(hi) == the_line.format('gretchen')
+
+            async with tractor.find_actor('gretchen') as other:
+                assert other is not portal
+                assert other.channel is portal.channel
+
+        await n.cancel()
+
+
 async def stream_forever():
     for i in itertools.count():
         yield i
@@ -0,0 +1,81 @@
+"""
+Scatter/gather calls across a ``tractor.PortalGroup``.
+"""
+import time
+
+import pytest
+import tractor
+import trio
+
+
+async def sleep_for(delay):
+    await trio.sleep(delay)
+    return delay
+
+
+async def fail_on(i):
+    if i == 3:
+        raise ValueError(i)
+    return i
+
+
+def test_map_balances_skewed_load(arb_addr):
+    """Calls are sent to the least loaded actor such that a few long
+    jobs don't hold up the short ones queued behind them (as they would
+    with round-robin dispatch).
+    """
+    # round-robin would queue every long job on the first actor
+    delays = [0.5, 0.1] * 4
+
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portals = [
+                await n.start_actor(f'worker_{i}', enable_modules=[__name__])
+                for i in range(2)
+            ]
+            group = tractor.PortalGroup(portals, max_outstanding=1)
+
+            start = time.time()
+            assert await group.map(sleep_for, delays, key='delay') == delays
+            assert time.time() - start < 1.6
+            assert set(group.load.values()) == {0}
+
+            await n.cancel()
+
+    trio.run(main)
+
+
+@pytest.mark.parametrize('chunksize', [1, 3])
+def test_imap_ordering(arb_addr, chunksize):
+    delays = [0.3, 0.2, 0.1, 0, 0.25, 0.05]
+
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portals = [
+                await n.start_actor(f'worker_{i}', enable_modules=[__name__])
+                for i in range(2)
+            ]
+            group = tractor.PortalGroup(portals, max_outstanding=10)
+            calls = [{'delay': d} for d in delays]
+
+            async with group.imap(
+                sleep_for, calls, chunksize=chunksize,
+            ) as results:
+                assert [r async for r in results] == delays
+
+            async with group.imap_unordered(
+                sleep_for, calls, chunksize=chunksize,
+            ) as results:
+                unordered = [r async for r in results]
+            assert sorted(unordered) == sorted(delays)
+            if chunksize == 1:
+                assert unordered == sorted(delays)
+
+            with pytest.raises(tractor.RemoteActorError) as err:
+                await group.map(
+                    fail_on, range(6), key='i', chunksize=chunksize)
+            assert err.value.type is ValueError
+
+            await n.cancel()
+
+    trio.run(main)
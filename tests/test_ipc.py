@@ -0,0 +1,553 @@
+"""
+Transport (``MsgpackStream``/``Channel``) level tests.
+"""
+from contextlib import asynccontextmanager
+import socket
+import struct
+
+import pytest
+import trio
+import tractor
+from tractor._ipc import (
+    Channel,
+    MsgpackStream,
+    _min_read,
+    _max_read,
+    _oob_threshold,
+    _uds_enabled,
+    _proto_version,
+    decode_compact,
+    encode_compact,
+    pack_envelope,
+    uds_path,
+)
+from tractor._shm import RingBuffer, ShmStream, _shm_supported
+
+
+@asynccontextmanager
+async def stream_pair():
+    """Deliver a connected pair of ``MsgpackStream``s over loopback tcp.
+    """
+    listeners = await trio.open_tcp_listeners(0, host='127.0.0.1')
+    listener = listeners[0]
+    port = listener.socket.getsockname()[1]
+    async with listener:
+        client = await trio.open_tcp_stream('127.0.0.1', port)
+        server = await listener.accept()
+        async with client, server:
+            yield MsgpackStream(client), MsgpackStream(server)
+
+
+@pytest.mark.trio
+async def test_adaptive_read_size_grows_under_load():
+    """Sending large items should grow the receive read size and all
+    items should be tracked by the receive stats.
+    """
+    payload = b'x' * 2**20
+    count = 4
+
+    async with stream_pair() as (tx, rx):
+        assert rx.stats.read_size == _min_read
+
+        async def send():
+            for _ in range(count):
+                await tx.send(payload)
+
+        async with trio.open_nursery() as n:
+            n.start_soon(send)
+            for _ in range(count):
+                assert await rx.recv() == payload
+
+        stats = rx.stats
+        assert stats.msgs_received == count
+        assert stats.bytes_received > count * len(payload)
+        assert _min_read < stats.read_size <= _max_read
+        assert stats.reads < count * len(payload) / _min_read
+
+
+@pytest.mark.trio
+async def test_small_msgs_keep_small_reads():
+    async with stream_pair() as (tx, rx):
+        for i in range(10):
+            await tx.send({'yield': i, 'cid': 'doggy'})
+            assert (await rx.recv())['yield'] == i
+
+        assert rx.stats.msgs_received == 10
+        assert rx.stats.read_size == _min_read
+
+
+@pytest.mark.trio
+async def test_enveloped_send():
+    """Items sent with a pre-encoded envelope arrive as the full msg.
+    """
+    envelope = pack_envelope('doggy')
+    async with stream_pair() as (tx, rx):
+        for item in (10, 'ten', {'ten': (10,)}, None):
+            await tx.send(item, envelope=envelope)
+            assert await rx.recv() == {'yield': item, 'cid': 'doggy'}
+
+
+@pytest.mark.parametrize(
+    'msg',
+    [
+        {'cmd': ('ns', 'func', {'x': 10}, ('doggy', 'uuid'), 1)},
+        {'functype': 'asyncgen', 'cid': 1},
+        {'yield': {'ten': (10,)}, 'cid': 2},
+        {'stop': True, 'cid': 3},
+        {'return': None, 'cid': 4},
+        {'error': {'tb_str': 'tb', 'type_str': 'ValueError'}, 'cid': 5},
+        {'error': {'tb_str': 'tb', 'type_str': 'ValueError'}},
+        {'credit': 500, 'cid': 6},
+        {'bind_host': '127.0.0.1', 'bind_port': 0},
+        ('doggy', 'uuid'),
+        None,
+    ],
+)
+def test_compact_msgs_roundtrip(msg):
+    wire = encode_compact(msg)
+    assert wire is None or isinstance(wire, tuple)
+    assert decode_compact(wire, ('doggy', 'uuid')) == msg
+
+
+@pytest.mark.trio
+async def test_compact_enveloped_send():
+    envelope = pack_envelope(10, compact=True)
+    async with stream_pair() as (tx, rx):
+        await tx.send('ten', envelope=envelope)
+        wire = await rx.recv()
+        assert decode_compact(wire, None) == {'yield': 'ten', 'cid': 10}
+
+
+def test_compact_protocol_negotiated(arb_addr):
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'streamer',
+                enable_modules=[__name__],
+            )
+            assert portal.channel.proto == _proto_version
+
+            async with portal.open_stream_from(
+                stream_from,
+                seq=10,
+            ) as stream:
+                assert [i async for i in stream] == list(range(10))
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+async def echo(x):
+    return x
+
+
+def test_original_protocol_peer(arb_addr):
+    """A peer speaking the original protocol, which neither advertises
+    a version nor swaps capabilities, is served with dict msgs.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'echoer',
+                enable_modules=[__name__],
+            )
+            async with tractor.get_arbiter(*arb_addr) as arbiter:
+                addrs = await arbiter.run_from_ns(
+                    'self', 'wait_for_actor', name='echoer')
+
+            chan = Channel(tuple(addrs[0]))
+            await chan.connect()
+            uid = ('original', 'uuid')
+            await chan.send(uid)
+            assert (await chan.recv())[:2] == portal.channel.uid
+
+            await chan.send(
+                {'cmd': (__name__, 'echo', {'x': 10}, uid, 'callid')})
+            while True:
+                msg = await chan.recv()
+                assert msg['cid'] == 'callid'
+                if 'return' in msg:
+                    break
+
+            assert msg['return'] == 10
+            await chan.aclose()
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+def test_rpc_result_in_single_frame(arb_addr):
+    """With implicit function types a ``Portal.run()`` is answered by
+    a single msg and a misused streaming function is reported.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'echoer',
+                enable_modules=[__name__],
+            )
+            stats = portal.channel.stats
+            before = stats.msgs_received
+            assert await portal.run(echo, x=10) == 10
+            assert stats.msgs_received - before == 1
+
+            with pytest.raises(ValueError):
+                await portal.run_from_ns(__name__, 'stream_from', seq=10)
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+@pytest.mark.trio
+@pytest.mark.parametrize('flush_delay', [0, 0.01])
+async def test_concurrent_sends_coalesce(flush_delay):
+    """Frames queued by concurrent senders are flushed in a few writes.
+    """
+    count = 100
+    async with stream_pair() as (tx, rx):
+        tx.flush_delay = flush_delay
+        async with trio.open_nursery() as n:
+            for i in range(count):
+                n.start_soon(tx.send, {'yield': i, 'cid': 'doggy'})
+
+        received = [(await rx.recv())['yield'] for _ in range(count)]
+        assert sorted(received) == list(range(count))
+
+        stats = tx.send_stats
+        assert stats.msgs_sent == count
+        assert stats.writes <= (1 if flush_delay else 2)
+
+
+@pytest.mark.trio
+async def test_cancelled_sends():
+    """A frame whose send is cancelled before being written is never
+    delivered, while a write cancelled part way breaks the stream.
+    """
+    async with stream_pair() as (tx, rx):
+        tx.flush_delay = 0.1
+        async with trio.open_nursery() as n:
+            n.start_soon(tx.send, {'first': 1})
+            await trio.sleep(0)
+            # queued behind the (delayed) flush of the first frame
+            with trio.move_on_after(0.01):
+                await tx.send({'dropped': 1})
+
+        tx.flush_delay = 0
+        await tx.send({'last': 1})
+        assert await rx.recv() == {'first': 1}
+        assert await rx.recv() == {'last': 1}
+        assert tx.send_stats.msgs_sent == 2
+
+        # far too big to be buffered by the kernel while not received
+        with trio.move_on_after(0.2) as cs:
+            await tx.send(b'x' * 2**25)
+        assert cs.cancelled_caught
+
+        with pytest.raises(trio.BrokenResourceError):
+            await tx.send({'after': 1})
+
+
+@pytest.mark.trio
+async def test_recv_batch():
+    """A burst of frames is received as a single batch, interleaved
+    with ``recv()``s, and an empty batch signals the stream closed.
+    """
+    count = 100
+    async with stream_pair() as (tx, rx):
+        tx.flush_delay = 0.01
+        async with trio.open_nursery() as n:
+            for i in range(count):
+                n.start_soon(tx.send, {'yield': i, 'cid': 'doggy'})
+
+        first = await rx.recv()
+        received = [first] + await rx.recv_batch()
+        while len(received) < count:
+            batch = await rx.recv_batch()
+            assert batch
+            received.extend(batch)
+
+        assert rx.stats.reads < count
+        assert sorted(msg['yield'] for msg in received) == list(range(count))
+
+        await tx.stream.aclose()
+        assert await rx.recv_batch() == []
+
+
+@pytest.mark.trio
+async def test_oob_buffers():
+    """Large buffers nested in a msg are sent out-of-band and received
+    as ``memoryview``s; small ones stay inline.
+    """
+    big = bytes(range(256)) * (_oob_threshold // 256 + 1)
+    msg = {
+        'yield': {'data': big, 'parts': [b'small', bytearray(big)]},
+        'cid': 'doggy',
+    }
+    async with stream_pair() as (tx, rx):
+        tx.oob_threshold = _oob_threshold
+
+        async def send():
+            for _ in range(3):
+                await tx.send(msg)
+            await tx.send({'stop': True, 'cid': 'doggy'})
+
+        async with trio.open_nursery() as n:
+            n.start_soon(send)
+            for _ in range(3):
+                item = (await rx.recv())['yield']
+                assert isinstance(item['data'], memoryview)
+                assert item['data'] == big
+                small, large = item['parts']
+                assert small == b'small'
+                assert isinstance(large, memoryview)
+                assert large == big
+
+            assert await rx.recv() == {'stop': True, 'cid': 'doggy'}
+
+
+@pytest.mark.trio
+async def test_oob_ndarray():
+    np = pytest.importorskip('numpy')
+    arr = np.arange(2**16, dtype='float64').reshape(2**8, 2**8)
+    async with stream_pair() as (tx, rx):
+        tx.oob_threshold = _oob_threshold
+        async with trio.open_nursery() as n:
+            n.start_soon(tx.send, {'return': arr, 'cid': 'doggy'})
+            received = (await rx.recv())['return']
+        assert isinstance(received, np.ndarray)
+        assert received.shape == arr.shape
+        assert (received == arr).all()
+
+
+async def big_bytes():
+    return b'x' * _oob_threshold
+
+
+@pytest.mark.parametrize('oob_buffers', [False, True])
+def test_oob_buffers_opt_in(arb_addr, start_method, oob_buffers):
+    """Large buffers are only received out-of-band (as memoryviews)
+    when enabled for the actor tree.
+    """
+    if start_method != 'trio':
+        pytest.skip("Runtime vars are only relayed with the trio backend")
+
+    async def main():
+        async with tractor.open_nursery(
+            arbiter_addr=arb_addr,
+            oob_buffers=oob_buffers,
+        ) as n:
+            portal = await n.start_actor(
+                'bigbytes',
+                enable_modules=[__name__],
+            )
+            data = await portal.run(big_bytes)
+            assert data == b'x' * _oob_threshold
+            assert isinstance(data, memoryview) is oob_buffers
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+def test_peer_resets_mid_handshake(arb_addr):
+    """A peer whose connection is reset part way through the handshake
+    is dropped without taking down the accepting actor.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            actor = tractor.current_actor()
+            stream = await trio.open_tcp_stream(*actor.accept_addr)
+            chan = Channel(stream=stream)
+            await chan.send(('resetter', 'uuid', _proto_version))
+            assert await chan.recv() == actor.uid + (_proto_version,)
+            assert 'caps' in await chan.recv()
+
+            # abort such that the accepting end's recv fails
+            stream.setsockopt(
+                socket.SOL_SOCKET,
+                socket.SO_LINGER,
+                struct.pack('ii', 1, 0),
+            )
+            await stream.aclose()
+            await trio.sleep(0.1)
+
+            portal = await n.start_actor('echoer', enable_modules=[__name__])
+            assert await portal.run(echo, x=10) == 10
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+@pytest.mark.skipif(not _uds_enabled, reason="No unix sockets")
+def test_local_peers_connect_over_uds(arb_addr):
+    """Same-host actors should transparently talk over a unix socket
+    both for the child's connect-back and for discovery lookups.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor('sleeper')
+
+            # the child connected back to us
+            assert portal.channel.msgstream.stream.socket.family == (
+                socket.AF_UNIX)
+
+            async with tractor.wait_for_actor('sleeper') as found:
+                assert found.channel.msgstream.stream.socket.family == (
+                    socket.AF_UNIX)
+                # tcp address is still what's registered (the lookup
+                # re-uses the channel the sleeper connected to us with)
+                assert found.channel.peer_caps['addr'][0] == '127.0.0.1'
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+def test_uds_path_local_hosts():
+    """Every loopback/wildcard bind address maps to the same unix socket.
+    """
+    path = uds_path('127.0.0.1', 1616)
+    for host in ('localhost', '0.0.0.0', '::1', '::', '127.0.1.1'):
+        assert uds_path(host, 1616) == path
+    assert uds_path('10.0.0.1', 1616) != path
+
+
+@pytest.mark.trio
+async def test_channel_falls_back_to_tcp():
+    """A local peer with no unix socket is reached over tcp.
+    """
+    listeners = await trio.open_tcp_listeners(0, host='127.0.0.1')
+    listener = listeners[0]
+    addr = listener.socket.getsockname()[:2]
+    async with listener:
+        chan = Channel(addr)
+        await chan.connect()
+        server = await listener.accept()
+        async with server:
+            assert chan.msgstream.stream.socket.family == socket.AF_INET
+            assert chan.raddr == addr
+            await chan.aclose()
+
+
+@pytest.mark.skipif(not _shm_supported, reason="No shared memory")
+def test_ring_buffer_wraps():
+    tx = RingBuffer.create(size=16)
+    rx = RingBuffer.attach(tx.name)
+    try:
+        tx.unlink()
+        assert tx.write(memoryview(b'0123456789')) == 10
+        assert rx.read(6) == b'012345'
+        # only 12 bytes free; write wraps around the end
+        assert tx.write(memoryview(b'abcdefghijklmnop')) == 12
+        assert rx.available() == 16
+        assert rx.read(100) == b'6789abcdefghijkl'
+        assert rx.read(100) == b''
+    finally:
+        rx.close()
+        tx.close()
+
+
+@pytest.mark.skipif(not _shm_supported, reason="No shared memory")
+@pytest.mark.trio
+async def test_shm_stream_ping_pong():
+    """A parked reader is always woken by the doorbell; a missed
+    wakeup would hang this lock-step exchange.
+    """
+    async with stream_pair() as (a, b):
+        a2b, b2a = RingBuffer.create(size=64), RingBuffer.create(size=64)
+        sa = ShmStream(b2a, a2b, a.stream)
+        sb = ShmStream(
+            RingBuffer.attach(a2b.name), RingBuffer.attach(b2a.name),
+            b.stream)
+        a2b.unlink()
+        b2a.unlink()
+
+        async def echo():
+            while True:
+                data = await sb.receive_some()
+                if not data:
+                    return
+                await sb.send_all(data)
+
+        async with trio.open_nursery() as n:
+            n.start_soon(echo)
+            for i in range(1000):
+                await sa.send_all(b'%d' % i)
+                assert await sa.receive_some() == b'%d' % i
+
+            # an idle reader stays parked until written to
+            await trio.sleep(0.1)
+            await sa.send_all(b'late')
+            assert await sa.receive_some() == b'late'
+            await sa.aclose()
+
+        await sb.aclose()
+
+
+@pytest.mark.skipif(not _shm_supported, reason="No shared memory")
+@pytest.mark.trio
+async def test_shm_stream_full_ring():
+    """A writer blocked on a full ring is woken as the reader frees up
+    space.
+    """
+    async with stream_pair() as (a, b):
+        a2b, b2a = RingBuffer.create(size=64), RingBuffer.create(size=64)
+        sa = ShmStream(b2a, a2b, a.stream)
+        sb = ShmStream(
+            RingBuffer.attach(a2b.name), RingBuffer.attach(b2a.name),
+            b.stream)
+        a2b.unlink()
+        b2a.unlink()
+
+        payload = bytes(range(256)) * 64
+        received = bytearray()
+
+        async def read():
+            while len(received) < len(payload):
+                received.extend(await sb.receive_some(50))
+
+        async with trio.open_nursery() as n:
+            n.start_soon(read)
+            await sa.send_all(payload)
+
+        assert received == payload
+        assert sa.bytes_sent == len(payload)
+        await sa.aclose()
+        await sb.aclose()
+
+
+async def stream_from(seq):
+    for i in range(seq):
+        yield i
+
+
+@pytest.mark.skipif(not _shm_supported, reason="No shared memory")
+def test_shm_transport_stream(arb_addr, start_method):
+    """Stream many small items over shm upgraded channels.
+    """
+    if start_method != 'trio':
+        pytest.skip("Runtime vars are only relayed with the trio backend")
+
+    count = 10000
+
+    async def main():
+        async with tractor.open_nursery(
+            arbiter_addr=arb_addr,
+            shm_transport=True,
+        ) as n:
+            portal = await n.start_actor(
+                'streamer',
+                enable_modules=[__name__],
+            )
+            assert isinstance(portal.channel.msgstream.stream, ShmStream)
+
+            async with portal.open_stream_from(
+                stream_from,
+                seq=count,
+            ) as stream:
+                assert [i async for i in stream] == list(range(count))
+
+            await portal.cancel_actor()
+
+    trio.run(main)
@@ -0,0 +1,136 @@
+"""
+Worker pools.
+"""
+import time
+
+import pytest
+import tractor
+import trio
+
+
+async def sleep_for(delay):
+    await trio.sleep(delay)
+    return delay
+
+
+async def fail():
+    raise ValueError("job failed")
+
+
+def test_idle_workers_steal_jobs(arb_addr):
+    """Jobs pulled ahead by a worker stuck on a long job are stolen by
+    idle workers.
+    """
+    delays = [2] + [0.2] * 8
+
+    async def main():
+        async with tractor.open_worker_pool(
+            2,
+            enable_modules=[__name__],
+            prefetch=4,
+            arbiter_addr=arb_addr,
+        ) as pool:
+            start = time.time()
+            assert await pool.map(sleep_for, delays, key='delay') == delays
+            # without stealing the long job's worker would hold on to
+            # 4 short ones: 2.8s
+            assert time.time() - start < 2.5
+
+            stats = pool.stats
+            assert stats.completed == stats.submitted == len(delays)
+            assert stats.stolen >= 1
+            assert stats.queued == stats.backlogged == stats.running == 0
+            assert sorted(stats.per_worker.values()) == [1, 8]
+            assert stats.throughput > 0
+
+    trio.run(main)
+
+
+def test_job_errors(arb_addr):
+
+    async def main():
+        async with tractor.open_worker_pool(
+            2,
+            enable_modules=[__name__],
+            concurrency=2,
+            arbiter_addr=arb_addr,
+        ) as pool:
+            with pytest.raises(tractor.RemoteActorError) as err:
+                await pool.submit(fail)
+            assert err.value.type is ValueError
+
+            # the workers carry on
+            assert await pool.submit(sleep_for, delay=0) == 0
+            assert pool.stats.failed == 1
+
+    trio.run(main)
+
+
+def test_autoscaling(arb_addr):
+    """The pool grows under load, up to its max, and shrinks back once
+    idle.
+    """
+    policy = tractor.ScalingPolicy(
+        max_workers=3,
+        max_pending=1,
+        # don't depend on the test host's load
+        max_load=float('inf'),
+        up_cooldown=0,
+        down_cooldown=0.5,
+        interval=0.05,
+    )
+
+    async def main():
+        async with tractor.open_worker_pool(
+            1,
+            enable_modules=[__name__],
+            autoscale=policy,
+            arbiter_addr=arb_addr,
+        ) as pool:
+            await pool.map(sleep_for, [0.2] * 30, key='delay')
+            stats = pool.stats
+            assert stats.spawned == 2
+            assert len(pool) == stats.workers == 3
+            assert stats.wait > 0
+
+            with trio.fail_after(3):
+                while len(pool) > 1:
+                    await trio.sleep(0.1)
+
+            assert pool.stats.retired == 2
+            assert await pool.submit(sleep_for, delay=0) == 0
+
+    trio.run(main)
+
+
+def test_autoscaling_reaps_retired_workers(arb_addr):
+    """Retired workers are reaped right away such that, under
+    ``max_procs``, the pool can scale back up.
+    """
+    policy = tractor.ScalingPolicy(
+        max_workers=2,
+        max_pending=1,
+        max_load=float('inf'),
+        up_cooldown=0,
+        down_cooldown=0.3,
+        interval=0.05,
+    )
+
+    async def main():
+        async with tractor.open_worker_pool(
+            1,
+            enable_modules=[__name__],
+            autoscale=policy,
+            max_procs=2,
+            arbiter_addr=arb_addr,
+        ) as pool:
+            for spawned in (1, 2):
+                with trio.fail_after(10):
+                    await pool.map(sleep_for, [0.2] * 20, key='delay')
+                    assert pool.stats.spawned == spawned
+                    while len(pool) > 1:
+                        await trio.sleep(0.1)
+
+            assert pool.stats.retired == 2
+
+    trio.run(main)
@@ -2,6 +2,8 @@
 RPC related
 """
 import itertools
+import threading
+import time
 
 import pytest
 import tractor
@@ -120,3 +122,212 @@ def test_rpc_errors(arb_addr, to_call, testdir):
 
         if getattr(value, 'type', None):
             assert value.type is inside_err
+
+
+@tractor.inline
+async def inline_lookup(key):
+    table = {'doggy': 'woof'}
+    # no task is spawned (nor tracked) for the call
+    return table[key], len(tractor.current_actor()._rpc_tasks)
+
+
+def test_inline_rpc(arb_addr):
+    """``@tractor.inline`` functions return results and ship errors
+    without being run in a task of their own.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'inliner',
+                enable_modules=[__name__],
+            )
+            assert await portal.run(inline_lookup, key='doggy') == ('woof', 0)
+
+            with pytest.raises(tractor.RemoteActorError) as err:
+                await portal.run(inline_lookup, key='kitty')
+            assert err.value.type is KeyError
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+def test_inline_requires_async_func():
+    with pytest.raises(TypeError):
+        @tractor.inline
+        def sync_func():
+            pass
+
+    with pytest.raises(TypeError):
+        @tractor.inline
+        async def agen():
+            yield
+
+
+def blocking_sleep(delay):
+    time.sleep(delay)
+    return threading.current_thread() is not threading.main_thread()
+
+
+def timed_sleep(delay):
+    start = time.monotonic()
+    time.sleep(delay)
+    return start, time.monotonic()
+
+
+@tractor.threaded(limit=1)
+def one_at_a_time(delay):
+    return timed_sleep(delay)
+
+
+def sync_error():
+    raise ValueError("from a thread")
+
+
+def max_overlap(intervals):
+    """Return the max number of ``(start, end)`` intervals which
+    overlap at any one time.
+    """
+    # ends sort before starts at the same time
+    events = sorted(
+        [(start, 1) for start, _ in intervals] +
+        [(end, -1) for _, end in intervals]
+    )
+    running = most = 0
+    for _, change in events:
+        running += change
+        most = max(most, running)
+    return most
+
+
+@pytest.mark.parametrize(
+    'func, thread_limit, concurrency',
+    [
+        (timed_sleep, None, 4),
+        (timed_sleep, 2, 2),
+        (one_at_a_time, None, 1),
+    ],
+    ids=['default_limit', 'actor_limit', 'func_limit'],
+)
+def test_sync_funcs_run_in_threads(
+    arb_addr, func, thread_limit, concurrency,
+):
+    """Sync functions run in worker threads limited by the actor's and
+    the function's own thread limit.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'threader',
+                enable_modules=[__name__],
+                thread_limit=thread_limit,
+            )
+            intervals = []
+
+            async def run():
+                intervals.append(await portal.run(func, delay=0.3))
+
+            async with trio.open_nursery() as tn:
+                for _ in range(4):
+                    tn.start_soon(run)
+
+            assert max_overlap(intervals) == concurrency
+            assert await portal.run(blocking_sleep, delay=0)
+
+            with pytest.raises(tractor.RemoteActorError) as err:
+                await portal.run(sync_error)
+            assert err.value.type is ValueError
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+async def delayed_echo(i, delay=0):
+    await trio.sleep(delay)
+    if i < 0:
+        raise ValueError(i)
+    return i
+
+
+def test_batched_calls(arb_addr):
+    """A batch of calls runs concurrently far end and results are
+    delivered in call order, either all at once or streamed.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'batcher',
+                enable_modules=[__name__],
+            )
+            calls = [{'i': i, 'delay': (10 - i) / 50} for i in range(10)]
+
+            start = time.time()
+            assert await portal.run_many(delayed_echo, calls) == list(
+                range(10))
+            assert time.time() - start < 0.4
+
+            async with portal.batch(delayed_echo, calls) as results:
+                assert [i async for i in results] == list(range(10))
+
+            # sync funcs are run in threads
+            assert await portal.run_many(
+                blocking_sleep, [{'delay': 0}] * 3) == [True] * 3
+
+            calls = [{'i': 0}, {'i': -1}, {'i': 2}]
+            with pytest.raises(tractor.RemoteActorError) as err:
+                await portal.run_many(delayed_echo, calls)
+            assert err.value.type is ValueError
+
+            async with portal.batch(
+                delayed_echo, calls, return_exceptions=True,
+            ) as results:
+                res = [r async for r in results]
+            assert res[::2] == [0, 2]
+            assert isinstance(res[1], tractor.RemoteActorError)
+
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+_running = 0
+
+
+async def tracked_sleep(delay):
+    global _running
+    _running += 1
+    try:
+        await trio.sleep(delay)
+    finally:
+        _running -= 1
+    return delay
+
+
+def running_calls():
+    return _running
+
+
+def test_closing_batch_cancels_calls(arb_addr):
+    """Closing a streamed batch early cancels its outstanding calls far
+    end.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.start_actor(
+                'batcher',
+                enable_modules=[__name__],
+            )
+            calls = [{'delay': 0}] + [{'delay': 30}] * 2
+            async with portal.batch(tracked_sleep, calls) as results:
+                async for delay in results:
+                    assert delay == 0
+                    break
+
+            with trio.fail_after(3):
+                while await portal.run(running_calls):
+                    await trio.sleep(0.1)
+
+            await portal.cancel_actor()
+
+    trio.run(main)
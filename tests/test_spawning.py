@@ -2,11 +2,15 @@
 Spawning basics
 """
 
+import os
+import sys
+import time
+
 import pytest
 import trio
 import tractor
 
-from conftest import tractor_test
+from conftest import tractor_test, no_windows
 
 data_to_pass_down = {'doggy': 10, 'kitty': 4}
 
@@ -146,3 +150,219 @@ def test_loglevel_propagated_to_subactor(
     # ensure subactor spits log message on stderr
     captured = capfd.readouterr()
     assert 'yoyoyo' in captured.err
+
+
+async def hot_path_logging():
+    return tractor._state._log_hot_path
+
+
+@pytest.mark.parametrize('level, expect', [('debug', True), ('error', False)])
+def test_hot_path_logging_follows_loglevel(arb_addr, level, expect):
+    """Per msg runtime logging is switched on in subactors only when
+    they're started at a debug (or lower) level.
+    """
+    async def main():
+        async with tractor.open_nursery(
+            loglevel=level,
+            arbiter_addr=arb_addr,
+        ) as tn:
+            portal = await tn.run_in_actor(hot_path_logging)
+            assert await portal.result() == expect
+
+    trio.run(main)
+
+
+async def check_max_procs():
+    return os.getpid()
+
+
+def test_max_procs_queues_spawns(arb_addr):
+    """With ``max_procs`` no more subprocesses run at once and the excess
+    ``run_in_actor()`` requests wait for earlier ones to be reaped.
+    """
+    async def main():
+        async with tractor.open_nursery(
+            max_procs=2,
+            arbiter_addr=arb_addr,
+        ) as n:
+            portals = []
+            for i in range(5):
+                portals.append(
+                    await n.run_in_actor(check_max_procs, name=f'proc_{i}'))
+                stats = n.spawn_stats
+                assert stats.running <= 2
+                assert len(n._children) <= 2
+
+            # results are still available after early reaping
+            pids = [await p.result() for p in portals]
+            assert len(set(pids)) == 5
+
+            stats = n.spawn_stats
+            assert stats.spawned == 5
+            assert stats.max_wait > 0
+            assert stats.queued == 0
+
+    trio.run(main)
+
+
+def test_max_procs_cancel_then_spawn(arb_addr):
+    """A cancelled daemon actor gives back its process slot as soon as
+    its process exits, not only at nursery exit.
+    """
+    async def main():
+        async with tractor.open_nursery(
+            max_procs=1,
+            arbiter_addr=arb_addr,
+        ) as n:
+            portal = await n.start_actor('first', enable_modules=[__name__])
+            first = await portal.run(check_max_procs)
+            await portal.cancel_actor()
+
+            with trio.fail_after(10):
+                portal = await n.start_actor(
+                    'second', enable_modules=[__name__])
+
+            assert await portal.run(check_max_procs) != first
+            assert n.spawn_stats.running == 1
+            assert [uid[0] for uid in n._children] == ['second']
+            await portal.cancel_actor()
+
+    trio.run(main)
+
+
+def test_start_actors_concurrently(arb_addr):
+    """``start_actors()`` spawns all actors at once and records the
+    duration of each one's startup phases.
+    """
+    names = [f'batch_{i}' for i in range(4)]
+
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            start = time.time()
+            portals = await n.start_actors(names, enable_modules=[__name__])
+            elapsed = time.time() - start
+
+            assert [p.channel.uid[0] for p in portals] == names
+            assert len(n.spawn_timings) == len(names)
+
+            timings = list(n.spawn_timings.values())
+            for t in timings:
+                assert t.exec > 0 and t.load >= 0 and t.register > 0
+
+            # the startups overlapped
+            assert elapsed < sum(t.total for t in timings)
+
+            # all registered with the arbiter by now
+            for name in names:
+                async with tractor.find_actor(name) as portal:
+                    assert portal is not None
+
+            await n.cancel()
+
+    trio.run(main)
+
+
+@no_windows
+def test_zygote_spawning(arb_addr):
+    """Subactors forked by a zygote run like exec-ed ones and are reaped
+    with their exit codes.
+    """
+    orig_method = tractor._spawn._spawn_method
+
+    async def main():
+        async with tractor.open_nursery(
+            arbiter_addr=arb_addr,
+            start_method='zygote',
+            zygote_preload=['json'],
+        ) as n:
+            portals = await n.start_actors(
+                ['zyg_0', 'zyg_1'], enable_modules=[__name__])
+            pids = [await p.run(check_max_procs) for p in portals]
+            assert len(set(pids)) == 2
+
+            procs = [proc for _, proc, _ in n._children.values()]
+            portal = await n.run_in_actor(check_max_procs)
+            assert await portal.result() not in pids
+
+            await n.cancel()
+
+        assert all(proc.returncode == 0 for proc in procs)
+
+    try:
+        trio.run(main)
+    finally:
+        tractor._spawn.try_set_start_method(orig_method)
+
+
+async def raise_error():
+    raise ValueError('standby')
+
+
+def test_standby_actors(arb_addr):
+    """Spawn requests are served by idle standby actors which take on the
+    requested name and modules and are replaced in the background.
+    """
+    async def main():
+        async with tractor.open_nursery(
+            standby=2,
+            arbiter_addr=arb_addr,
+        ) as n:
+            while n.spawn_stats.standby < 2:
+                await trio.sleep(0.1)
+
+            portal = await n.start_actor('claimed', enable_modules=[__name__])
+            assert portal.channel.uid[0] == 'claimed'
+            assert 'claimed' in [uid[0] for uid in n._children]
+            assert isinstance(await portal.run(check_max_procs), int)
+
+            async with tractor.find_actor('claimed') as found:
+                assert found is not None
+            async with tractor.find_actor('_standby') as found:
+                assert found is not None
+
+            ria = await n.run_in_actor(check_max_procs)
+            assert isinstance(await ria.result(), int)
+
+            stats = n.spawn_stats
+            assert stats.claimed == 2
+            assert stats.spawned >= 2
+
+            # replaced in the background
+            while n.spawn_stats.standby < 2:
+                await trio.sleep(0.1)
+
+            await portal.cancel_actor()
+
+        # errors from claimed ``run_in_actor()`` actors still propagate
+        with pytest.raises(tractor.RemoteActorError) as err:
+            async with tractor.open_nursery(
+                standby=1,
+                arbiter_addr=arb_addr,
+            ) as n:
+                while not n.spawn_stats.standby:
+                    await trio.sleep(0.1)
+
+                await n.run_in_actor(raise_error)
+
+        assert err.value.type is ValueError
+
+    trio.run(main)
+
+
+async def heavy_imports():
+    return [
+        mod for mod in ('pdbpp', 'colorlog', 'msgpack_numpy')
+        if mod in sys.modules
+    ]
+
+
+def test_subactors_import_lazily(arb_addr):
+    """The debugger, colored logging and numpy codecs are only imported
+    once actually used.
+    """
+    async def main():
+        async with tractor.open_nursery(arbiter_addr=arb_addr) as n:
+            portal = await n.run_in_actor(heavy_imports)
+            assert not await portal.result()
+
+    trio.run(main)
@@ -8,6 +8,8 @@ import platform
 import trio
 import tractor
 from tractor.testing import tractor_test
+from tractor._ipc import Channel, _MSG_STOP, _MSG_YIELD
+from tractor._streaming import Credits
 import pytest
 
 
@@ -326,7 +328,9 @@ async def test_respawn_consumer_task(
 
                     await trio.sleep(0.1)
 
-                    if received[-1] % 2 == 0:
+                    # the stream is opened without waiting for the far
+                    # end task to start so nothing may have arrived yet
+                    if received and received[-1] % 2 == 0:
 
                         print('cancelling consume task..')
                         cs.cancel()
@@ -341,3 +345,274 @@ async def test_respawn_consumer_task(
         # TODO: this is justification for a
         # ``ActorNursery.stream_from_actor()`` helper?
         await portal.cancel_actor()
+
+
+async def count_up(count):
+    for i in range(count):
+        yield i
+
+
+@tractor_test
+async def test_slow_consumer_doesnt_block_channel(
+    arb_addr,
+    spawn_backend,
+):
+    """A stream's producer is held to its consumer's credit window so an
+    unconsumed stream doesn't hold up others on the same channel.
+    """
+    window = 4
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        async with portal.open_stream_from(
+            count_up,
+            count=10000,
+            _window=window,
+        ) as slow:
+            assert await slow.receive() == 0
+
+            async with portal.open_stream_from(
+                count_up,
+                count=3000,
+            ) as fast:
+                assert [i async for i in fast] == list(range(3000))
+
+            stats = slow._rx_chan.statistics()
+            assert stats.current_buffer_used <= window
+
+            assert [await slow.receive() for _ in range(10)] == list(
+                range(1, 11))
+
+        await portal.cancel_actor()
+
+
+@tractor_test
+async def test_full_queue_doesnt_block_msg_loop(arb_addr):
+    """Msgs for a consumer whose queue is full (eg. of a stream from
+    a peer without flow control) are delivered from a separate task,
+    in order, without holding up msgs for other calls.
+    """
+    actor = tractor.current_actor()
+    chan = Channel()
+    chan.uid = ('peer', 'uuid')
+    _, slow = actor.get_memchans(chan.uid, 1, size=1)
+    _, fast = actor.get_memchans(chan.uid, 2, size=1)
+    for key in [(chan.uid, 1), (chan.uid, 2)]:
+        actor._cids2qs[key][0].chan = chan
+
+    with trio.fail_after(1):
+        for i in range(5):
+            await actor._push_result(chan, 1, (_MSG_YIELD, 1, i))
+        await actor._push_result(chan, 1, (_MSG_STOP, 1, None))
+
+        await actor._push_result(chan, 2, (_MSG_YIELD, 2, 'fast'))
+        assert (await fast.receive())[2] == 'fast'
+
+        assert [msg[2] async for msg in slow] == list(range(5))
+
+    actor.release_memchans(chan.uid, 1)
+    actor.release_memchans(chan.uid, 2)
+
+
+@pytest.mark.trio
+async def test_credits_wake_all_waiters():
+    """A grant wakes every producer task waiting on credits.
+    """
+    credits = Credits(0)
+    sent = []
+
+    async def produce(i):
+        await credits.acquire()
+        sent.append(i)
+
+    async with trio.open_nursery() as n:
+        for i in range(3):
+            n.start_soon(produce, i)
+
+        await trio.sleep(0.01)
+        credits.grant(3)
+
+        with trio.fail_after(1):
+            while len(sent) < 3:
+                await trio.sleep(0.01)
+
+    assert sorted(sent) == [0, 1, 2]
+    assert credits.value == 0
+
+
+@tractor_test
+async def test_receive_nowait_grants_credits(
+    arb_addr,
+    spawn_backend,
+):
+    """Items consumed with ``receive_nowait()`` are granted back to a flow
+    controlled stream's producer.
+    """
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        async with portal.open_stream_from(
+            count_up,
+            count=100,
+            _window=4,
+        ) as stream:
+            received = []
+            with trio.fail_after(5):
+                while len(received) < 100:
+                    try:
+                        received.append(stream.receive_nowait())
+                    except trio.WouldBlock:
+                        await trio.sleep(0.01)
+
+            assert received == list(range(100))
+
+        await portal.cancel_actor()
+
+
+@pytest.mark.parametrize(
+    'overflow, expect',
+    [
+        ('drop-oldest', list(range(95, 100))),
+        ('drop-newest', list(range(5))),
+        ('conflate-latest', [99]),
+    ],
+)
+@tractor_test
+async def test_stream_overflow_policies(
+    arb_addr,
+    spawn_backend,
+    overflow,
+    expect,
+):
+    """A consumer which falls behind only sees the values its stream's
+    overflow policy keeps.
+    """
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        async with portal.open_stream_from(
+            count_up,
+            count=100,
+            _buffer_size=5,
+            _overflow=overflow,
+        ) as stream:
+            # let the producer run to completion
+            await trio.sleep(1)
+            assert [i async for i in stream] == expect
+
+        await portal.cancel_actor()
+
+
+async def echo_opts(buffer_size, overflow, window):
+    yield buffer_size, overflow, window
+
+
+@tractor_test
+async def test_stream_opts_dont_collide(
+    arb_addr,
+    spawn_backend,
+):
+    """A remote function's kwargs are passed through even when named like
+    the stream options.
+    """
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        async with portal.open_stream_from(
+            echo_opts,
+            buffer_size=1,
+            overflow='yours',
+            window=2,
+            _buffer_size=10,
+        ) as stream:
+            assert await stream.receive() == (1, 'yours', 2)
+
+        await portal.cancel_actor()
+
+
+async def error_before_yield():
+    raise ValueError("no values for you")
+    yield
+
+
+@tractor_test
+async def test_stream_error_before_first_yield(
+    arb_addr,
+    spawn_backend,
+):
+    """Without a function type ack an error raised before a remote stream's
+    first value is delivered to the consumer's first ``receive()``.
+    """
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        with pytest.raises(tractor.RemoteActorError) as excinfo:
+            async with portal.open_stream_from(error_before_yield) as stream:
+                await stream.receive()
+
+        assert excinfo.value.type == ValueError
+
+        await portal.cancel_actor()
+
+
+async def state_stats():
+    return tractor.current_actor().state_stats()
+
+
+async def sleepy():
+    await trio.sleep(0.1)
+
+
+@tractor_test
+async def test_call_state_is_reclaimed(
+    arb_addr,
+    spawn_backend,
+):
+    """Per call runtime state is reclaimed on both ends once calls and
+    streams complete or are closed early.
+    """
+    actor = tractor.current_actor()
+    async with tractor.open_nursery() as n:
+        portal = await n.start_actor(
+            name='streamer',
+            enable_modules=[__name__]
+        )
+        before = actor.state_stats()
+
+        for _ in range(100):
+            await portal.run(state_stats)
+
+        # given up on before the result arrives
+        for _ in range(20):
+            with trio.move_on_after(0.01):
+                await portal.run(sleepy)
+
+        async with portal.open_stream_from(count_up, count=10) as stream:
+            assert [i async for i in stream] == list(range(10))
+
+        # closed before the producer completes
+        async with portal.open_stream_from(count_up, count=10000) as stream:
+            assert await stream.receive() == 0
+
+        assert actor.state_stats() == before
+
+        # let the abandoned calls complete
+        await trio.sleep(0.2)
+
+        # only the call reporting the stats is live in the far end
+        remote = await portal.run(state_stats)
+        assert remote['cids2qs'] == 0
+        assert remote['rpc_tasks'] == 1
+        assert remote['credits'] == 0
+
+        await portal.cancel_actor()
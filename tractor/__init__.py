@@ -8,6 +8,9 @@ from ._ipc import Channel
 from ._streaming import Context, stream
 from ._discovery import get_arbiter, find_actor, wait_for_actor
 from ._trionics import open_nursery
+from ._actor import inline, threaded
+from ._group import PortalGroup
+from ._pool import open_worker_pool, ScalingPolicy
 from ._state import current_actor, is_root_process
 from ._exceptions import RemoteActorError, ModuleNotExposed
 from ._debug import breakpoint, post_mortem
@@ -20,19 +23,24 @@ __all__ = [
     'Context',
     'ModuleNotExposed',
     'MultiError',
+    'PortalGroup',
     'RemoteActorError',
+    'ScalingPolicy',
     'breakpoint',
     'current_actor',
     'find_actor',
     'get_arbiter',
+    'inline',
     'is_root_process',
     'msg',
     'open_nursery',
     'open_root_actor',
+    'open_worker_pool',
     'post_mortem',
     'run',
     'run_daemon',
     'stream',
+    'threaded',
     'wait_for_actor',
     'to_asyncio',
     'wait_for_actor',
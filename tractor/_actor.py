@@ -1,9 +1,9 @@
 """
 Actor primitives and helpers
 """
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import partial
-from itertools import chain
+from itertools import chain, count
 import importlib
 import importlib.util
 import inspect
@@ -13,15 +13,31 @@ from typing import Dict, List, Tuple, Any, Optional, Union
 from types import ModuleType
 import sys
 import os
+import time
 from contextlib import ExitStack
 
 import trio  # type: ignore
 from trio_typing import TaskStatus
 from async_generator import aclosing
 
-from ._ipc import Channel
-from ._streaming import Context
-from .log import get_logger
+from . import _ipc
+from . import _shm
+from ._ipc import (
+    Channel,
+    encode_compact,
+    _MSG_CMD,
+    _MSG_STOP,
+    _MSG_RAW,
+    _MSG_WINDOW,
+    _MSG_CREDIT,
+)
+from ._streaming import (
+    Context,
+    Credits,
+    push_nowait,
+    _default_buffer_size,
+)
+from .log import get_logger, get_console_log
 from ._exceptions import (
     pack_error,
     unpack_error,
@@ -31,20 +47,156 @@ from ._exceptions import (
 from . import _debug
 from ._discovery import get_arbiter
 from ._portal import Portal
+from ._connpool import ConnectionPool
 from . import _state
 from . import _mp_fixup_main
 
 
 log = get_logger('tractor')
 
+# stream flow control msgs handled directly by the msg loop
+_flow_codes = (_MSG_WINDOW, _MSG_CREDIT)
+
 
 class ActorFailure(Exception):
     "General actor failure"
 
 
+def inline(func):
+    """Mark an async function as safe to run *inline* in the msg loop
+    with ``@inline``.
+
+    Calls to such a function skip spawning a task (and its ``Context``,
+    cancel scope and ``_rpc_tasks`` entry) and are awaited directly by
+    the channel's msg loop; no other msgs from the caller's channel are
+    processed until it returns. Only use it for short functions which
+    never wait on other tasks or msgs (eg. lookups in local state).
+    """
+    if (
+        not inspect.iscoroutinefunction(func) or
+        getattr(func, '_tractor_stream_function', False)
+    ):
+        raise TypeError(
+            f'{func} must be a non-streaming async function to be inlined!')
+
+    func._tractor_inline_function = True
+    return func
+
+
+def threaded(
+    limit: Optional[int] = None,
+    cancellable: bool = False,
+) -> typing.Callable:
+    """Configure how a sync function is run in a worker thread when
+    invoked through a portal with ``@threaded(limit=..., cancellable=...)``.
+
+    Undecorated sync functions are run the same way with the defaults.
+    At most ``limit`` calls to the function run at once (on top of the
+    actor's own ``thread_limit``). A cancelled call waits for its thread
+    to complete unless ``cancellable`` is set in which case the thread
+    is abandoned (and left to complete in the background).
+    """
+    if limit is not None and limit < 1:
+        raise ValueError(f"Thread limit must be positive: {limit}")
+
+    def decorate(func):
+        if (
+            not callable(func) or
+            inspect.iscoroutinefunction(func) or
+            inspect.isasyncgenfunction(func) or
+            inspect.isgeneratorfunction(func)
+        ):
+            raise TypeError(f'{func} must be a sync function to be threaded!')
+
+        func._tractor_thread_limit = limit
+        func._tractor_thread_cancellable = cancellable
+        return func
+
+    return decorate
+
+
+async def _run_in_thread(
+    actor: 'Actor',
+    func: typing.Callable,
+    kwargs: Dict[str, Any],
+) -> Any:
+    """Run a sync RPC func in a worker thread limited by the actor's (and
+    the func's own) thread limiter.
+    """
+    limiter = actor._thread_limiter
+    if limiter is None:
+        limiter = actor._thread_limiter = (
+            trio.CapacityLimiter(actor.thread_limit) if actor.thread_limit
+            else trio.to_thread.current_default_thread_limiter()
+        )
+
+    run = partial(
+        trio.to_thread.run_sync,
+        partial(func, **kwargs),
+        cancellable=getattr(func, '_tractor_thread_cancellable', False),
+        limiter=limiter,
+    )
+    limit = getattr(func, '_tractor_thread_limit', None)
+    if limit is None:
+        return await run()
+
+    func_limiter = actor._func_limiters.get(func)
+    if func_limiter is None:
+        func_limiter = actor._func_limiters[func] = trio.CapacityLimiter(limit)
+
+    async with func_limiter:
+        return await run()
+
+
+async def _call_batched(
+    actor: 'Actor',
+    func: typing.Callable,
+    kwargs: Dict[str, Any],
+) -> Tuple[bool, Any]:
+    """Run a single call of a batch and return whether it succeeded
+    along with its result or (packed) error.
+    """
+    try:
+        if inspect.iscoroutinefunction(func):
+            return True, await func(**kwargs)
+
+        return True, await _run_in_thread(actor, func, kwargs)
+
+    except Exception as err:
+        log.exception("Batched RPC func crashed:")
+        return False, pack_error(err)['error']
+
+
+async def _invoke_inline(
+    cid: int,
+    chan: Channel,
+    func: typing.Callable,
+    kwargs: Dict[str, Any],
+) -> None:
+    """Invoke an ``@inline`` func in the calling (msg loop) task and
+    deliver its result over the provided channel.
+    """
+    try:
+        if chan.proto < _ipc._proto_implicit_functype:
+            await chan.send_msg('functype', cid, 'asyncfunc')
+        await chan.send_msg('return', cid, await func(**kwargs))
+
+    except (Exception, trio.MultiError) as err:
+        # NOTE: no debugger is entered here since that would block
+        # the msg loop
+        if not isinstance(err, trio.ClosedResourceError):
+            log.exception("Inline RPC func crashed:")
+
+        try:
+            await chan.send_msg('error', cid, pack_error(err)['error'])
+        except trio.ClosedResourceError:
+            log.warning(
+                f"Failed to ship error to caller @ {chan.uid}")
+
+
 async def _invoke(
     actor: 'Actor',
-    cid: str,
+    cid: int,
     chan: Channel,
     func: typing.Callable,
     kwargs: Dict[str, Any],
@@ -57,25 +209,48 @@ async def _invoke(
     treat_as_gen = False
     cs = None
     cancel_scope = trio.CancelScope()
-    ctx = Context(chan, cid, cancel_scope)
+    # set if the caller asked for a flow controlled stream
+    credits = actor._credits.get((chan, cid))
+    ctx = Context(chan, cid, cancel_scope, _credits=credits)
+
+    # never allow cancelling cancel requests (results in deadlock and
+    # other weird behaviour)
+    if func != actor.cancel:
+        # register the task's cancel scope *before* it runs such that it
+        # can be cancelled gracefully on request and its entry is always
+        # reclaimed below, even if it completes before the msg loop
+        # resumes
+        actor._ongoing_rpc_tasks = trio.Event()
+        actor._rpc_tasks[(chan, cid)] = (cancel_scope, func, trio.Event())
 
     if getattr(func, '_tractor_stream_function', False):
         # handle decorated ``@tractor.stream`` async functions
         kwargs['ctx'] = ctx
         treat_as_gen = True
 
+    # with newer peers a function's type is implied by its first
+    # response msg (see ``Portal._submit()``) instead of acked up front
+    ack_asyncfunc = chan.proto < _ipc._proto_implicit_functype
+    ack_asyncgen = chan.proto < _ipc._proto_implicit_stream_ack
+
     # errors raised inside this block are propgated back to caller
     try:
-        if not (
+        if (
             inspect.isasyncgenfunction(func) or
             inspect.iscoroutinefunction(func)
         ):
+            coro = func(**kwargs)
+
+        elif treat_as_gen or inspect.isgeneratorfunction(func):
             raise TypeError(f'{func} must be an async function!')
 
-        coro = func(**kwargs)
+        else:
+            # sync functions are run in a worker thread
+            coro = _run_in_thread(actor, func, kwargs)
 
         if inspect.isasyncgen(coro):
-            await chan.send({'functype': 'asyncgen', 'cid': cid})
+            if ack_asyncgen:
+                await chan.send_msg('functype', cid, 'asyncgen')
             # XXX: massive gotcha! If the containing scope
             # is cancelled and we execute the below line,
             # any ``ActorNursery.__aexit__()`` WON'T be
@@ -83,6 +258,7 @@ async def _invoke(
             # have to properly handle the closing (aclosing)
             # of the async gen in order to be sure the cancel
             # is propagated!
+            envelope = chan.pack_envelope(cid)
             with cancel_scope as cs:
                 task_status.started(cs)
                 async with aclosing(coro) as agen:
@@ -94,16 +270,20 @@ async def _invoke(
                         # to_send = await chan.recv_nowait()
                         # if to_send is not None:
                         #     to_yield = await coro.asend(to_send)
-                        await chan.send({'yield': item, 'cid': cid})
+                        if credits is not None:
+                            await credits.acquire()
+                        await chan.send(item, envelope=envelope)
 
-            log.debug(f"Finished iterating {coro}")
+            if _state._log_hot_path:
+                log.debug("Finished iterating %s", coro)
             # TODO: we should really support a proper
             # `StopAsyncIteration` system here for returning a final
             # value if desired
-            await chan.send({'stop': True, 'cid': cid})
+            await chan.send_msg('stop', cid, True)
         else:
             if treat_as_gen:
-                await chan.send({'functype': 'asyncgen', 'cid': cid})
+                if ack_asyncgen:
+                    await chan.send_msg('functype', cid, 'asyncgen')
                 # XXX: the async-func may spawn further tasks which push
                 # back values like an async-generator would but must
                 # manualy construct the response dict-packet-responses as
@@ -114,13 +294,14 @@ async def _invoke(
                 if not cs.cancelled_caught:
                     # task was not cancelled so we can instruct the
                     # far end async gen to tear down
-                    await chan.send({'stop': True, 'cid': cid})
+                    await chan.send_msg('stop', cid, True)
             else:
                 # regular async function
-                await chan.send({'functype': 'asyncfunc', 'cid': cid})
+                if ack_asyncfunc:
+                    await chan.send_msg('functype', cid, 'asyncfunc')
                 with cancel_scope as cs:
                     task_status.started(cs)
-                    await chan.send({'return': await coro, 'cid': cid})
+                    await chan.send_msg('return', cid, await coro)
 
     except (Exception, trio.MultiError) as err:
 
@@ -139,10 +320,8 @@ async def _invoke(
                 log.exception("Actor crashed:")
 
         # always ship errors back to caller
-        err_msg = pack_error(err)
-        err_msg['cid'] = cid
         try:
-            await chan.send(err_msg)
+            await chan.send_msg('error', cid, pack_error(err)['error'])
 
         except trio.ClosedResourceError:
             log.warning(
@@ -153,15 +332,15 @@ async def _invoke(
             task_status.started(err)
 
     finally:
+        actor._credits.pop((chan, cid), None)
+
         # RPC task bookeeping
         try:
             scope, func, is_complete = actor._rpc_tasks.pop((chan, cid))
             is_complete.set()
         except KeyError:
-            # If we're cancelled before the task returns then the
-            # cancel scope will not have been inserted yet
-            log.warning(
-                f"Task {func} likely errored or cancelled before it started")
+            # cancel requests are never registered
+            pass
         finally:
             if not actor._rpc_tasks:
                 log.info("All RPC tasks have completed")
@@ -203,7 +382,8 @@ class Actor:
         uid: str = None,
         loglevel: str = None,
         arbiter_addr: Optional[Tuple[str, int]] = None,
-        spawn_method: Optional[str] = None
+        spawn_method: Optional[str] = None,
+        thread_limit: Optional[int] = None,
     ) -> None:
         """This constructor is called in the parent actor **before** the spawning
         phase (aka before a new process is executed).
@@ -218,8 +398,9 @@ class Actor:
         # will be passed to children
         self._parent_main_data = _mp_fixup_main._mp_figure_out_main()
 
-        # always include debugging tools module
-        enable_modules.append('tractor._debug')
+        # expose the debugging tools module (only) in debug mode
+        if _state.debug_mode():
+            enable_modules.append('tractor._debug')
 
         mods = {}
         for name in enable_modules:
@@ -234,11 +415,22 @@ class Actor:
         self.loglevel = loglevel
         self._arb_addr = arbiter_addr
 
+        # max number of worker threads running sync RPC funcs at once,
+        # trio's default (process wide) limit if not set
+        self.thread_limit = thread_limit
+        self._thread_limiter: Optional[trio.CapacityLimiter] = None
+        # per func limiters, see ``threaded()``
+        self._func_limiters: Dict[
+            typing.Callable, trio.CapacityLimiter] = {}
+
         # marked by the process spawning backend at startup
         # will be None for the parent most process started manually
         # by the user (currently called the "arbiter")
         self._spawn_method = spawn_method
 
+        # wall clock stamps of the startup phases, see ``_async_main()``
+        self._startup_times: Dict[str, float] = {}
+
         self._peers: defaultdict = defaultdict(list)
         self._peer_connected: dict = {}
         self._no_more_peers = trio.Event()
@@ -247,22 +439,33 @@ class Actor:
         self._ongoing_rpc_tasks.set()
         # (chan, cid) -> (cancel_scope, func)
         self._rpc_tasks: Dict[
-            Tuple[Channel, str],
+            Tuple[Channel, int],
             Tuple[trio.CancelScope, typing.Callable, trio.Event]
         ] = {}
         # map {uids -> {callids -> waiter queues}}
         self._cids2qs: Dict[
-            Tuple[Tuple[str, str], str],
+            Tuple[Tuple[str, str], int],
             Tuple[
                 trio.abc.SendChannel[Any],
                 trio.abc.ReceiveChannel[Any]
             ]
         ] = {}
+        # send credits for flow controlled streams we're producing
+        self._credits: Dict[Tuple[Channel, int], Credits] = {}
         self._listeners: List[trio.abc.Listener] = []
         self._parent_chan: Optional[Channel] = None
         self._forkserver_info: Optional[
             Tuple[Any, Any, Any, Any, Any]] = None
         self._actoruid2nursery: Dict[str, 'ActorNursery'] = {}  # type: ignore
+        # call ids are allocated from a single counter such that they're
+        # unique across all channels (to any peer)
+        self._cids = count(1)
+        # connections to peers re-used for discovery/arbiter calls,
+        # running while the actor runtime is up
+        self._conn_pool: Optional[ConnectionPool] = None
+        # started on first spawn with the "zygote" method
+        self._zygote: Optional['Zygote'] = None  # type: ignore # noqa
+        self._zygote_lock = trio.Lock()
 
     async def wait_for_peer(
         self, uid: Tuple[str, str]
@@ -284,7 +487,7 @@ class Actor:
         code (if it exists).
         """
         try:
-            if self._spawn_method == 'trio':
+            if self._spawn_method in ('trio', 'zygote'):
                 parent_data = self._parent_main_data
                 if 'init_main_from_name' in parent_data:
                     _mp_fixup_main._fixup_main_from_name(
@@ -293,21 +496,25 @@ class Actor:
                     _mp_fixup_main._fixup_main_from_path(
                         parent_data['init_main_from_path'])
 
-            for modpath, filepath in self.enable_modules.items():
-                # XXX append the allowed module to the python path which
-                # should allow for relative (at least downward) imports.
-                sys.path.append(os.path.dirname(filepath))
-                log.debug(f"Attempting to import {modpath}@{filepath}")
-                mod = importlib.import_module(modpath)
-                self._mods[modpath] = mod
-                if modpath == '__main__':
-                    self._mods['__mp_main__'] = mod
-        except ModuleNotFoundError:
+            self._import_modules(self.enable_modules)
+
+        except ModuleNotFoundError as err:
             # it is expected the corresponding `ModuleNotExposed` error
             # will be raised later
-            log.error(f"Failed to import {modpath} in {self.name}")
+            log.error(f"Failed to import {err.name} in {self.name}")
             raise
 
+    def _import_modules(self, modules: Dict[str, str]) -> None:
+        for modpath, filepath in modules.items():
+            # XXX append the allowed module to the python path which
+            # should allow for relative (at least downward) imports.
+            sys.path.append(os.path.dirname(filepath))
+            log.debug(f"Attempting to import {modpath}@{filepath}")
+            mod = importlib.import_module(modpath)
+            self._mods[modpath] = mod
+            if modpath == '__main__':
+                self._mods['__mp_main__'] = mod
+
     def _get_rpc_func(self, ns, funcname):
         try:
             return getattr(self._mods[ns], funcname)
@@ -338,7 +545,13 @@ class Actor:
         # send/receive initial handshake response
         try:
             uid = await self._do_handshake(chan)
-        except StopAsyncIteration:
+        except (
+            StopAsyncIteration,
+            # the peer may disconnect at any point of the (multi msg)
+            # handshake, eg. when it's cancelled right after connecting
+            trio.BrokenResourceError,
+            trio.ClosedResourceError,
+        ):
             log.warning(f"Channel {chan} failed to handshake")
             return
 
@@ -391,66 +604,183 @@ class Actor:
                     log.exception(
                         f"Channel for {chan.uid} was already zonked..")
 
+            # release the transport, eg. the shm rings of an upgraded
+            # channel (the server only closes the socket we accepted)
+            await chan.aclose()
+
     async def _push_result(
         self,
         chan: Channel,
-        cid: str,
-        msg: Dict[str, Any],
+        cid: int,
+        msg: Tuple[int, Any, Any],
     ) -> None:
-        """Push an RPC result to the local consumer's queue.
+        """Push an RPC result, a compact ``(code, cid, payload)`` msg,
+        to the local consumer's queue.
         """
         actorid = chan.uid
         assert actorid, f"`actorid` can't be {actorid}"
-        send_chan, recv_chan = self._cids2qs[(actorid, cid)]
+        try:
+            send_chan, recv_chan = self._cids2qs[(actorid, cid)]
+        except KeyError:
+            # the local caller is already done with this call (eg. it
+            # closed a stream early) and its queue was reclaimed
+            if _state._log_hot_path:
+                log.debug(
+                    "Dropping %s from %s for released %s", msg, actorid, cid)
+            return
+
         assert send_chan.cid == cid  # type: ignore
 
-        if 'stop' in msg:
-            log.debug(f"{send_chan} was terminated at remote end")
+        backlog = send_chan.backlog  # type: ignore
+        if backlog is not None:
+            # keep msgs in order behind those still being delivered
+            backlog.append(msg)
+            return
+
+        if msg[0] == _MSG_STOP:
+            if _state._log_hot_path:
+                log.debug("%s was terminated at remote end", send_chan)
             # indicate to consumer that far end has stopped
-            return await send_chan.aclose()
+            send_chan.close()
+            return
 
         try:
-            log.debug(f"Delivering {msg} from {actorid} to caller {cid}")
-            # maintain backpressure
-            await send_chan.send(msg)
+            if _state._log_hot_path:
+                log.debug(
+                    "Delivering %s from %s to caller %s", msg, actorid, cid)
+            overflow = send_chan.overflow  # type: ignore
+            if overflow == 'block':
+                send_chan.send_nowait(msg)
+            else:
+                push_nowait(send_chan, recv_chan, msg, overflow)
+
+        except trio.WouldBlock:
+            # the consumer fell behind a far end which isn't flow
+            # controlled (eg. an older peer); never wait on it here
+            # which would hold up every other call on the channel but
+            # deliver from a task instead
+            log.warning(f"{send_chan} consumer is falling behind")
+            send_chan.backlog = deque([msg])  # type: ignore
+            assert self._service_n
+            self._service_n.start_soon(self._deliver_backlog, send_chan)
 
         except trio.BrokenResourceError:
             # XXX: local consumer has closed their side
             # so cancel the far end streaming task
             log.warning(f"{send_chan} consumer is already closed")
 
+    async def _deliver_backlog(
+        self,
+        send_chan: trio.abc.SendChannel,
+    ) -> None:
+        """Deliver the msgs queued up while a (``'block'`` policy)
+        consumer's queue was full, in order and waiting on the consumer.
+        """
+        backlog = send_chan.backlog  # type: ignore
+        try:
+            while backlog:
+                msg = backlog[0]
+                if msg[0] == _MSG_STOP:
+                    send_chan.close()
+                    return
+
+                await send_chan.send(msg)
+                backlog.popleft()
+
+        except (trio.BrokenResourceError, trio.ClosedResourceError):
+            log.warning(f"{send_chan} consumer is already closed")
+
+        finally:
+            send_chan.backlog = None  # type: ignore
+
+    def _grant_credits(
+        self,
+        chan: Channel,
+        cid: int,
+        code: int,
+        n: int,
+    ) -> None:
+        """Handle a flow control msg from the consumer of a stream we're
+        producing.
+        """
+        if code == _MSG_WINDOW:
+            # always sent ahead of the stream's ``'cmd'``
+            self._credits[(chan, cid)] = Credits(n)
+            return
+
+        credits = self._credits.get((chan, cid))
+        if credits is not None:
+            credits.grant(n)
+
     def get_memchans(
         self,
         actorid: Tuple[str, str],
-        cid: str
+        cid: int,
+        size: int = _default_buffer_size,
+        overflow: str = 'block',
     ) -> Tuple[trio.abc.SendChannel, trio.abc.ReceiveChannel]:
-        log.debug(f"Getting result queue for {actorid} cid {cid}")
+        if _state._log_hot_path:
+            log.debug("Getting result queue for %s cid %s", actorid, cid)
         try:
             send_chan, recv_chan = self._cids2qs[(actorid, cid)]
         except KeyError:
-            send_chan, recv_chan = trio.open_memory_channel(1000)
+            send_chan, recv_chan = trio.open_memory_channel(size)
             send_chan.cid = cid  # type: ignore
+            send_chan.overflow = overflow  # type: ignore
+            # msgs waiting on a full (``'block'``) queue, see
+            # ``_push_result()``
+            send_chan.backlog = None  # type: ignore
             recv_chan.cid = cid  # type: ignore
             self._cids2qs[(actorid, cid)] = send_chan, recv_chan
 
         return send_chan, recv_chan
 
+    def release_memchans(
+        self,
+        actorid: Tuple[str, str],
+        cid: int,
+    ) -> None:
+        """Reclaim the result queue for a call once its local caller is
+        done with it; any msgs still in flight for ``cid`` are dropped.
+        """
+        self._cids2qs.pop((actorid, cid), None)
+
     async def send_cmd(
         self,
         chan: Channel,
         ns: str,
         func: str,
-        kwargs: dict
-    ) -> Tuple[str, trio.abc.ReceiveChannel]:
+        kwargs: dict,
+        window: Optional[int] = None,
+        buffer_size: int = _default_buffer_size,
+        overflow: str = 'block',
+    ) -> Tuple[int, trio.abc.ReceiveChannel]:
         """Send a ``'cmd'`` message to a remote actor and return a
         caller id and a ``trio.Queue`` that can be used to wait for
         responses delivered by the local message processing loop.
+
+        The queue holds up to ``buffer_size`` msgs, after which new
+        stream items are handled as per the ``overflow`` policy. If
+        a ``window`` is passed the far end may only send that many
+        stream items ahead of the local consumer.
         """
-        cid = str(uuid.uuid4())
+        cid = next(self._cids)
         assert chan.uid
-        send_chan, recv_chan = self.get_memchans(chan.uid, cid)
-        log.debug(f"Sending cmd to {chan.uid}: {ns}.{func}({kwargs})")
-        await chan.send({'cmd': (ns, func, kwargs, self.uid, cid)})
+        # the queue always has room for a full window so delivery of
+        # a flow controlled stream's msgs never blocks the msg loop
+        send_chan, recv_chan = self.get_memchans(
+            chan.uid, cid,
+            size=max(window or 0, buffer_size),
+            overflow=overflow,
+        )
+        # the channel the call's responses arrive on
+        send_chan.chan = chan  # type: ignore
+        if window:
+            await chan.send_msg('window', cid, window)
+        if _state._log_hot_path:
+            log.debug(
+                "Sending cmd to %s: %s.%s(%s)", chan.uid, ns, func, kwargs)
+        await chan.send_cmd(cid, ns, func, kwargs, self.uid)
         return cid, recv_chan
 
     async def _process_messages(
@@ -475,108 +805,140 @@ class Actor:
                 # a locally spawned task) and recieve this scope using
                 # ``scope = Nursery.start()``
                 task_status.started(loop_cs)
-                async for msg in chan:
-                    if msg is None:  # loop terminate sentinel
-                        log.debug(
-                            f"Cancelling all tasks for {chan} from {chan.uid}")
-                        for (channel, cid) in self._rpc_tasks:
-                            if channel is chan:
-                                await self._cancel_task(cid, channel)
+                while True:
+                    # decode every msg available from the last read(s)
+                    # and dispatch them in one pass
+                    msgs = await chan.recv_batch()
+                    compact = chan.proto
+                    if not msgs:
+                        # channel disconnect
                         log.debug(
-                                f"Msg loop signalled to terminate for"
-                                f" {chan} from {chan.uid}")
+                            f"{chan} for {chan.uid} disconnected, "
+                            "cancelling tasks")
+                        await self.cancel_rpc_tasks(chan)
                         break
 
-                    log.trace(   # type: ignore
-                        f"Received msg {msg} from {chan.uid}")
-
-                    cid = msg.get('cid')
-                    if cid:
-                        # deliver response to local caller/waiter
-                        await self._push_result(chan, cid, msg)
-                        log.debug(
-                            f"Waiting on next msg for {chan} from {chan.uid}")
-                        continue
-
-                    # process command request
-                    try:
-                        ns, funcname, kwargs, actorid, cid = msg['cmd']
-                    except KeyError:
-                        # This is the non-rpc error case, that is, an
-                        # error **not** raised inside a call to ``_invoke()``
-                        # (i.e. no cid was provided in the msg - see above).
-                        # Push this error to all local channel consumers
-                        # (normally portals) by marking the channel as errored
-                        assert chan.uid
-                        exc = unpack_error(msg, chan=chan)
-                        chan._exc = exc
-                        raise exc
+                    for msg in msgs:
+                        if msg is None:  # loop terminate sentinel
+                            log.debug(
+                                f"Cancelling all tasks for {chan} "
+                                f"from {chan.uid}")
+                            for (channel, cid) in list(self._rpc_tasks):
+                                if channel is chan:
+                                    await self._cancel_task(cid, channel)
+                            log.debug(
+                                    f"Msg loop signalled to terminate for"
+                                    f" {chan} from {chan.uid}")
+                            break
+
+                        if _state._log_hot_path:
+                            log.trace(  # type: ignore
+                                "Received msg %s from %s", msg, chan.uid)
+
+                        if not compact:
+                            # original (dict) protocol peer
+                            msg = encode_compact(msg)
+
+                        code, cid, payload = msg
+                        if code != _MSG_CMD and cid is not None:
+                            if code in _flow_codes:
+                                # flow control for a stream we're producing
+                                self._grant_credits(chan, cid, code, payload)
+                                continue
+
+                            # deliver response to local caller/waiter
+                            await self._push_result(chan, cid, msg)
+                            if _state._log_hot_path:
+                                log.debug(
+                                    "Waiting on next msg for %s from %s",
+                                    chan, chan.uid)
+                            continue
 
-                    log.debug(
-                        f"Processing request from {actorid}\n"
-                        f"{ns}.{funcname}({kwargs})")
-                    if ns == 'self':
-                        func = getattr(self, funcname)
-                        if funcname == '_cancel_task':
-                            # XXX: a special case is made here for
-                            # remote calls since we don't want the
-                            # remote actor have to know which channel
-                            # the task is associated with and we can't
-                            # pass non-primitive types between actors.
-                            # This means you can use:
-                            #    Portal.run('self', '_cancel_task, cid=did)
-                            # without passing the `chan` arg.
-                            kwargs['chan'] = chan
-                    else:
-                        # complain to client about restricted modules
-                        try:
-                            func = self._get_rpc_func(ns, funcname)
-                        except (ModuleNotExposed, AttributeError) as err:
-                            err_msg = pack_error(err)
-                            err_msg['cid'] = cid
-                            await chan.send(err_msg)
+                        # process command request
+                        if code != _MSG_CMD:
+                            # This is the non-rpc error case, that is, an
+                            # error **not** raised inside a call to
+                            # ``_invoke()`` (i.e. no cid was provided in the
+                            # msg - see above). Push this error to all local
+                            # channel consumers (normally portals) by marking
+                            # the channel as errored
+                            assert chan.uid
+                            if code == _MSG_RAW:
+                                exc = unpack_error(payload, chan=chan)
+                            else:
+                                exc = unpack_error(
+                                    {'error': payload}, chan=chan)
+                            chan._exc = exc
+                            raise exc
+
+                        ns, funcname, kwargs = payload
+                        actorid = chan.uid
+                        if _state._log_hot_path:
+                            log.debug(
+                                "Processing request from %s\n%s.%s(%s)",
+                                actorid, ns, funcname, kwargs)
+                        if ns == 'self':
+                            func = getattr(self, funcname)
+                            if funcname == '_cancel_task':
+                                # XXX: a special case is made here for
+                                # remote calls since we don't want the
+                                # remote actor have to know which channel
+                                # the task is associated with and we can't
+                                # pass non-primitive types between actors.
+                                # This means you can use:
+                                #    Portal.run('self', '_cancel_task, cid=did)
+                                # without passing the `chan` arg.
+                                kwargs['chan'] = chan
+                        else:
+                            # complain to client about restricted modules
+                            try:
+                                func = self._get_rpc_func(ns, funcname)
+                            except (ModuleNotExposed, AttributeError) as err:
+                                self._credits.pop((chan, cid), None)
+                                await chan.send_msg(
+                                    'error', cid, pack_error(err)['error'])
+                                continue
+
+                        if getattr(func, '_tractor_inline_function', False):
+                            # short function, no task needed
+                            await _invoke_inline(cid, chan, func, kwargs)
                             continue
 
-                    # spin up a task for the requested function
-                    log.debug(f"Spawning task for {func}")
-                    assert self._service_n
-                    cs = await self._service_n.start(
-                        partial(_invoke, self, cid, chan, func, kwargs),
-                        name=funcname,
-                    )
-                    # never allow cancelling cancel requests (results in
-                    # deadlock and other weird behaviour)
-                    if func != self.cancel:
-                        if isinstance(cs, Exception):
-                            log.warning(
-                                f"Task for RPC func {func} failed with"
-                                f"{cs}")
+                        # spin up a task for the requested function
+                        if _state._log_hot_path:
+                            log.debug("Spawning task for %s", func)
+                        assert self._service_n
+                        cs = await self._service_n.start(
+                            partial(_invoke, self, cid, chan, func, kwargs),
+                            name=funcname,
+                        )
+                        # (the task's cancel scope is registered by
+                        # ``_invoke()`` itself)
+                        if func != self.cancel:
+                            if isinstance(cs, Exception):
+                                log.warning(
+                                    f"Task for RPC func {func} failed with"
+                                    f"{cs}")
+                            else:
+                                log.info("RPC func is %s", func)
                         else:
-                            # mark that we have ongoing rpc tasks
-                            self._ongoing_rpc_tasks = trio.Event()
-                            log.info(f"RPC func is {func}")
-                            # store cancel scope such that the rpc task can be
-                            # cancelled gracefully if requested
-                            self._rpc_tasks[(chan, cid)] = (
-                                cs, func, trio.Event())
+                            # self.cancel() was called so kill this msg loop
+                            # and break out into ``_async_main()``
+                            log.warning(
+                                f"{self.uid} was remotely cancelled; "
+                                "waiting on cancellation completion..")
+                            await self._cancel_complete.wait()
+                            loop_cs.cancel()
+                            break
+
+                        if _state._log_hot_path:
+                            log.debug(
+                                "Waiting on next msg for %s from %s",
+                                chan, chan.uid)
                     else:
-                        # self.cancel() was called so kill this msg loop
-                        # and break out into ``_async_main()``
-                        log.warning(
-                            f"{self.uid} was remotely cancelled; "
-                            "waiting on cancellation completion..")
-                        await self._cancel_complete.wait()
-                        loop_cs.cancel()
-                        break
-
-                    log.debug(
-                        f"Waiting on next msg for {chan} from {chan.uid}")
-                else:
-                    # channel disconnect
-                    log.debug(
-                        f"{chan} for {chan.uid} disconnected, cancelling tasks"
-                    )
-                    await self.cancel_rpc_tasks(chan)
+                        continue
+                    # msg loop terminated
+                    break
 
         except trio.ClosedResourceError:
             log.error(f"{chan} form {chan.uid} broke")
@@ -594,6 +956,16 @@ class Actor:
             log.debug(f"Msg loop was cancelled for {chan}")
             raise
         finally:
+            # no response can arrive anymore for calls made over this
+            # channel; local callers still waiting hold their own refs
+            for key, (send_chan, _) in list(self._cids2qs.items()):
+                if send_chan.chan is chan:  # type: ignore
+                    del self._cids2qs[key]
+
+            # flow control state for streams which were never started
+            for key in [k for k in self._credits if k[0] is chan]:
+                del self._credits[key]
+
             log.debug(
                 f"Exiting msg loop for {chan} from {chan.uid} "
                 f"with last msg:\n{msg}")
@@ -616,7 +988,7 @@ class Actor:
 
             accept_addr: Optional[Tuple[str, int]] = None
 
-            if self._spawn_method == "trio":
+            if self._spawn_method in ('trio', 'zygote'):
                 # Receive runtime state from our parent
                 parent_data = await chan.recv()
                 log.debug(
@@ -664,6 +1036,7 @@ class Actor:
         and when cancelled effectively cancels the actor.
         """
         registered_with_arbiter = False
+        self._startup_times['main'] = time.time()
         try:
 
             # establish primary connection with immediate parent
@@ -677,11 +1050,14 @@ class Actor:
                 if accept_addr_rent is not None:
                     accept_addr = accept_addr_rent
 
+            self._startup_times['connected'] = time.time()
+
             # load exposed/allowed RPC modules
             # XXX: do this **after** establishing a channel to the parent
             # but **before** starting the message loop for that channel
             # such that import errors are properly propagated upwards
             self.load_modules()
+            self._startup_times['loaded'] = time.time()
 
             # The "root" nursery ensures the channel with the immediate
             # parent is kept alive as a resilient service until
@@ -691,6 +1067,9 @@ class Actor:
                 self._root_n = root_nursery
                 assert self._root_n
 
+                self._conn_pool = await root_nursery.start(
+                    ConnectionPool(self).run)
+
                 async with trio.open_nursery() as service_nursery:
                     # This nursery is used to handle all inbound
                     # connections to us such that if the TCP server
@@ -722,7 +1101,10 @@ class Actor:
                     log.debug(f"Registering {self} for role `{self.name}`")
                     assert isinstance(self._arb_addr, tuple)
 
-                    async with get_arbiter(*self._arb_addr) as arb_portal:
+                    # the connection is only needed again to unregister
+                    async with get_arbiter(
+                        *self._arb_addr, linger=False,
+                    ) as arb_portal:
                         await arb_portal.run_from_ns(
                             'self',
                             'register_actor',
@@ -731,6 +1113,7 @@ class Actor:
                         )
 
                     registered_with_arbiter = True
+                    self._startup_times['registered'] = time.time()
 
                     # init steps complete
                     task_status.started()
@@ -749,6 +1132,9 @@ class Actor:
                         )
                     log.info("Waiting on service nursery to complete")
                 log.info("Service nursery complete")
+                await self._conn_pool.aclose()
+                if self._zygote:
+                    await self._zygote.aclose()
                 log.info("Waiting on root nursery to complete")
 
             # Blocks here as expected until the root nursery is
@@ -840,6 +1226,7 @@ class Actor:
         ``cancel_server()`` is called.
         """
         self._server_down = trio.Event()
+        uds_path: Optional[str] = None
         try:
             async with trio.open_nursery() as server_n:
                 l: List[trio.abc.Listener] = await server_n.start(
@@ -857,8 +1244,38 @@ class Actor:
                     "Started tcp server(s) on"
                     f" {[getattr(l, 'socket', 'unknown socket') for l in l]}")
                 self._listeners.extend(l)
+
+                # same-host peers connect through a unix socket keyed
+                # by our (primary) tcp address
+                if _ipc._uds_enabled:
+                    host, port = l[0].socket.getsockname()[:2]
+                    path = _ipc.uds_path(host, port)
+                    try:
+                        uds_listener = await _ipc.open_uds_listener(path)
+                    except OSError:
+                        log.warning(f"Failed to bind unix socket {path!r}")
+                    else:
+                        uds_path = path
+                        await server_n.start(
+                            partial(
+                                trio.serve_listeners,
+                                self._stream_handler,
+                                [uds_listener],
+                                handler_nursery=handler_nursery,
+                            )
+                        )
+                        log.debug(f"Started unix socket server on {path!r}")
+                        self._listeners.append(uds_listener)
+
                 task_status.started(server_n)
         finally:
+            # remove any unix socket file (non-abstract namespace)
+            if uds_path and not uds_path.startswith('\0'):
+                try:
+                    os.unlink(uds_path)
+                except FileNotFoundError:
+                    pass
+
             # signal the server is down since nursery above terminated
             self._server_down.set()
 
@@ -957,6 +1374,154 @@ class Actor:
             f"Sucessfully cancelled task:\ncid: {cid}\nfunc: {func}\n"
             f"peer: {chan.uid}\n")
 
+    async def _claim(
+        self,
+        name: str,
+        enable_modules: Dict[str, str],
+        loglevel: Optional[str] = None,
+        thread_limit: Optional[int] = None,
+    ) -> None:
+        """Take on the identity of a requested actor (as an idle
+        "standby" actor): load its modules and re-register under its name.
+        """
+        old_uid = self.uid
+        new_mods = {
+            modpath: filepath for modpath, filepath in enable_modules.items()
+            if modpath not in self._mods
+        }
+        self._import_modules(new_mods)
+        self.enable_modules.update(new_mods)
+
+        if loglevel and loglevel != self.loglevel:
+            self.loglevel = loglevel
+            get_console_log(loglevel)
+        self.thread_limit = thread_limit
+
+        self.name = name
+        self.uid = (name, old_uid[1])
+        log.info(f"Claimed as {self.uid}")
+
+        assert isinstance(self._arb_addr, tuple)
+        async with get_arbiter(*self._arb_addr, linger=False) as arb_portal:
+            await arb_portal.run_from_ns(
+                'self', 'unregister_actor', uid=old_uid)
+            await arb_portal.run_from_ns(
+                'self',
+                'register_actor',
+                uid=self.uid,
+                sockaddr=self.accept_addr,
+            )
+
+    def _get_startup_times(self) -> Dict[str, float]:
+        """Return the wall clock times at which each startup phase of
+        this actor completed.
+        """
+        return self._startup_times
+
+    def _get_batch_func(self, ns: str, funcname: str) -> typing.Callable:
+        func = self._get_rpc_func(ns, funcname)
+        if (
+            inspect.isasyncgenfunction(func) or
+            inspect.isgeneratorfunction(func) or
+            getattr(func, '_tractor_stream_function', False)
+        ):
+            raise TypeError(f'{func} must be a non-streaming function!')
+
+        return func
+
+    async def _run_batch(
+        self,
+        ns: str,
+        funcname: str,
+        calls: List[Dict[str, Any]],
+    ) -> List[Tuple[bool, Any]]:
+        """Run ``ns.funcname()`` once per ``kwargs`` in ``calls``,
+        concurrently, and return all outcomes (in call order) at once.
+
+        Each outcome is a ``(ok, result or packed error)`` pair, see
+        ``Portal.run_many()``.
+        """
+        func = self._get_batch_func(ns, funcname)
+        outcomes: List[Tuple[bool, Any]] = [None] * len(calls)  # type: ignore
+
+        async def run(i: int, kwargs: Dict[str, Any]) -> None:
+            outcomes[i] = await _call_batched(self, func, kwargs)
+
+        async with trio.open_nursery() as n:
+            for i, kwargs in enumerate(calls):
+                n.start_soon(run, i, kwargs)
+
+        return outcomes
+
+    async def _feed_batch(
+        self,
+        func: typing.Callable,
+        calls: List[Dict[str, Any]],
+        send: trio.abc.SendChannel,
+        task_status: TaskStatus[trio.CancelScope] = trio.TASK_STATUS_IGNORED,
+    ) -> None:
+        """Run a call of ``func`` per ``kwargs`` in ``calls``, concurrently,
+        and send each ``(index, outcome)`` as soon as it's ready.
+        """
+        async def run(i: int, kwargs: Dict[str, Any]) -> None:
+            # the channel has room for every outcome
+            send.send_nowait((i, await _call_batched(self, func, kwargs)))
+
+        with trio.CancelScope() as cs:
+            task_status.started(cs)
+            with send:
+                async with trio.open_nursery() as n:
+                    for i, kwargs in enumerate(calls):
+                        n.start_soon(run, i, kwargs)
+
+    async def _stream_batch(
+        self,
+        ns: str,
+        funcname: str,
+        calls: List[Dict[str, Any]],
+    ) -> typing.AsyncGenerator[List[Tuple[bool, Any]], None]:
+        """Like ``_run_batch()`` but stream the outcomes back in call
+        order as soon as they're ready.
+
+        Outcomes completing together are coalesced and sent as a single
+        list such that a (fast) batch takes few msgs.
+        """
+        func = self._get_batch_func(ns, funcname)
+        send, recv = trio.open_memory_channel(len(calls))
+
+        # the calls run from a service task, not from a nursery held
+        # open across our ``yield``s, which is cancelled once we're
+        # done or closed
+        assert self._service_n
+        cs = await self._service_n.start(
+            self._feed_batch, func, calls, send)
+        try:
+            outcomes: Dict[int, Tuple[bool, Any]] = {}
+            nxt = 0
+            while nxt < len(calls):
+                i, outcome = await recv.receive()
+                outcomes[i] = outcome
+                # let other calls which completed in the same scheduling
+                # batch report in before flushing
+                await trio.sleep(0)
+                while True:
+                    try:
+                        i, outcome = recv.receive_nowait()
+                    except (trio.WouldBlock, trio.EndOfChannel):
+                        break
+                    outcomes[i] = outcome
+
+                chunk = []
+                while nxt in outcomes:
+                    chunk.append(outcomes.pop(nxt))
+                    nxt += 1
+
+                if chunk:
+                    yield chunk
+
+        finally:
+            cs.cancel()
+
     async def cancel_rpc_tasks(
         self,
         only_chan: Optional[Channel] = None,
@@ -998,29 +1563,103 @@ class Actor:
         assert self._parent_chan, "No parent channel for this actor?"
         return Portal(self._parent_chan)
 
+    def state_stats(self) -> Dict[str, int]:
+        """Return the number of live entries in each of the runtime's per
+        call and per peer tables; these should return to zero once all
+        calls complete and peers disconnect.
+        """
+        return {
+            'cids2qs': len(self._cids2qs),
+            'rpc_tasks': len(self._rpc_tasks),
+            'credits': len(self._credits),
+            'peers': len(self._peers),
+            'peer_connected': len(self._peer_connected),
+            'pooled_conns': len(self._conn_pool) if self._conn_pool else 0,
+        }
+
     def get_chans(self, uid: Tuple[str, str]) -> List[Channel]:
         """Return all channels to the actor with provided uid."""
-        return self._peers[uid]
+        # don't insert (and leak) an empty entry for unknown peers
+        return self._peers.get(uid, [])
 
     async def _do_handshake(
         self,
-        chan: Channel
+        chan: Channel,
+        advertise: bool = True,
     ) -> Tuple[str, str]:
         """Exchange (name, UUIDs) identifiers as the first communication step.
 
         These are essentially the "mailbox addresses" found in actor model
         parlance.
+
+        Our protocol version rides along in the uid msg; an original
+        (protocol 0) peer only checks it's a tuple and otherwise treats
+        it as opaque. Only if the peer advertised a version in turn are
+        each end's transport/protocol capabilities swapped and the
+        channel upgraded as negotiated. With ``advertise=False`` our
+        address is withheld so the peer won't re-use the channel for its
+        own requests.
         """
-        await chan.send(self.uid)
-        uid: Tuple[str, str] = await chan.recv()
+        await chan.send(self.uid + (_ipc._proto_version,))
+        msg = await chan.recv()
+        if msg is None:
+            raise trio.BrokenResourceError(
+                f"{chan} disconnected during the handshake")
 
-        if not isinstance(uid, tuple):
-            raise ValueError(f"{uid} is not a valid uid?!")
+        if not isinstance(msg, tuple) or len(msg) not in (2, 3):
+            raise ValueError(f"{msg} is not a valid uid?!")
 
+        uid: Tuple[str, str] = msg[:2]
+        proto: int = msg[2] if len(msg) == 3 else 0
         chan.uid = uid
+
+        if proto:
+            await chan.send({'caps': self._caps(advertise)})
+            msg = await chan.recv()
+            if msg is None:
+                raise trio.BrokenResourceError(
+                    f"{chan} disconnected during the handshake")
+            chan.peer_caps = msg['caps']
+        else:
+            chan.peer_caps = {}
+
+        addr = chan.peer_caps.get('addr')
+        if chan._destaddr is None and addr:
+            # accepted over a unix socket, keep a tcp address to
+            # (re)connect to
+            chan._destaddr = tuple(addr)
+
+        if _shm.should_upgrade(chan, chan.peer_caps):
+            await _shm.upgrade(chan)
+
+        if chan.peer_caps.get('oob'):
+            assert chan.msgstream
+            chan.msgstream.oob_threshold = _ipc._oob_threshold
+
+        # switch to the compact wire protocol only once all handshake
+        # msgs have been exchanged
+        chan.proto = min(_ipc._proto_version, proto)
+
         log.info(f"Handshake with actor {uid}@{chan.raddr} complete")
         return uid
 
+    def _caps(self, advertise: bool = True) -> Dict[str, Any]:
+        """Capabilities advertised to peers during the handshake.
+        """
+        try:
+            addr = self.accept_addr if self._listeners and advertise else None
+        except OSError:  # channel server is down
+            addr = None
+
+        return {
+            'shm': _shm.local_caps(),
+            # whether we accept OOB buffers (received as memoryviews)
+            'oob': bool(_state._runtime_vars['_oob_buffers']),
+            # where we're reached by new connections; lets peers re-use
+            # this channel instead (see ``ConnectionPool``)
+            'addr': addr,
+        }
+
 
 class Arbiter(Actor):
     """A special actor who knows all the other actors and always has
@@ -1038,6 +1677,7 @@ class Arbiter(Actor):
         self._waiters = {}
         super().__init__(*args, **kwargs)
 
+    @inline
     async def find_actor(self, name: str) -> Optional[Tuple[str, int]]:
         for uid, sockaddr in self._registry.items():
             if name in uid:
@@ -1079,6 +1719,7 @@ class Arbiter(Actor):
 
         return sockaddrs
 
+    @inline
     async def register_actor(
         self, uid: Tuple[str, str], sockaddr: Tuple[str, int]
     ) -> None:
@@ -1092,5 +1733,6 @@ class Arbiter(Actor):
             if isinstance(event, trio.Event):
                 event.set()
 
+    @inline
     async def unregister_actor(self, uid: Tuple[str, str]) -> None:
         self._registry.pop(uid)
@@ -0,0 +1,245 @@
+"""
+Per-actor pool of (re-usable) connections to peer actors.
+"""
+from dataclasses import dataclass
+from functools import partial
+from itertools import chain
+import typing
+from typing import Dict, Optional, Tuple
+
+import trio
+from async_generator import asynccontextmanager
+from trio_typing import TaskStatus
+
+from ._ipc import Channel
+from ._portal import Portal
+from .log import get_logger
+
+
+log = get_logger(__name__)
+
+
+# seconds a pooled connection may sit unused before it's closed
+_idle_timeout: float = 10
+
+
+@dataclass
+class PooledConn:
+    """A connected and handshaked channel with a running msg loop.
+    """
+    chan: Channel
+    msg_loop_cs: trio.CancelScope
+    # local tasks currently using the connection
+    users: int = 0
+    # last time the connection was found to be in use
+    last_used: float = 0
+    # msg counts at the last idle check
+    msgs: int = 0
+    # whether the connection is kept around once unused
+    linger: bool = True
+
+
+class ConnectionPool:
+    """A cache of connections to peers keyed by the (channel server)
+    sockaddr at which each is reached.
+
+    Channels of peers which connected *to us* and advertised that same
+    sockaddr during the handshake are re-used as is. Otherwise
+    a connection is opened (and its msg loop run) by the pool, shared by
+    all concurrent users and closed once it hasn't been used in either
+    direction for ``idle_timeout`` seconds.
+    """
+    def __init__(
+        self,
+        actor: 'Actor',  # type: ignore # noqa
+        idle_timeout: float = _idle_timeout,
+    ) -> None:
+        self.actor = actor
+        self.idle_timeout = idle_timeout
+        self.closed = False
+        self._conns: Dict[Tuple[str, int], PooledConn] = {}
+        # connects in progress
+        self._pending: Dict[Tuple[str, int], trio.Event] = {}
+        self._n: Optional[trio.Nursery] = None
+
+    def __len__(self) -> int:
+        return len(self._conns)
+
+    async def run(
+        self,
+        task_status: TaskStatus = trio.TASK_STATUS_IGNORED,
+    ) -> None:
+        """Host the pool's msg loop and idle reaper tasks until closed.
+        """
+        try:
+            async with trio.open_nursery() as n:
+                self._n = n
+                n.start_soon(self._reap)
+                task_status.started(self)
+        finally:
+            self.closed = True
+
+    def _find_peer_chan(
+        self,
+        sockaddr: Tuple[str, int],
+    ) -> Optional[Channel]:
+        for chan in chain(*self.actor._peers.values()):
+            addr = chan.peer_caps.get('addr')
+            if addr and tuple(addr) == sockaddr and chan.connected():
+                return chan
+
+        return None
+
+    async def _serve(
+        self,
+        sockaddr: Tuple[str, int],
+        chan: Channel,
+        task_status: TaskStatus = trio.TASK_STATUS_IGNORED,
+    ) -> None:
+        """Run the msg loop for a pooled channel, evicting it from the
+        pool once the loop exits.
+        """
+        try:
+            await self.actor._process_messages(chan, task_status=task_status)
+        finally:
+            conn = self._conns.get(sockaddr)
+            if conn and conn.chan is chan:
+                del self._conns[sockaddr]
+
+            with trio.CancelScope(shield=True):
+                await chan.aclose()
+
+    async def _connect(
+        self,
+        sockaddr: Tuple[str, int],
+        linger: bool = True,
+    ) -> PooledConn:
+        # wait on any concurrent connect to the same peer
+        while sockaddr in self._pending:
+            await self._pending[sockaddr].wait()
+
+        conn = self._conns.get(sockaddr)
+        if conn:
+            return conn
+
+        self._pending[sockaddr] = connected = trio.Event()
+        try:
+            chan = Channel(sockaddr)
+            await chan.connect()
+            try:
+                # the peer mustn't adopt a connection we're about to
+                # close for its own requests
+                await self.actor._do_handshake(chan, advertise=linger)
+                assert self._n
+                msg_loop_cs = await self._n.start(
+                    partial(self._serve, sockaddr, chan))
+            except BaseException:
+                with trio.CancelScope(shield=True):
+                    await chan.aclose()
+                raise
+
+            conn = self._conns[sockaddr] = PooledConn(
+                chan,
+                msg_loop_cs,
+                last_used=trio.current_time(),
+                linger=linger,
+            )
+            log.debug(f"Pooled new connection to {chan.uid}@{sockaddr}")
+            return conn
+
+        finally:
+            del self._pending[sockaddr]
+            connected.set()
+
+    @asynccontextmanager
+    async def open_portal(
+        self,
+        sockaddr: Tuple[str, int],
+        linger: bool = True,
+    ) -> typing.AsyncGenerator[Portal, None]:
+        """Open a portal to the actor at ``sockaddr`` through an existing
+        channel if there is one, otherwise through a new (pooled) one.
+
+        Each user gets its own portal but the (pooled) channel is shared
+        with other users and must not be closed. With ``linger=False``
+        a newly opened connection is closed as soon as it's no longer in
+        use instead of after ``idle_timeout``; for one-off calls such as
+        registering with the arbiter. Such a connection isn't advertised
+        to the peer for re-use.
+        """
+        sockaddr = tuple(sockaddr)  # type: ignore
+        chan = self._find_peer_chan(sockaddr)
+        if chan:
+            yield Portal(chan)
+            return
+
+        if self.closed:
+            raise trio.ClosedResourceError(f"{self} is closed")
+
+        conn = self._conns.get(sockaddr) or await self._connect(
+            sockaddr, linger=linger)
+        conn.users += 1
+        try:
+            yield Portal(conn.chan)
+        finally:
+            conn.users -= 1
+            conn.last_used = trio.current_time()
+            if not (conn.linger or conn.users) and not any(
+                c is conn.chan for c, _ in self.actor._rpc_tasks
+            ) and self._conns.get(sockaddr) is conn:
+                await self._close(sockaddr, conn)
+
+    def _in_use(self, conn: PooledConn) -> bool:
+        """Whether ``conn`` was used (in either direction) since the last
+        check.
+        """
+        chan = conn.chan
+        if not chan.connected():
+            return False
+
+        msgs = chan.stats.msgs_received + chan.send_stats.msgs_sent  # type: ignore # noqa
+        busy = conn.users or msgs != conn.msgs or any(
+            c is chan for c, _ in self.actor._rpc_tasks)
+        conn.msgs = msgs
+        return bool(busy)
+
+    async def _reap(self) -> None:
+        """Close connections which have sat idle for ``idle_timeout``.
+        """
+        while True:
+            await trio.sleep(self.idle_timeout / 2)
+            now = trio.current_time()
+            for sockaddr, conn in list(self._conns.items()):
+                if self._in_use(conn):
+                    conn.last_used = now
+                elif now - conn.last_used >= self.idle_timeout:
+                    log.debug(f"Closing idle connection to {sockaddr}")
+                    await self._close(sockaddr, conn)
+
+    async def _close(
+        self,
+        sockaddr: Tuple[str, int],
+        conn: PooledConn,
+    ) -> None:
+        self._conns.pop(sockaddr, None)
+        chan = conn.chan
+        if chan.connected():
+            with trio.CancelScope(shield=True):
+                try:
+                    # cancel the far end's msg loop
+                    await chan.send(None)
+                except (trio.ClosedResourceError, trio.BrokenResourceError):
+                    pass
+
+        # the channel is closed once our end's msg loop exits
+        conn.msg_loop_cs.cancel()
+
+    async def aclose(self) -> None:
+        """Close all pooled connections and stop the pool's tasks.
+        """
+        self.closed = True
+        for sockaddr, conn in list(self._conns.items()):
+            await self._close(sockaddr, conn)
+
+        if self._n:
+            self._n.cancel_scope.cancel()
@@ -3,8 +3,9 @@ Multi-core debugging for da peeps!
 """
 import bdb
 import sys
-from functools import partial
+from functools import lru_cache, partial
 from contextlib import asynccontextmanager
+from types import ModuleType
 from typing import Awaitable, Tuple, Optional, Callable, AsyncIterator
 
 from async_generator import aclosing
@@ -17,15 +18,6 @@ from ._discovery import get_root
 from ._state import is_root_process
 from ._exceptions import is_multi_cancelled
 
-try:
-    # wtf: only exported when installed in dev mode?
-    import pdbpp
-except ImportError:
-    # pdbpp is installed in regular mode...it monkey patches stuff
-    import pdb
-    assert pdb.xpm, "pdbpp is not installed?"  # type: ignore
-    pdbpp = pdb
-
 log = get_logger(__name__)
 
 
@@ -46,35 +38,57 @@ _debug_lock = trio.StrictFIFOLock()
 _debugger_request_cs: Optional[trio.CancelScope] = None
 
 
-class TractorConfig(pdbpp.DefaultConfig):
-    """Custom ``pdbpp`` goodness.
+@lru_cache(maxsize=None)
+def _get_pdbpp() -> ModuleType:
+    """Import ``pdbpp`` (and its many deps) on first debugger use such
+    that actors which never debug don't pay for it.
     """
-    # sticky_by_default = True
+    try:
+        # wtf: only exported when installed in dev mode?
+        import pdbpp
+    except ImportError:
+        # pdbpp is installed in regular mode...it monkey patches stuff
+        import pdb
+        assert pdb.xpm, "pdbpp is not installed?"  # type: ignore
+        pdbpp = pdb
 
+    return pdbpp
 
-class PdbwTeardown(pdbpp.Pdb):
-    """Add teardown hooks to the regular ``pdbpp.Pdb``.
-    """
-    # override the pdbpp config with our coolio one
-    DefaultConfig = TractorConfig
 
-    # TODO: figure out how to dissallow recursive .set_trace() entry
-    # since that'll cause deadlock for us.
-    def set_continue(self):
-        global _in_debug
-        try:
-            super().set_continue()
-        finally:
-            _in_debug = False
-            _pdb_release_hook()
+@lru_cache(maxsize=None)
+def _get_pdb_type() -> type:
+    pdbpp = _get_pdbpp()
 
-    def set_quit(self):
-        global _in_debug
-        try:
-            super().set_quit()
-        finally:
-            _in_debug = False
-            _pdb_release_hook()
+    class TractorConfig(pdbpp.DefaultConfig):
+        """Custom ``pdbpp`` goodness.
+        """
+        # sticky_by_default = True
+
+    class PdbwTeardown(pdbpp.Pdb):
+        """Add teardown hooks to the regular ``pdbpp.Pdb``.
+        """
+        # override the pdbpp config with our coolio one
+        DefaultConfig = TractorConfig
+
+        # TODO: figure out how to dissallow recursive .set_trace() entry
+        # since that'll cause deadlock for us.
+        def set_continue(self):
+            global _in_debug
+            try:
+                super().set_continue()
+            finally:
+                _in_debug = False
+                _pdb_release_hook()
+
+        def set_quit(self):
+            global _in_debug
+            try:
+                super().set_quit()
+            finally:
+                _in_debug = False
+                _pdb_release_hook()
+
+    return PdbwTeardown
 
 
 # TODO: will be needed whenever we get to true remote debugging.
@@ -265,7 +279,7 @@ def _mk_pdb():
     # on a SIGINT, with ``trio`` we pretty much never want this
     # and we did we can handle it in the ``tractor`` task runtime.
 
-    pdb = PdbwTeardown()
+    pdb = _get_pdb_type()()
     pdb.allow_kbdint = True
     pdb.nosigint = True
 
@@ -310,7 +324,7 @@ def _post_mortem(actor):
     pdb = _mk_pdb()
 
     # custom Pdb post-mortem entry
-    pdbpp.xpm(Pdb=lambda: pdb)
+    _get_pdbpp().xpm(Pdb=lambda: pdb)
 
 
 post_mortem = partial(
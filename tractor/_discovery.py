@@ -14,13 +14,36 @@ from ._portal import (
 from ._state import current_actor, _runtime_vars
 
 
+@asynccontextmanager
+async def _open_portal(
+    sockaddr: Tuple[str, int],
+    linger: bool = True,
+) -> typing.AsyncGenerator[Portal, None]:
+    """Open a portal to the actor at ``sockaddr`` through the current
+    actor's connection pool if it's running, otherwise through a new
+    (one-off) connection.
+    """
+    pool = current_actor()._conn_pool
+    if pool is not None and not pool.closed:
+        async with pool.open_portal(sockaddr, linger=linger) as portal:
+            yield portal
+    else:
+        async with _connect_chan(*sockaddr) as chan:
+            async with open_portal(chan) as portal:
+                yield portal
+
+
 @asynccontextmanager
 async def get_arbiter(
     host: str,
     port: int,
+    linger: bool = True,
 ) -> typing.AsyncGenerator[Union[Portal, LocalPortal], None]:
     """Return a portal instance connected to a local or remote
     arbiter.
+
+    Pass ``linger=False`` for one-off calls after which the (pooled)
+    connection to the arbiter needn't be kept around.
     """
     actor = current_actor()
 
@@ -32,9 +55,8 @@ async def get_arbiter(
         # (likely a re-entrant call from the arbiter actor)
         yield LocalPortal(actor, Channel((host, port)))
     else:
-        async with _connect_chan(host, port) as chan:
-            async with open_portal(chan) as arb_portal:
-                yield arb_portal
+        async with _open_portal((host, port), linger=linger) as arb_portal:
+            yield arb_portal
 
 
 @asynccontextmanager
@@ -56,7 +78,8 @@ async def find_actor(
     """Ask the arbiter to find actor(s) by name.
 
     Returns a connected portal to the last registered matching actor
-    known to the arbiter.
+    known to the arbiter. The portal's connection may be shared with
+    other tasks and is cached for later lookups.
     """
     actor = current_actor()
     async with get_arbiter(*arbiter_sockaddr or actor._arb_addr) as arb_portal:
@@ -66,9 +89,8 @@ async def find_actor(
         if name == 'arbiter' and actor.is_arbiter:
             raise RuntimeError("The current actor is the arbiter")
         elif sockaddr:
-            async with _connect_chan(*sockaddr) as chan:
-                async with open_portal(chan) as portal:
-                    yield portal
+            async with _open_portal(sockaddr) as portal:
+                yield portal
         else:
             yield None
 
@@ -86,6 +108,5 @@ async def wait_for_actor(
     async with get_arbiter(*arbiter_sockaddr or actor._arb_addr) as arb_portal:
         sockaddrs = await arb_portal.run_from_ns('self', 'wait_for_actor', name=name)
         sockaddr = sockaddrs[-1]
-        async with _connect_chan(*sockaddr) as chan:
-            async with open_portal(chan) as portal:
-                yield portal
+        async with _open_portal(sockaddr) as portal:
+            yield portal
@@ -0,0 +1,199 @@
+"""
+Scatter/gather style calls across a group of portals.
+"""
+from itertools import count, islice
+import typing
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterable, List, Optional,
+    Sequence,
+)
+
+import trio
+from async_generator import asynccontextmanager
+
+from ._portal import Portal
+from .log import get_logger
+
+
+log = get_logger(__name__)
+
+
+class PortalGroup:
+    """A group of portals (usually to equivalent "worker" actors) over
+    which many calls of one function are spread.
+
+    Calls are dispatched (in chunks of ``chunksize``) to the least loaded
+    actor, measured by its number of outstanding calls, and only once that
+    actor is below ``max_outstanding`` calls; skewed jobs thus never pile
+    up on one busy actor while others sit idle. The load is tracked per
+    group so concurrent maps over the same group are balanced together.
+    """
+    def __init__(
+        self,
+        portals: Sequence[Portal],
+        max_outstanding: Optional[int] = None,
+    ) -> None:
+        if not portals:
+            raise ValueError("A portal group needs at least one portal")
+
+        if max_outstanding is not None and max_outstanding < 1:
+            raise ValueError(
+                f"Max outstanding calls must be positive: {max_outstanding}")
+
+        self.portals = list(portals)
+        self.max_outstanding = max_outstanding
+        # calls in flight per portal
+        self._outstanding: Dict[Portal, int] = {p: 0 for p in self.portals}
+        self._released = trio.Event()
+
+    def __len__(self) -> int:
+        return len(self.portals)
+
+    @property
+    def load(self) -> Dict[Portal, int]:
+        """Number of outstanding calls per portal.
+        """
+        return dict(self._outstanding)
+
+    async def _acquire(self, ncalls: int, limit: int) -> Portal:
+        """Reserve ``ncalls`` on the least loaded portal, waiting until
+        one is below ``limit`` calls.
+        """
+        while True:
+            portal = min(self.portals, key=self._outstanding.__getitem__)
+            if self._outstanding[portal] < limit:
+                self._outstanding[portal] += ncalls
+                return portal
+
+            # only replace the event once it fired such that a release
+            # wakes *all* waiting dispatchers
+            if self._released.is_set():
+                self._released = trio.Event()
+            await self._released.wait()
+
+    def _release(self, portal: Portal, ncalls: int) -> None:
+        self._outstanding[portal] -= ncalls
+        self._released.set()
+
+    @asynccontextmanager
+    async def _imap(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        key: Optional[str],
+        chunksize: int,
+        ordered: bool,
+    ) -> typing.AsyncGenerator[AsyncIterator[Any], None]:
+        if chunksize < 1:
+            raise ValueError(f"Chunk size must be positive: {chunksize}")
+
+        limit = self.max_outstanding or 2 * chunksize
+        calls = iter(
+            {key: item} if key is not None else item for item in items)
+        send, recv = trio.open_memory_channel(0)
+
+        async def run(
+            i: int,
+            portal: Portal,
+            chunk: List[Dict[str, Any]],
+            send: trio.abc.SendChannel,
+        ) -> None:
+            # NOTE: the send sides are closed synchronously (no
+            # checkpoint) such that an error is never swallowed by the
+            # cancellation which follows the consumer completing
+            with send:
+                try:
+                    if len(chunk) == 1:
+                        results = [await portal.run(func, **chunk[0])]
+                    else:
+                        results = await portal.run_many(func, chunk)
+                finally:
+                    self._release(portal, len(chunk))
+
+                await send.send((i, results))
+
+        async def dispatch(task_status=trio.TASK_STATUS_IGNORED) -> None:
+            with send:
+                async with trio.open_nursery() as n:
+                    task_status.started()
+                    for i in count(0, chunksize):
+                        chunk = list(islice(calls, chunksize))
+                        if not chunk:
+                            break
+
+                        # items are only consumed as actors free up such
+                        # that a huge input isn't scheduled all at once
+                        portal = await self._acquire(len(chunk), limit)
+                        n.start_soon(run, i, portal, chunk, send.clone())
+
+        async def results() -> AsyncIterator[Any]:
+            pending: Dict[int, List[Any]] = {}
+            nxt = 0
+            async for i, chunk_results in recv:
+                if not ordered:
+                    for result in chunk_results:
+                        yield result
+                    continue
+
+                pending[i] = chunk_results
+                while nxt in pending:
+                    chunk_results = pending.pop(nxt)
+                    for result in chunk_results:
+                        yield result
+                    nxt += chunksize
+
+        async with trio.open_nursery() as n:
+            await n.start(dispatch)
+            try:
+                yield results()
+            finally:
+                n.cancel_scope.cancel()
+
+    def imap(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        *,
+        key: Optional[str] = None,
+        chunksize: int = 1,
+    ) -> typing.AsyncContextManager[AsyncIterator[Any]]:
+        """Call ``func`` once per item across the group and deliver the
+        results in input order.
+
+        Each item is the ``kwargs`` dict for a call or, if ``key`` is
+        passed, the value of that single keyword argument. Items are
+        sent in chunks of ``chunksize`` (see ``Portal.run_many()``).
+
+        Use as ``async with group.imap(...) as results:``; leaving the
+        block early cancels any outstanding calls.
+        """
+        return self._imap(func, items, key, chunksize, ordered=True)
+
+    def imap_unordered(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        *,
+        key: Optional[str] = None,
+        chunksize: int = 1,
+    ) -> typing.AsyncContextManager[AsyncIterator[Any]]:
+        """Like ``imap()`` but deliver results as they complete.
+        """
+        return self._imap(func, items, key, chunksize, ordered=False)
+
+    async def map(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        *,
+        key: Optional[str] = None,
+        chunksize: int = 1,
+    ) -> List[Any]:
+        """Call ``func`` once per item across the group and return all
+        results in input order, see ``imap()``.
+        """
+        async with self.imap(
+            func, items, key=key, chunksize=chunksize,
+        ) as results:
+            return [result async for result in results]
+
@@ -1,65 +1,676 @@
 """
 Inter-process comms abstractions
 """
+from collections import deque
+import importlib.util
+import os
+import platform
+import socket
+import sys
+import tempfile
 import typing
-from typing import Any, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from functools import partial
+from dataclasses import dataclass
 
 import msgpack
 import trio
 from async_generator import asynccontextmanager
 
 from .log import get_logger
+from . import _state
 log = get_logger('ipc')
 
-# :eyeroll:
-try:
-    import msgpack_numpy
-    Unpacker = msgpack_numpy.Unpacker
-except ImportError:
-    # just plain ``msgpack`` requires tweaking key settings
+
+def _decode_ndarray(obj: Dict[Any, Any]) -> Any:
+    """``msgpack`` object hook decoding arrays packed by ``msgpack_numpy``
+    which (along with ``numpy``) is only imported once one arrives.
+    """
+    if b'nd' in obj:
+        import msgpack_numpy
+        return msgpack_numpy.decode(obj)
+
+    return obj
+
+
+# just plain ``msgpack`` requires tweaking key settings; arrays are only
+# decoded if ``msgpack_numpy`` is installed (without importing it here)
+if importlib.util.find_spec('msgpack_numpy') is not None:
+    Unpacker = partial(
+        msgpack.Unpacker, strict_map_key=False, object_hook=_decode_ndarray)
+else:
     Unpacker = partial(msgpack.Unpacker, strict_map_key=False)
 
 
+# Same-host connections are transparently made over a unix domain
+# socket which every actor binds next to its tcp listener (see
+# ``Actor._serve_forever()``).
+_uds_enabled: bool = (
+    hasattr(socket, 'AF_UNIX') and platform.system() != 'Windows'
+)
+# hosts for which we assume the far end is on the local machine
+_local_hosts = {'127.0.0.1', 'localhost', '::1', '0.0.0.0', '::'}
+
+
+def is_local_host(host: str) -> bool:
+    """Predicate which is true for loopback and wildcard hosts.
+    """
+    return host in _local_hosts or host.startswith('127.')
+
+
+def uds_path(host: str, port: int) -> str:
+    """Return the unix socket path for an actor listening on tcp
+    ``(host, port)``.
+
+    Every loopback/wildcard host maps to the same path such that an
+    actor bound on eg. ``0.0.0.0`` is found by a peer dialing
+    ``127.0.0.1``. On linux the abstract namespace is used so nothing
+    is ever left behind on the filesystem.
+    """
+    if is_local_host(host):
+        host = 'local'
+    name = f'tractor-{host}-{port}'
+    if platform.system() == 'Linux':
+        return '\0' + name
+    return os.path.join(tempfile.gettempdir(), name + '.sock')
+
+
+async def open_uds_listener(path: str) -> trio.SocketListener:
+    """Bind and listen on a unix domain socket at ``path``.
+    """
+    if not path.startswith('\0') and os.path.exists(path):
+        # stale socket file from some previous (crashed) actor
+        os.unlink(path)
+
+    sock = trio.socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        await sock.bind(path)
+        sock.listen(socket.SOMAXCONN)
+    except OSError:
+        sock.close()
+        raise
+
+    return trio.SocketListener(sock)
+
+
+def _sockname(addr: Any) -> Tuple[Any, ...]:
+    """Normalize a socket name to a tuple.
+
+    IP sockets are truncated to ``(host, port)``, unix sockets become
+    a 1-tuple of the path (abstract names are prefixed with ``@``).
+    """
+    if isinstance(addr, tuple):
+        return addr[:2]
+    if isinstance(addr, bytes):
+        addr = addr.decode(errors='replace')
+    return (addr.replace('\0', '@', 1),)
+
+
+# receive buffer sizing: reads start small (most msgs are tiny) and
+# grow (by doubling) while the socket keeps filling the whole buffer,
+# i.e. under sustained load, up to ``_max_read``.
+_min_read: int = 2**12  # 4 KiB
+_max_read: int = 2**20  # 1 MiB
+# number of consecutive "mostly empty" reads before the read size is
+# halved again
+_shrink_after: int = 8
+
+# upper bound on the unpacker's internal buffer; a single msg larger
+# than this will error with ``msgpack.BufferFull``.
+_max_buffer_size: int = 2**27  # 128 MiB
+
+
+@dataclass
+class RecvStats:
+    """Receive side counters for a single ``MsgpackStream``.
+    """
+    reads: int = 0
+    bytes_received: int = 0
+    msgs_received: int = 0
+    # current (adaptive) size passed to ``receive_some()``
+    read_size: int = _min_read
+    # largest single read seen so far
+    max_read: int = 0
+
+
+# send side write coalescing: frames queued by concurrent senders while
+# a write is in flight are flushed together by the next write. A flush
+# may optionally be delayed (to let more frames queue up) until
+# ``_flush_max_bytes`` are pending; larger batches are written
+# scatter-gather instead of being joined into a single buffer.
+_flush_delay: float = 0
+_flush_max_bytes: int = 2**16  # 64 KiB
+
+
+@dataclass
+class SendStats:
+    """Send side counters for a single ``MsgpackStream``.
+    """
+    writes: int = 0
+    bytes_sent: int = 0
+    msgs_sent: int = 0
+
+
+# Out-of-band (OOB) buffers: large ``bytes``/``bytearray``/``memoryview``
+# and (contiguous) ``numpy.ndarray`` payloads are not copied into the
+# msgpack frame. Instead each is replaced by a small ext type reference
+# and its raw bytes are written (scatter-gather) directly after the
+# frame; the receiver reads them straight into preallocated buffers and
+# hands them out as ``memoryview``s / ``ndarray`` views. A frame carrying
+# OOB buffers is preceded by a header ext listing the buffer lengths.
+#
+# Since large buffers then arrive as ``memoryview``s (instead of
+# ``bytes``) this is opt-in per actor tree, see the ``oob_buffers``
+# flag to ``open_root_actor()``. The ext codes are taken from the top
+# of the application range to stay clear of user defined ext types.
+_EXT_OOB_HEADER = 125
+_EXT_OOB_BUFFER = 126
+_EXT_OOB_NDARRAY = 127
+
+# payloads smaller than this are packed inline as usual
+_oob_threshold: int = 2**16  # 64 KiB
+# how far into (small) containers the sender looks for large buffers;
+# large containers are never walked to keep the common path cheap.
+_oob_max_depth: int = 3
+_oob_max_width: int = 32
+
+_buffer_types = (bytes, bytearray, memoryview)
+
+# max number of iovecs handed to a single ``sendmsg()``
+_iov_max: int = 512
+
+# yielded by the unpacker in place of an OOB header
+_oob_header = object()
+
+
+def _nbytes(buf: Any) -> int:
+    return buf.nbytes if type(buf) is memoryview else len(buf)
+
+
+def _extract_oob(
+    obj: Any,
+    bufs: List[Any],
+    threshold: int,
+    depth: int = 0,
+) -> Any:
+    """Return ``obj`` with large byte buffers (appended to ``bufs``)
+    swapped out for OOB references; containers are copied only if
+    something inside them was swapped.
+    """
+    t = type(obj)
+    if t in _buffer_types:
+        if _nbytes(obj) < threshold or (
+            t is memoryview and not obj.c_contiguous
+        ):
+            return obj
+        bufs.append(obj)
+        return msgpack.ExtType(_EXT_OOB_BUFFER, msgpack.packb(len(bufs) - 1))
+
+    if depth >= _oob_max_depth:
+        return obj
+
+    if t is dict:
+        if len(obj) > _oob_max_width:
+            return obj
+        out = None
+        for key, value in obj.items():
+            new = _extract_oob(value, bufs, threshold, depth + 1)
+            if new is not value:
+                if out is None:
+                    out = dict(obj)
+                out[key] = new
+        return obj if out is None else out
+
+    if t is tuple or t is list:
+        if len(obj) > _oob_max_width:
+            return obj
+        items = None
+        for i, value in enumerate(obj):
+            new = _extract_oob(value, bufs, threshold, depth + 1)
+            if new is not value:
+                if items is None:
+                    items = list(obj)
+                items[i] = new
+        return obj if items is None else t(items)
+
+    return obj
+
+
+# Compact wire protocol: once negotiated during the handshake (see
+# ``Actor._do_handshake()``) the runtime's protocol msgs are sent as
+# fixed position ``(code, cid, payload)`` tuples instead of string keyed
+# dicts. The caller's uid is not repeated in ``'cmd'`` msgs since the
+# far end already knows it from the handshake. Any other msg is sent
+# wrapped as a ``_MSG_RAW`` tuple and ``None`` (the msg loop terminate
+# sentinel) is sent as is.
+#
+# The runtime builds and dispatches these tuples directly (see
+# ``Channel.send_msg()`` and ``Actor._process_messages()``) and they're
+# also what's queued for local callers; msgs from peers speaking the
+# original protocol are converted on receipt with ``encode_compact()``.
+#
+# Versions:
+# - 0: original string keyed dict msgs
+# - 1: compact msgs
+# - 2: compact msgs without the ``'functype'`` ack for regular async
+#   functions; their result is implied by the first response msg
+# - 3: credit based (per stream) flow control, see
+#   ``Portal.open_stream_from()``
+# - 4: no ``'functype'`` ack for streams either; the first ``'yield'``,
+#   ``'stop'`` or ``'error'`` msg doubles as the ack and is checked by
+#   the consumer (see ``ReceiveMsgStream.receive()``)
+_proto_version: int = 4
+_proto_implicit_functype: int = 2
+_proto_flow_control: int = 3
+_proto_implicit_stream_ack: int = 4
+
+_MSG_CMD = 0
+_MSG_FUNCTYPE = 1
+_MSG_YIELD = 2
+_MSG_STOP = 3
+_MSG_RETURN = 4
+_MSG_ERROR = 5
+_MSG_RAW = 6
+_MSG_WINDOW = 7
+_MSG_CREDIT = 8
+
+# msg key -> code for the ``{key: payload, 'cid': cid}`` style msgs
+_msg_codes: Dict[str, int] = {
+    'yield': _MSG_YIELD,
+    'return': _MSG_RETURN,
+    'functype': _MSG_FUNCTYPE,
+    'stop': _MSG_STOP,
+    'error': _MSG_ERROR,
+    'window': _MSG_WINDOW,
+    'credit': _MSG_CREDIT,
+}
+_msg_keys: Dict[int, str] = {
+    code: key for key, code in _msg_codes.items()}
+
+
+def encode_compact(msg: Any) -> Any:
+    """Convert a protocol msg to its compact wire form.
+    """
+    if type(msg) is dict:
+        if len(msg) == 2 and 'cid' in msg:
+            for key, value in msg.items():
+                if key != 'cid':
+                    code = _msg_codes.get(key)
+                    if code is not None:
+                        return (code, msg['cid'], value)
+
+        elif len(msg) == 1:
+            if 'cmd' in msg:
+                ns, func, kwargs, _, cid = msg['cmd']
+                return (_MSG_CMD, cid, (ns, func, kwargs))
+
+            if 'error' in msg:
+                # internal error not associated with any rpc task
+                return (_MSG_ERROR, None, msg['error'])
+
+    elif msg is None:
+        return None
+
+    return (_MSG_RAW, None, msg)
+
+
+def decode_compact(
+    msg: Any,
+    uid: Optional[Tuple[str, str]],
+) -> Any:
+    """Convert a compact wire msg, received from the actor with ``uid``,
+    back to its (dict) protocol msg form.
+    """
+    if msg is None:
+        return None
+
+    code, cid, payload = msg
+    if code == _MSG_RAW:
+        return payload
+
+    if code == _MSG_CMD:
+        ns, func, kwargs = payload
+        return {'cmd': (ns, func, kwargs, uid, cid)}
+
+    if cid is None:
+        return {_msg_keys[code]: payload}
+
+    return {_msg_keys[code]: payload, 'cid': cid}
+
+
+def pack_envelope(
+    cid: Any,
+    key: str = 'yield',
+    compact: bool = False,
+) -> bytes:
+    """Pre-encode the constant part of a ``{'cid': cid, key: item}`` msg.
+
+    Sending ``item`` with this envelope (see ``Channel.send()``) only
+    packs the item itself; handy for streams which send many frames
+    with the same ``cid``.
+    """
+    packer = msgpack.Packer(use_bin_type=True)
+    if compact:
+        return (
+            packer.pack_array_header(3) +
+            packer.pack(_msg_codes[key]) + packer.pack(cid)
+        )
+
+    return (
+        packer.pack_map_header(2) +
+        packer.pack('cid') + packer.pack(cid) +
+        packer.pack(key)
+    )
+
+
 class MsgpackStream:
     """A ``trio.SocketStream`` delivering ``msgpack`` formatted data.
     """
-    def __init__(self, stream: trio.SocketStream) -> None:
+    def __init__(
+        self,
+        stream: trio.SocketStream,
+        max_buffer_size: int = _max_buffer_size,
+    ) -> None:
         self.stream = stream
         assert self.stream.socket
-        # should both be IP sockets
-        lsockname = stream.socket.getsockname()
-        assert isinstance(lsockname, tuple)
-        self._laddr = lsockname[:2]
-        rsockname = stream.socket.getpeername()
-        assert isinstance(rsockname, tuple)
-        self._raddr = rsockname[:2]
+        # either IP or unix sockets
+        self._laddr = _sockname(stream.socket.getsockname())
+        self._raddr = _sockname(stream.socket.getpeername())
 
+        self._max_buffer_size = max_buffer_size
+        self.stats = RecvStats()
+        # set (to a byte size) once the far end is known to understand
+        # OOB buffers, see ``Actor._do_handshake()``
+        self.oob_threshold: Optional[int] = None
+        self._oob_out: List[Any] = []
+        self._oob_in: List[bytearray] = []
+        # one packer (and its internal buffer) reused for every send
+        self._packer = msgpack.Packer(
+            use_bin_type=True,
+            default=self._default,
+        )
+        self._unpacker = Unpacker(
+            raw=False,
+            use_list=False,
+            max_buffer_size=max_buffer_size,
+            ext_hook=self._ext_hook,
+        )
+        # decoded msgs not yet handed out, see ``.recv_batch()``
+        self._ready: typing.Deque[Any] = deque()
+        # OOB buffers for the next msg to decode
+        self._oob_next: Optional[List[bytearray]] = None
+        self._underfilled = 0
         self._agen = self._iter_packets()
         self._send_lock = trio.StrictFIFOLock()
 
+        # write coalescing, see ``.send()``
+        self.flush_delay: float = _flush_delay
+        self.flush_max_bytes: int = _flush_max_bytes
+        self.send_stats = SendStats()
+        # frames (lists of segments) waiting to be written
+        self._pending: List[List[Any]] = []
+        self._pending_bytes: int = 0
+        # bytes of the current batch written so far, see ``._flush()``
+        self._written: Optional[int] = 0
+        # sequence numbers of the last frame queued and written
+        self._queued: int = 0
+        self._flushed: int = 0
+        self._send_err: Optional[BaseException] = None
+
+    def _default(self, obj: Any) -> Any:
+        """``msgpack`` fallback encoder for (numpy) arrays.
+        """
+        np = sys.modules.get('numpy')
+        if np is not None and isinstance(obj, np.ndarray):
+            threshold = self.oob_threshold
+            if (
+                threshold is not None
+                and obj.nbytes >= threshold
+                and obj.flags.c_contiguous
+                and not obj.dtype.hasobject
+            ):
+                self._oob_out.append(obj)
+                return msgpack.ExtType(
+                    _EXT_OOB_NDARRAY,
+                    msgpack.packb(
+                        (len(self._oob_out) - 1, obj.dtype.str, obj.shape)),
+                )
+            try:
+                import msgpack_numpy
+            except ImportError:
+                pass
+            else:
+                return msgpack_numpy.encode(obj)
+
+        raise TypeError(f"can not serialize {type(obj).__name__!r} object")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == _EXT_OOB_BUFFER:
+            return memoryview(self._oob_in[msgpack.unpackb(data)])
+
+        if code == _EXT_OOB_NDARRAY:
+            import numpy as np
+            index, dtype, shape = msgpack.unpackb(data)
+            return np.frombuffer(
+                self._oob_in[index], dtype=dtype).reshape(shape)
+
+        if code == _EXT_OOB_HEADER:
+            self._oob_in = [bytearray(n) for n in msgpack.unpackb(data)]
+            return _oob_header
+
+        return msgpack.ExtType(code, data)
+
+    def _encode(self, data: Any, envelope: bytes = b'') -> List[Any]:
+        """Pack ``data`` (appended to a pre-encoded ``envelope`` if
+        provided) into a list of byte segments to send.
+        """
+        threshold = self.oob_threshold
+        if threshold is None:
+            return [envelope + self._packer.pack(data)]
+
+        bufs = self._oob_out = []
+        data = _extract_oob(data, bufs, threshold, depth=1 if envelope else 0)
+        frame = envelope + self._packer.pack(data)
+        if not bufs:
+            return [frame]
+
+        self._oob_out = []
+        views = [memoryview(buf).cast('B') for buf in bufs]
+        header = self._packer.pack(msgpack.ExtType(
+            _EXT_OOB_HEADER, msgpack.packb([len(v) for v in views])))
+        return [header, frame, *views]
+
+    async def _send_segments(self, segments: List[Any]) -> None:
+        """Write all ``segments`` using scatter-gather io if possible.
+
+        The number of bytes which made it to the wire is tracked in
+        ``._written`` (``None`` if the stream can't tell) such that
+        a cancelled write can be handled, see ``._flush()``.
+        """
+        stream = self.stream
+        if not isinstance(stream, trio.SocketStream):
+            # only known for streams which count what they wrote, see
+            # ``ShmStream.bytes_sent``
+            start = getattr(stream, 'bytes_sent', None)
+            try:
+                for seg in segments:
+                    await stream.send_all(seg)
+            finally:
+                self._written = (
+                    None if start is None else stream.bytes_sent - start)
+            return
+
+        sock = stream.socket
+        if sock.fileno() == -1:
+            raise trio.ClosedResourceError("Stream was closed")
+
+        sendmsg = getattr(sock, 'sendmsg', None)
+        views = [memoryview(seg) for seg in segments]
+        written = self._written = 0
+        i = 0
+        while i < len(views):
+            try:
+                if sendmsg is not None:
+                    sent = await sendmsg(views[i:i + _iov_max])
+                else:
+                    sent = await sock.send(views[i])
+            except OSError as err:
+                raise trio.BrokenResourceError from err
+            written += sent
+            self._written = written
+            # advance past whatever was (partially) written
+            while sent:
+                n = len(views[i])
+                if sent >= n:
+                    sent -= n
+                    i += 1
+                else:
+                    views[i] = views[i][sent:]
+                    sent = 0
+
+    async def _recv_into(self, view: memoryview) -> int:
+        if isinstance(self.stream, trio.SocketStream):
+            try:
+                return await self.stream.socket.recv_into(view)
+            except OSError as err:
+                raise trio.BrokenResourceError from err
+
+        data = await self.stream.receive_some(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    async def _recv_oob(
+        self,
+        unpacker: msgpack.Unpacker,
+        bufs: List[bytearray],
+    ) -> bool:
+        """Fill the OOB ``bufs`` for the last unpacked msg first from
+        what the unpacker has already buffered then from the stream.
+
+        Return ``False`` if the stream closed mid-way.
+        """
+        stats = self.stats
+        for buf in bufs:
+            view = memoryview(buf)
+            size = len(view)
+            data = unpacker.read_bytes(size)
+            pos = len(data)
+            view[:pos] = data
+            while pos < size:
+                n = await self._recv_into(view[pos:])
+                if not n:
+                    return False
+                stats.reads += 1
+                stats.bytes_received += n
+                pos += n
+        return True
+
+    async def _read(self) -> bytes:
+        """Read the next chunk from the stream adapting the read size to
+        the current load: grow while reads come back full, shrink after
+        a run of small ones.
+
+        Return ``b''`` if the stream was closed.
+        """
+        stats = self.stats
+        read_size = stats.read_size
+        try:
+            data = await self.stream.receive_some(read_size)
+            if _state._log_hot_path:
+                log.trace("received %s", data)  # type: ignore
+        except trio.BrokenResourceError:
+            log.warning(f"Stream connection {self.raddr} broke")
+            return b''
+
+        if data == b'':
+            log.debug(f"Stream connection {self.raddr} was closed")
+            return b''
+
+        n = len(data)
+        stats.reads += 1
+        stats.bytes_received += n
+        if n > stats.max_read:
+            stats.max_read = n
+
+        if n == read_size:
+            self._underfilled = 0
+            if read_size < _max_read:
+                stats.read_size = read_size * 2
+
+        elif n < read_size // 4 and read_size > _min_read:
+            self._underfilled += 1
+            if self._underfilled >= _shrink_after:
+                self._underfilled = 0
+                stats.read_size = read_size // 2
+        else:
+            self._underfilled = 0
+
+        return data
+
+    async def _fill(self) -> bool:
+        """Decode at least one msg into the ready queue, reading from the
+        stream as needed; every msg decodable from what's been read is
+        queued such that a burst of frames is handled as one batch.
+
+        Return ``False`` if the stream was closed.
+        """
+        unpacker = self._unpacker
+        ready = self._ready
+        count = len(ready)
+        while True:
+            for packet in unpacker:
+                if packet is _oob_header:
+                    self._oob_next = self._oob_in
+                    continue
+
+                oob = self._oob_next
+                if oob is not None:
+                    try:
+                        filled = await self._recv_oob(unpacker, oob)
+                    except trio.BrokenResourceError:
+                        filled = False
+                    if not filled:
+                        log.warning(
+                            f"Stream connection {self.raddr} closed while "
+                            "receiving out-of-band buffers")
+                        return False
+                    self._oob_next = None
+
+                ready.append(packet)
+
+            if len(ready) > count:
+                self.stats.msgs_received += len(ready) - count
+                return True
+
+            data = await self._read()
+            if not data:
+                return False
+
+            unpacker.feed(data)
+
+    async def recv_batch(self) -> List[Any]:
+        """Receive all msgs which can be decoded from the data read so far
+        (reading from the stream only if there are none).
+
+        An empty list is returned once the stream has closed.
+        """
+        ready = self._ready
+        if not ready and not await self._fill():
+            return []
+
+        batch = list(ready)
+        ready.clear()
+        return batch
+
     async def _iter_packets(self) -> typing.AsyncGenerator[dict, None]:
         """Yield packets from the underlying stream.
         """
-        unpacker = Unpacker(
-            raw=False,
-            use_list=False,
-        )
+        ready = self._ready
         while True:
-            try:
-                data = await self.stream.receive_some(2**10)
-                log.trace(f"received {data}")  # type: ignore
-            except trio.BrokenResourceError:
-                log.warning(f"Stream connection {self.raddr} broke")
+            if not ready and not await self._fill():
                 return
 
-            if data == b'':
-                log.debug(f"Stream connection {self.raddr} was closed")
-                return
-
-            unpacker.feed(data)
-            for packet in unpacker:
-                yield packet
+            yield ready.popleft()
 
     @property
     def laddr(self) -> Tuple[Any, ...]:
@@ -69,11 +680,105 @@ class MsgpackStream:
     def raddr(self) -> Tuple[Any, ...]:
         return self._raddr
 
+    def _check_send_err(self) -> None:
+        err = self._send_err
+        if err is not None:
+            raise type(err)(f"Previous send failed with {err!r}") from err
+
+    async def _flush(self) -> None:
+        """Write all pending frames in as few syscalls as possible.
+        """
+        if self.flush_delay and self._pending_bytes < self.flush_max_bytes:
+            # let other senders queue up a bigger batch
+            await trio.sleep(self.flush_delay)
+
+        frames, nbytes = self._pending, self._pending_bytes
+        self._pending, self._pending_bytes = [], 0
+        queued = self._queued
+        if not frames:
+            return
+
+        segments = [seg for frame in frames for seg in frame]
+        if len(segments) > 1 and nbytes <= self.flush_max_bytes and all(
+            type(seg) is bytes for seg in segments
+        ):
+            segments = [b''.join(segments)]
+
+        self._written = 0
+        try:
+            await self._send_segments(segments)
+        except trio.Cancelled:
+            written = self._written
+            if written == 0:
+                # nothing hit the wire; leave the batch for the next
+                # sender to flush
+                self._pending[:0] = frames
+                self._pending_bytes += nbytes
+                raise
+
+            if written != nbytes:
+                # the rest of a partially written frame can't be sent
+                # by a later write without corrupting the stream
+                self._send_err = trio.BrokenResourceError(
+                    f"Send was cancelled after {written}/{nbytes} bytes")
+                await trio.aclose_forcefully(self.stream)
+                raise
+
+            self._count_flushed(len(frames), nbytes, queued)
+            raise
+
+        except (trio.BrokenResourceError, trio.ClosedResourceError) as err:
+            # frames queued by other (waiting) senders were lost too
+            self._send_err = err
+            raise
+
+        self._count_flushed(len(frames), nbytes, queued)
+
+    def _count_flushed(self, frames: int, nbytes: int, queued: int) -> None:
+        stats = self.send_stats
+        stats.writes += 1
+        stats.bytes_sent += nbytes
+        stats.msgs_sent += frames
+        self._flushed = queued
+
+    def _discard(self, frame: List[Any]) -> None:
+        """Remove a not yet written ``frame`` from the pending batch.
+        """
+        for i, pending in enumerate(self._pending):
+            if pending is frame:
+                del self._pending[i]
+                self._pending_bytes -= sum(map(_nbytes, frame))
+                return
+
     # XXX: should this instead be called `.sendall()`?
-    async def send(self, data: Any) -> None:
-        async with self._send_lock:
-            return await self.stream.send_all(
-                msgpack.dumps(data, use_bin_type=True))
+    async def send(self, data: Any, envelope: bytes = b'') -> None:
+        """Queue ``data`` for sending and wait until it is written.
+
+        Whichever sender finds the stream idle flushes every frame queued
+        so far (including those of any senders waiting behind it) so
+        under load many msgs are coalesced into a single write.
+
+        If cancelled, the frame is dropped unless it was already (being)
+        written as part of another sender's batch. A write cancelled
+        part way through a frame breaks the stream.
+        """
+        self._check_send_err()
+        frame = self._encode(data, envelope)
+        self._pending.append(frame)
+        self._pending_bytes += sum(map(_nbytes, frame))
+        self._queued += 1
+        seq = self._queued
+
+        try:
+            async with self._send_lock:
+                if self._flushed >= seq:
+                    # written as part of an earlier sender's batch
+                    return
+                self._check_send_err()
+                await self._flush()
+        except BaseException:
+            self._discard(frame)
+            raise
 
     async def recv(self) -> Any:
         return await self._agen.asend(None)
@@ -88,7 +793,9 @@ class MsgpackStream:
 class Channel:
     """An inter-process channel for communication between (remote) actors.
 
-    Currently the only supported transport is a ``trio.SocketStream``.
+    Currently the only supported transport is a ``trio.SocketStream``
+    which is connected over a unix domain socket when the far end is on
+    the same host and over tcp otherwise.
     """
     def __init__(
         self,
@@ -106,6 +813,18 @@ class Channel:
                 f"A stream was provided with local addr {self.laddr}"
             )
         self._destaddr = self.msgstream.raddr if self.msgstream else destaddr
+        if self._destaddr is not None and len(self._destaddr) != 2:
+            # accepted over a unix socket; the peer's tcp address is
+            # only learned on handshake (see ``Actor._do_handshake()``)
+            self._destaddr = None
+        # set when this end established the connection
+        self._initiator: bool = False
+        # transport/protocol capabilities of the far end, set after
+        # handshake
+        self.peer_caps: Dict[str, Any] = {}
+        # wire protocol version in use, 0 is the original dict msgs and
+        # anything higher the compact encoding; set after handshake
+        self.proto: int = 0
         # set after handshake - always uid of far end
         self.uid: Optional[Tuple[str, str]] = None
         # set if far end actor errors internally
@@ -123,6 +842,18 @@ class Channel:
     def laddr(self) -> Optional[Tuple[Any, ...]]:
         return self.msgstream.laddr if self.msgstream else None
 
+    @property
+    def stats(self) -> Optional[RecvStats]:
+        """Receive stats for the underlying msg stream (if connected).
+        """
+        return self.msgstream.stats if self.msgstream else None
+
+    @property
+    def send_stats(self) -> Optional[SendStats]:
+        """Send stats for the underlying msg stream (if connected).
+        """
+        return self.msgstream.send_stats if self.msgstream else None
+
     @property
     def raddr(self) -> Optional[Tuple[Any, ...]]:
         return self.msgstream.raddr if self.msgstream else None
@@ -135,24 +866,109 @@ class Channel:
             raise RuntimeError("channel is already connected?")
         destaddr = destaddr or self._destaddr
         assert isinstance(destaddr, tuple)
-        stream = await trio.open_tcp_stream(*destaddr, **kwargs)
+        stream = await self._maybe_connect_uds(destaddr)
+        if stream is None:
+            stream = await trio.open_tcp_stream(*destaddr, **kwargs)
         self.msgstream = MsgpackStream(stream)
+        self._initiator = True
+        # (re)negotiated on handshake
+        self.proto = 0
         return stream
 
-    async def send(self, item: Any) -> None:
-        log.trace(f"send `{item}`")  # type: ignore
+    async def _maybe_connect_uds(
+        self,
+        destaddr: Tuple[Any, ...],
+    ) -> Optional[trio.SocketStream]:
+        """Attempt a unix socket connection to a local peer, return
+        ``None`` if the peer is remote or not listening on one.
+        """
+        host, port = destaddr
+        if not (_uds_enabled and is_local_host(host)):
+            return None
+        try:
+            return await trio.open_unix_socket(uds_path(host, port))
+        except OSError:
+            log.debug(f"No unix socket for {destaddr}, falling back to tcp")
+            return None
+
+    def pack_envelope(self, cid: Any, key: str = 'yield') -> bytes:
+        """Pre-encode a msg envelope for the wire protocol in use.
+        """
+        return pack_envelope(cid, key, compact=bool(self.proto))
+
+    async def send(self, item: Any, envelope: bytes = b'') -> None:
+        if _state._log_hot_path:
+            log.trace("send `%s`", item)  # type: ignore
+        assert self.msgstream
+        if self.proto and not envelope:
+            item = encode_compact(item)
+        await self.msgstream.send(item, envelope)
+
+    async def send_msg(self, key: str, cid: Any, payload: Any) -> None:
+        """Send the runtime protocol msg ``{key: payload, 'cid': cid}``.
+
+        With the compact protocol the wire tuple is built directly
+        instead of first building (and then converting) the dict.
+        """
+        if _state._log_hot_path:
+            log.trace("send `%s` %s for %s", key, payload, cid)  # type: ignore
+        assert self.msgstream
+        if self.proto:
+            await self.msgstream.send((_msg_codes[key], cid, payload))
+        else:
+            await self.msgstream.send({key: payload, 'cid': cid})
+
+    async def send_cmd(
+        self,
+        cid: Any,
+        ns: str,
+        func: str,
+        kwargs: Dict[str, Any],
+        uid: Tuple[str, str],
+    ) -> None:
+        """Send a ``'cmd'`` (rpc request) msg from the actor with ``uid``.
+        """
         assert self.msgstream
-        await self.msgstream.send(item)
+        if self.proto:
+            await self.msgstream.send((_MSG_CMD, cid, (ns, func, kwargs)))
+        else:
+            await self.msgstream.send({'cmd': (ns, func, kwargs, uid, cid)})
 
     async def recv(self) -> Any:
         assert self.msgstream
         try:
-            return await self.msgstream.recv()
+            msg = await self.msgstream.recv()
+            if self.proto:
+                return decode_compact(msg, self.uid)
+            return msg
         except trio.BrokenResourceError:
             if self._autorecon:
                 await self._reconnect()
                 return await self.recv()
 
+    async def recv_batch(self) -> List[Any]:
+        """Receive the next batch of (one or more) msgs, see
+        ``MsgpackStream.recv_batch()``.
+
+        This is the receive path used by the actor msg loop: there are
+        no (async) generator layers to resume per msg and msgs are
+        returned in their wire form, i.e. as compact tuples if
+        ``.proto`` is set (see ``decode_compact()``). An empty list is
+        returned once the channel has closed (and can't be reconnected).
+        """
+        while True:
+            assert self.msgstream
+            msgs = await self.msgstream.recv_batch()
+            if msgs:
+                return msgs
+
+            await self.aclose()
+
+            if not self._autorecon:
+                return msgs
+
+            await self._reconnect()
+
     async def aclose(self) -> None:
         log.debug(f"Closing {self}")
         assert self.msgstream
@@ -206,6 +1022,8 @@ class Channel:
         while True:
             try:
                 async for item in self.msgstream:
+                    if self.proto:
+                        item = decode_compact(item, self.uid)
                     yield item
                     # sent = yield item
                     # if sent is not None:
@@ -228,6 +1046,17 @@ class Channel:
     def connected(self) -> bool:
         return self.msgstream.connected() if self.msgstream else False
 
+    def is_local(self) -> bool:
+        """Predicate which is true when the far end is on this host.
+        """
+        if not self.msgstream:
+            return False
+        sock = self.msgstream.stream.socket
+        if getattr(socket, 'AF_UNIX', None) == sock.family:
+            return True
+        raddr = self.raddr
+        return bool(raddr) and is_local_host(raddr[0])
+
 
 @asynccontextmanager
 async def _connect_chan(
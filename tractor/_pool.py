@@ -0,0 +1,453 @@
+"""
+A pool of worker actors fed from a shared job queue.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+import os
+import typing
+from typing import (
+    Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional,
+)
+
+import outcome
+import trio
+from async_generator import asynccontextmanager
+
+from ._portal import Portal
+from ._trionics import open_nursery
+from .log import get_logger
+
+
+log = get_logger(__name__)
+
+
+@dataclass
+class _Job:
+    func: Callable
+    kwargs: Dict[str, Any]
+    done: trio.Event = field(default_factory=trio.Event)
+    result: Optional[outcome.Outcome] = None
+    # the submitter stopped waiting on the result
+    abandoned: bool = False
+    queued_at: float = 0
+
+    def finish(self, result: outcome.Outcome) -> None:
+        self.result = result
+        self.done.set()
+
+
+@dataclass
+class _Worker:
+    name: str
+    portal: Portal
+    # jobs pulled ahead of time which other (idle) workers may steal
+    backlog: Deque[_Job] = field(default_factory=deque)
+    running: int = 0
+    completed: int = 0
+    # moving average of the job run time (seconds)
+    latency: Optional[float] = None
+    idle_since: float = 0
+    cancel_scope: trio.CancelScope = field(default_factory=trio.CancelScope)
+
+
+# weight of the latest sample in the job latency and wait averages
+_ewma_alpha: float = 0.2
+
+
+def _ewma(avg: Optional[float], sample: float) -> float:
+    if avg is None:
+        return sample
+    return avg + _ewma_alpha * (sample - avg)
+
+
+def _host_load() -> Optional[float]:
+    """The host's (1 min) load average per cpu, if known.
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):  # not available on this platform
+        return None
+
+
+@dataclass
+class ScalingPolicy:
+    """How an elastic ``WorkerPool`` grows from its initial workers up to
+    ``max_workers`` under load and shrinks back once idle.
+
+    A worker is added when there are more than ``max_pending`` jobs
+    waiting per worker or when a new job is expected to wait longer than
+    ``max_wait`` seconds (estimated from the workers' recent job
+    latencies), unless the host's load per cpu exceeds ``max_load``;
+    more processes won't help a saturated machine. Workers are added at
+    most once per ``up_cooldown`` and retired once they've been idle for
+    ``down_cooldown`` seconds.
+    """
+    max_workers: int
+    max_pending: float = 2
+    max_wait: float = 1
+    max_load: float = 1
+    up_cooldown: float = 1
+    down_cooldown: float = 10
+    # seconds between load checks
+    interval: float = 0.25
+
+
+@dataclass
+class PoolStats:
+    """A snapshot of a ``WorkerPool``'s job counts and throughput.
+    """
+    workers: int
+    submitted: int
+    completed: int
+    failed: int
+    # jobs taken from the backlog of another worker
+    stolen: int
+    # jobs waiting in the shared queue
+    queued: int
+    # jobs pulled ahead by workers but not yet started
+    backlogged: int
+    running: int
+    # completed jobs per second since the pool was opened
+    throughput: float
+    # moving average of the time jobs waited before starting (seconds)
+    wait: float
+    # workers added and retired by autoscaling
+    spawned: int
+    retired: int
+    # completed jobs per worker (name)
+    per_worker: Dict[str, int]
+
+
+class WorkerPool:
+    """A set of worker actors which pull jobs from a shared queue in the
+    parent, see ``open_worker_pool()``.
+
+    Each worker takes a new job only once it has capacity for it, along
+    with up to ``prefetch`` more jobs to hide the round trip. Those are
+    kept in the worker's backlog from which idle workers steal (the
+    most recently pulled) jobs such that none are stuck behind a slow
+    job while other workers have nothing to do.
+
+    The number of workers may vary with the load, see ``ScalingPolicy``.
+    """
+    def __init__(self, prefetch: int = 1, concurrency: int = 1) -> None:
+        if prefetch < 0:
+            raise ValueError(f"Prefetch must not be negative: {prefetch}")
+
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be positive: {concurrency}")
+
+        self.prefetch = prefetch
+        self.concurrency = concurrency
+        self.closed = False
+        self._queue: Deque[_Job] = deque()
+        self._workers: Dict[str, _Worker] = {}
+        self._job_added = trio.Event()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._stolen = 0
+        self._spawned = 0
+        self._retired = 0
+        self._wait: Optional[float] = None
+        self._opened_at = trio.current_time()
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    @property
+    def portals(self) -> List[Portal]:
+        return [worker.portal for worker in self._workers.values()]
+
+    @property
+    def stats(self) -> PoolStats:
+        elapsed = trio.current_time() - self._opened_at
+        workers = self._workers.values()
+        return PoolStats(
+            workers=len(self._workers),
+            submitted=self._submitted,
+            completed=self._completed,
+            failed=self._failed,
+            stolen=self._stolen,
+            queued=len(self._queue),
+            backlogged=sum(len(w.backlog) for w in workers),
+            running=sum(w.running for w in workers),
+            throughput=self._completed / elapsed if elapsed else 0.,
+            wait=self._wait or 0.,
+            spawned=self._spawned,
+            retired=self._retired,
+            per_worker={w.name: w.completed for w in workers},
+        )
+
+    def _take_job(self, worker: _Worker) -> Optional[_Job]:
+        if worker.backlog:
+            return worker.backlog.popleft()
+
+        if self._queue:
+            job = self._queue.popleft()
+            for _ in range(min(self.prefetch, len(self._queue))):
+                worker.backlog.append(self._queue.popleft())
+            return job
+
+        # steal from whoever has fallen behind the most
+        victim = max(self._workers.values(), key=lambda w: len(w.backlog))
+        if victim.backlog:
+            self._stolen += 1
+            return victim.backlog.pop()
+
+        return None
+
+    async def _next_job(self, worker: _Worker) -> _Job:
+        while True:
+            job = self._take_job(worker)
+            if job is None:
+                # only replace the event once it fired such that a new
+                # job wakes *all* idle workers
+                if self._job_added.is_set():
+                    self._job_added = trio.Event()
+                await self._job_added.wait()
+
+            elif not job.abandoned:
+                return job
+
+    async def _work(self, worker: _Worker) -> None:
+        """Run jobs on ``worker`` one at a time, pulling the next one
+        only once the last has completed.
+        """
+        while True:
+            job = await self._next_job(worker)
+            worker.running += 1
+            start = trio.current_time()
+            self._wait = _ewma(self._wait, start - job.queued_at)
+            try:
+                value = await worker.portal.run(job.func, **job.kwargs)
+            except Exception as err:
+                self._failed += 1
+                job.finish(outcome.Error(err))
+            else:
+                job.finish(outcome.Value(value))
+            finally:
+                worker.running -= 1
+                if not job.done.is_set():
+                    # the worker task was cancelled
+                    job.finish(outcome.Error(trio.ClosedResourceError(
+                        f"{self} was closed before the job completed")))
+
+            now = worker.idle_since = trio.current_time()
+            worker.latency = _ewma(worker.latency, now - start)
+            self._completed += 1
+            worker.completed += 1
+
+    async def _run_worker(self, worker: _Worker) -> None:
+        with worker.cancel_scope:
+            async with trio.open_nursery() as n:
+                for _ in range(self.concurrency):
+                    n.start_soon(self._work, worker)
+
+    def _add_worker(self, nursery: trio.Nursery, portal: Portal) -> None:
+        name = portal.channel.uid[0]
+        worker = self._workers[name] = _Worker(
+            name, portal, idle_since=trio.current_time())
+        nursery.start_soon(self._run_worker, worker)
+
+    def _pending(self) -> int:
+        return len(self._queue) + sum(
+            len(w.backlog) for w in self._workers.values())
+
+    def _overloaded(self, policy: ScalingPolicy) -> bool:
+        pending = self._pending()
+        if pending > policy.max_pending * len(self._workers):
+            return True
+
+        latencies = [
+            w.latency for w in self._workers.values()
+            if w.latency is not None
+        ]
+        if not (pending and latencies):
+            return False
+
+        # time for the current workers to get through the pending jobs
+        latency = sum(latencies) / len(latencies)
+        slots = len(self._workers) * self.concurrency
+        return pending * latency / slots > policy.max_wait
+
+    async def _autoscale(
+        self,
+        policy: ScalingPolicy,
+        min_workers: int,
+        spawn: Callable[[], Awaitable[Portal]],
+        reap: Callable[[Portal], Awaitable[None]],
+        nursery: trio.Nursery,
+    ) -> None:
+        """Add workers (with ``spawn()``) while the pool is overloaded
+        and retire (and ``reap()``) idle ones, as per ``policy``.
+        """
+        last_added = trio.current_time()
+        while True:
+            await trio.sleep(policy.interval)
+            now = trio.current_time()
+            if (
+                len(self._workers) < policy.max_workers and
+                now - last_added >= policy.up_cooldown and
+                self._overloaded(policy)
+            ):
+                load = _host_load()
+                if load is None or load <= policy.max_load:
+                    self._add_worker(nursery, await spawn())
+                    self._spawned += 1
+                    last_added = trio.current_time()
+                    log.info(f"Scaled up to {len(self._workers)} workers")
+                    continue
+
+                log.debug(f"Not scaling up, host load is {load}")
+
+            if len(self._workers) <= min_workers or self._queue:
+                continue
+
+            idle = [
+                w for w in self._workers.values()
+                if not (w.running or w.backlog) and
+                now - w.idle_since >= policy.down_cooldown
+            ]
+            if idle:
+                worker = min(idle, key=lambda w: w.idle_since)
+                # (synchronously) stop the worker taking new jobs
+                del self._workers[worker.name]
+                worker.cancel_scope.cancel()
+                self._retired += 1
+                log.info(f"Retiring idle worker {worker.name}")
+                await reap(worker.portal)
+
+    def _close(self) -> None:
+        """Stop accepting jobs and fail those which never started.
+        """
+        self.closed = True
+        pending = list(self._queue)
+        self._queue.clear()
+        for worker in self._workers.values():
+            pending.extend(worker.backlog)
+            worker.backlog.clear()
+
+        for job in pending:
+            job.finish(outcome.Error(trio.ClosedResourceError(
+                f"{self} was closed before the job started")))
+
+    def _enqueue(self, func: Callable, kwargs: Dict[str, Any]) -> _Job:
+        if self.closed:
+            raise trio.ClosedResourceError(f"{self} is closed")
+
+        job = _Job(func, kwargs, queued_at=trio.current_time())
+        self._queue.append(job)
+        self._submitted += 1
+        self._job_added.set()
+        return job
+
+    async def _result(self, job: _Job) -> Any:
+        try:
+            await job.done.wait()
+        except BaseException:
+            # a queued job is skipped, a running one's result dropped
+            job.abandoned = True
+            raise
+
+        assert job.result
+        return job.result.unwrap()
+
+    async def submit(self, func: Callable, **kwargs) -> Any:
+        """Queue a call of ``func`` with ``kwargs`` and wait for its
+        result from whichever worker pulls it.
+        """
+        return await self._result(self._enqueue(func, kwargs))
+
+    async def map(
+        self,
+        func: Callable,
+        items: Iterable[Any],
+        *,
+        key: Optional[str] = None,
+    ) -> List[Any]:
+        """Submit a call of ``func`` per item and return all results in
+        input order.
+
+        Each item is the ``kwargs`` dict for a call or, if ``key`` is
+        passed, the value of that single keyword argument. All calls are
+        queued (in input order) up front.
+        """
+        jobs = [
+            self._enqueue(func, {key: item} if key is not None else item)
+            for item in items
+        ]
+        results: List[Any] = [None] * len(jobs)
+
+        async def wait(i: int, job: _Job) -> None:
+            results[i] = await self._result(job)
+
+        try:
+            async with trio.open_nursery() as n:
+                for i, job in enumerate(jobs):
+                    n.start_soon(wait, i, job)
+        finally:
+            for job in jobs:
+                job.abandoned = True
+
+        return results
+
+
+@asynccontextmanager
+async def open_worker_pool(
+    n: int,
+    *,
+    enable_modules: Optional[List[str]] = None,
+    name: str = 'worker',
+    concurrency: int = 1,
+    prefetch: int = 1,
+    loglevel: Optional[str] = None,
+    thread_limit: Optional[int] = None,
+    autoscale: Optional[ScalingPolicy] = None,
+    **kwargs,  # passed to ``open_nursery()``
+) -> typing.AsyncGenerator[WorkerPool, None]:
+    """Start ``n`` worker actors and yield a ``WorkerPool`` which runs
+    submitted jobs on them.
+
+    Each worker runs up to ``concurrency`` jobs at once (use more for
+    async, io bound funcs) and pulls ``prefetch`` jobs ahead, see
+    ``WorkerPool``. With an ``autoscale`` policy the pool grows up to
+    ``autoscale.max_workers`` under load and shrinks back to ``n``
+    workers once idle. All workers are cancelled on exit.
+    """
+    if n < 1:
+        raise ValueError(f"A worker pool needs at least one worker: {n}")
+
+    if autoscale is not None and autoscale.max_workers < n:
+        raise ValueError(
+            f"Max workers must be at least {n}: {autoscale.max_workers}")
+
+    async with open_nursery(**kwargs) as an:
+        pool = WorkerPool(prefetch=prefetch, concurrency=concurrency)
+        ids = count()
+
+        async def spawn() -> Portal:
+            return await an.start_actor(
+                f'{name}_{next(ids)}',
+                enable_modules=enable_modules,
+                loglevel=loglevel,
+                thread_limit=thread_limit,
+            )
+
+        async with trio.open_nursery() as tn:
+            for _ in range(n):
+                pool._add_worker(tn, await spawn())
+
+            if autoscale is not None:
+                tn.start_soon(
+                    pool._autoscale, autoscale, n, spawn, an._reap, tn)
+
+            try:
+                yield pool
+            finally:
+                pool._close()
+                tn.cancel_scope.cancel()
+
+        log.info(f"Worker pool stats: {pool.stats}")
+        await an.cancel()
@@ -4,8 +4,8 @@ Portal api
 import importlib
 import inspect
 from typing import (
-    Tuple, Any, Dict, Optional, Set,
-    Callable, AsyncGenerator
+    Tuple, Any, Dict, Optional, Set, List,
+    Callable, AsyncGenerator, AsyncIterator, Iterable,
 )
 from functools import partial
 from dataclasses import dataclass
@@ -15,10 +15,16 @@ import trio
 from async_generator import asynccontextmanager
 
 from ._state import current_actor
+from . import _ipc
 from ._ipc import Channel
 from .log import get_logger
 from ._exceptions import unpack_error, NoResult, RemoteActorError
-from ._streaming import Context, ReceiveMsgStream
+from ._streaming import (
+    Context,
+    ReceiveMsgStream,
+    _default_buffer_size,
+    _overflow_policies,
+)
 
 
 log = get_logger(__name__)
@@ -72,9 +78,13 @@ class Portal:
         # it is expected that ``result()`` will be awaited at some point
         # during the portal's lifetime
         self._result: Optional[Any] = None
+        # set once the "main" result (which may be ``None``) arrived,
+        # concurrent waiters share a single receive
+        self._result_lock = trio.Lock()
+        self._got_result: bool = False
         # set when _submit_for_result is called
         self._expect_result: Optional[
-            Tuple[str, Any, str, Dict[str, Any]]
+            Tuple[int, Any, str, Optional[Tuple[int, Any, Any]]]
         ] = None
         self._streams: Set[ReceiveMsgStream] = set()
         self.actor = current_actor()
@@ -84,30 +94,61 @@ class Portal:
         ns: str,
         func: str,
         kwargs,
-    ) -> Tuple[str, trio.abc.ReceiveChannel, str, Dict[str, Any]]:
+        functype: str = 'asyncfunc',
+        window: Optional[int] = None,
+        buffer_size: int = _default_buffer_size,
+        overflow: str = 'block',
+    ) -> Tuple[
+        int, trio.abc.ReceiveChannel, str, Optional[Tuple[int, Any, Any]]
+    ]:
         """Submit a function to be scheduled and run by actor, return the
         associated caller id, response queue, response type str,
         first message packet as a tuple.
 
+        With peers which don't ack the function type the expected
+        ``functype`` is returned right away (without a first msg) and is
+        instead checked against the first response received.
+
         This is an async call.
         """
         # ship a function call request to the remote actor
         cid, recv_chan = await self.actor.send_cmd(
-            self.channel, ns, func, kwargs)
+            self.channel, ns, func, kwargs,
+            window=window,
+            buffer_size=buffer_size,
+            overflow=overflow,
+        )
+
+        proto = self.channel.proto
+        if (
+            functype == 'asyncfunc' and
+            proto >= _ipc._proto_implicit_functype
+        ) or (
+            functype == 'asyncgen' and
+            proto >= _ipc._proto_implicit_stream_ack
+        ):
+            return cid, recv_chan, functype, None
 
         # wait on first response msg and handle (this should be
         # in an immediate response)
 
-        first_msg = await recv_chan.receive()
-        functype = first_msg.get('functype')
+        try:
+            first_msg = await recv_chan.receive()
+            code, _, payload = first_msg
 
-        if 'error' in first_msg:
-            raise unpack_error(first_msg, self.channel)
+            if code == _ipc._MSG_ERROR:
+                raise unpack_error({'error': payload}, self.channel)
 
-        elif functype not in ('asyncfunc', 'asyncgen', 'context'):
-            raise ValueError(f"{first_msg} is an invalid response packet?")
+            elif code != _ipc._MSG_FUNCTYPE or payload not in (
+                'asyncfunc', 'asyncgen', 'context'
+            ):
+                raise ValueError(
+                    f"{first_msg} is an invalid response packet?")
+        except BaseException:
+            self.actor.release_memchans(self.channel.uid, cid)
+            raise
 
-        return cid, recv_chan, functype, first_msg
+        return cid, recv_chan, payload, first_msg
 
     async def _submit_for_result(self, ns: str, func: str, **kwargs) -> None:
 
@@ -118,20 +159,40 @@ class Portal:
 
     async def _return_once(
         self,
-        cid: str,
+        cid: int,
         recv_chan: trio.abc.ReceiveChannel,
         resptype: str,
-        first_msg: dict
+        first_msg: Optional[Tuple[int, Any, Any]],
+        keep_on_cancel: bool = False,
     ) -> Any:
         assert resptype == 'asyncfunc'  # single response
 
-        msg = await recv_chan.receive()
+        received = False
         try:
-            return msg['return']
-        except KeyError:
-            # internal error should never get here
-            assert msg.get('cid'), "Received internal error at portal?"
-            raise unpack_error(msg, self.channel)
+            try:
+                code, _, payload = await recv_chan.receive()
+            except trio.EndOfChannel:
+                # the far end sent a ``'stop'``: an (empty) stream
+                code, payload = _ipc._MSG_STOP, True
+            received = True
+        finally:
+            # single response so the call's queue can be reclaimed, also
+            # if the wait for it is cancelled; unless the call is the
+            # actor's "main" task whose result may be awaited again
+            if received or not keep_on_cancel:
+                self.actor.release_memchans(self.channel.uid, cid)
+
+        if code == _ipc._MSG_RETURN:
+            return payload
+
+        if code != _ipc._MSG_ERROR:
+            # a streaming function was invoked as a regular one
+            # (only detectable here with implicit function types)
+            await Context(self.channel, cid, _portal=self).cancel()
+            raise ValueError(
+                f"{(code, cid, payload)} is an invalid response packet?")
+
+        raise unpack_error({'error': payload}, self.channel)
 
     async def result(self) -> Any:
         """Return the result(s) from the remote actor's "main" task.
@@ -152,11 +213,14 @@ class Portal:
 
         # expecting a "main" result
         assert self._expect_result
-        if self._result is None:
-            try:
-                self._result = await self._return_once(*self._expect_result)
-            except RemoteActorError as err:
-                self._result = err
+        async with self._result_lock:
+            if not self._got_result:
+                try:
+                    self._result = await self._return_once(
+                        *self._expect_result, keep_on_cancel=True)
+                except RemoteActorError as err:
+                    self._result = err
+                self._got_result = True
 
         # re-raise error on every call
         if isinstance(self._result, RemoteActorError):
@@ -268,15 +332,14 @@ class Portal:
             assert isinstance(fn_name, str)
 
         else:  # function reference was passed directly
+            # (sync functions are run in a worker thread far end)
             if (
-                not inspect.iscoroutinefunction(func) or
-                (
-                    inspect.iscoroutinefunction(func) and
-                    getattr(func, '_tractor_stream_function', False)
-                )
+                inspect.isasyncgenfunction(func) or
+                inspect.isgeneratorfunction(func) or
+                getattr(func, '_tractor_stream_function', False)
             ):
                 raise TypeError(
-                    f'{func} must be a non-streaming async function!')
+                    f'{func} must be a non-streaming function!')
 
             fn_mod_path, fn_name = func_deats(func)
 
@@ -284,13 +347,110 @@ class Portal:
             *(await self._submit(fn_mod_path, fn_name, kwargs))
         )
 
+    def _batch_deats(self, func: Callable) -> Tuple[str, str]:
+        if (
+            inspect.isasyncgenfunction(func) or
+            inspect.isgeneratorfunction(func) or
+            getattr(func, '_tractor_stream_function', False)
+        ):
+            raise TypeError(f'{func} must be a non-streaming function!')
+
+        return func_deats(func)
+
+    def _unpack_outcome(
+        self,
+        outcome: Tuple[bool, Any],
+        return_exceptions: bool,
+    ) -> Any:
+        ok, value = outcome
+        if ok:
+            return value
+
+        err = unpack_error({'error': value}, self.channel)
+        if return_exceptions:
+            return err
+
+        raise err
+
+    async def run_many(
+        self,
+        func: Callable,
+        calls: Iterable[Dict[str, Any]],
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """Run ``func`` once per ``kwargs`` in ``calls`` in the remote
+        actor and return all results, in call order.
+
+        The whole batch is shipped in a single msg, the calls are run
+        concurrently far end and their results are sent back together
+        in a single msg; much cheaper than a ``run()`` per call when
+        submitting many small jobs. The first error (in call order) is
+        raised unless ``return_exceptions`` is set in which case errors
+        are returned in place of results.
+        """
+        fn_mod_path, fn_name = self._batch_deats(func)
+        outcomes = await self.run_from_ns(
+            'self', '_run_batch',
+            ns=fn_mod_path,
+            funcname=fn_name,
+            calls=list(calls),
+        )
+        return [
+            self._unpack_outcome(outcome, return_exceptions)
+            for outcome in outcomes
+        ]
+
+    @asynccontextmanager
+    async def batch(
+        self,
+        func: Callable,
+        calls: Iterable[Dict[str, Any]],
+        return_exceptions: bool = False,
+    ) -> AsyncGenerator[AsyncIterator[Any], None]:
+        """Like ``run_many()`` but deliver the results, in call order, as
+        they become available.
+
+        Yields an async iterator of results. Results completing together
+        far end are coalesced into a single msg.
+        """
+        fn_mod_path, fn_name = self._batch_deats(func)
+        async with self._open_stream(
+            'self', '_stream_batch',
+            {'ns': fn_mod_path, 'funcname': fn_name, 'calls': list(calls)},
+        ) as stream:
+
+            async def results() -> AsyncIterator[Any]:
+                async for chunk in stream:
+                    for outcome in chunk:
+                        yield self._unpack_outcome(outcome, return_exceptions)
+
+            yield results()
+
     @asynccontextmanager
     async def open_stream_from(
         self,
         async_gen_func: Callable,  # typing: ignore
+        *,
+        _buffer_size: int = _default_buffer_size,
+        _overflow: str = 'block',
+        _window: Optional[int] = None,
         **kwargs,
     ) -> AsyncGenerator[ReceiveMsgStream, None]:
-
+        """Open a stream of values from a remote async generator.
+
+        Received values are queued locally up to ``_buffer_size`` after
+        which the ``_overflow`` policy applies: with ``'block'`` the
+        remote task may only run ``_window`` (by default
+        ``_buffer_size``) items ahead of the local consumer after which
+        it waits to be granted more credits; a slow consumer thus never
+        holds up other streams or results on the same channel. The
+        other policies (``'drop-oldest'``, ``'drop-newest'``,
+        ``'conflate-latest'``) instead discard values such that the
+        remote task never waits on the consumer.
+
+        The stream options are underscore prefixed (and keyword only) so
+        as to never collide with the remote function's ``kwargs``.
+        """
         if not inspect.isasyncgenfunction(async_gen_func):
             if not (
                 inspect.iscoroutinefunction(async_gen_func) and
@@ -300,19 +460,70 @@ class Portal:
                     f'{async_gen_func} must be an async generator function!')
 
         fn_mod_path, fn_name = func_deats(async_gen_func)
+        async with self._open_stream(
+            fn_mod_path, fn_name, kwargs,
+            buffer_size=_buffer_size,
+            overflow=_overflow,
+            window=_window,
+        ) as rchan:
+            yield rchan
+
+    @asynccontextmanager
+    async def _open_stream(
+        self,
+        ns: str,
+        func: str,
+        kwargs: Dict[str, Any],
+        buffer_size: int = _default_buffer_size,
+        overflow: str = 'block',
+        window: Optional[int] = None,
+    ) -> AsyncGenerator[ReceiveMsgStream, None]:
+        """Open a stream of values from the remote (streaming) function
+        ``ns.func()``, see ``open_stream_from()`` for the options.
+        """
+        if overflow not in _overflow_policies:
+            raise ValueError(
+                f"Overflow policy must be one of {_overflow_policies}")
+
+        if buffer_size < 1:
+            raise ValueError(f"Buffer size must be positive: {buffer_size}")
+
+        flow_window: Optional[int] = None
+        if overflow == 'block':
+            flow_window = window or buffer_size
+            if not 0 < flow_window <= buffer_size:
+                raise ValueError(
+                    f"Stream window must be in [1, {buffer_size}]: {window}")
+
+            if self.channel.proto < _ipc._proto_flow_control:
+                # far end doesn't support flow control
+                flow_window = None
+
+        elif window is not None:
+            raise ValueError(
+                f"A stream window can't be used with {overflow!r}")
+
         (
             cid,
             recv_chan,
             functype,
             first_msg
-        ) = await self._submit(fn_mod_path, fn_name, kwargs)
+        ) = await self._submit(
+            ns, func, kwargs,
+            functype='asyncgen',
+            window=flow_window,
+            buffer_size=buffer_size,
+            overflow=overflow,
+        )
 
         # receive only stream
         assert functype == 'asyncgen'
 
         ctx = Context(self.channel, cid, _portal=self)
         try:
-            async with ReceiveMsgStream(ctx, recv_chan, self) as rchan:
+            async with ReceiveMsgStream(
+                ctx, recv_chan, self, window=flow_window,
+            ) as rchan:
                 self._streams.add(rchan)
                 yield rchan
         finally:
@@ -325,6 +536,7 @@ class Portal:
                 log.debug(f'Context {ctx} was already closed?')
 
             self._streams.remove(rchan)
+            self.actor.release_memchans(self.channel.uid, cid)
 
     # @asynccontextmanager
     # async def open_context(
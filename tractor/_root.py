@@ -43,6 +43,9 @@ async def open_root_actor(
     # OR `trio` (the new default).
     start_method: Optional[str] = None,
 
+    # modules the "zygote" spawner imports before forking subactors
+    zygote_preload: Optional[List[str]] = None,
+
     # enables the multi-process debugger support
     debug_mode: bool = False,
 
@@ -52,6 +55,13 @@ async def open_root_actor(
     enable_modules: Optional[List] = None,
     rpc_module_paths: Optional[List] = None,
 
+    # move same-host channels onto shared memory rings
+    shm_transport: bool = False,
+
+    # receive large byte buffers and arrays out-of-band (zero-copy);
+    # they're then delivered as ``memoryview``s instead of ``bytes``
+    oob_buffers: bool = False,
+
 ) -> typing.Any:
     """Async entry point for ``tractor``.
 
@@ -63,6 +73,8 @@ async def open_root_actor(
 
     # mark top most level process as root actor
     _state._runtime_vars['_is_root'] = True
+    _state._runtime_vars['_shm_transport'] = shm_transport
+    _state._runtime_vars['_oob_buffers'] = oob_buffers
 
     # caps based rpc list
     enable_modules = enable_modules or []
@@ -79,6 +91,9 @@ async def open_root_actor(
     if start_method is not None:
         _spawn.try_set_start_method(start_method)
 
+    if zygote_preload is not None:
+        _spawn._zygote_preload = list(zygote_preload)
+
     if debug_mode and _spawn._spawn_method == 'trio':
         _state._runtime_vars['_debug_mode'] = True
 
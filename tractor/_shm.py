@@ -0,0 +1,429 @@
+"""
+Shared memory ring buffer transport for co-located actors.
+
+A ``Channel`` between two actors on the same host can be "upgraded"
+(right after the handshake) to a pair of single-producer single-consumer
+byte rings allocated with ``multiprocessing.shared_memory``. The
+original socket connection is kept around purely as a "doorbell": a
+reader which finds its ring empty parks on the socket and the writer
+only rings it (sends a single byte) when the reader is parked. Likewise
+a writer which finds its ring full parks until the reader rings back
+once it freed up space. This means a busy stream can have many frames
+written and batch-drained per wakeup without a syscall for every
+``send()``.
+
+The same ``msgpack`` frames that ``MsgpackStream`` carries over
+a socket are carried over the rings; ``ShmStream`` quacks like
+a ``trio.SocketStream`` so it can be wrapped directly.
+"""
+import platform
+from typing import Any, Dict, Optional, Set, Tuple
+
+import trio
+
+from .log import get_logger
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # py < 3.8
+    shared_memory = None  # type: ignore
+
+log = get_logger(__name__)
+
+
+# whether this host/interpreter can use the transport at all
+_shm_supported: bool = (
+    shared_memory is not None and platform.system() != 'Windows'
+)
+
+# bytes of data per ring (one ring per direction)
+_ring_size: int = 2**22  # 4 MiB
+
+# header layout (in 8 byte slots) preceding each ring's data region
+_HEAD = 0  # total bytes ever written
+_TAIL = 1  # total bytes ever read
+_WAITING = 2  # reader is parked on the doorbell
+_CLOSED = 3  # either end has closed
+_BLOCKED = 4  # writer is parked on the doorbell (the ring is full)
+_header_size = 64
+
+# doorbell bytes, a ring now has data or space respectively
+_DATA_BELL = 1
+_SPACE_BELL = 2
+
+# Parking protocol: a reader which finds its ring empty sets the
+# ring's "waiting" flag then re-checks the ring before parking on the
+# doorbell while the writer publishes its bytes then checks the flag
+# (and the same, with the "blocked" flag, for a writer finding its
+# ring full). Python offers no memory fence for the shared segment so
+# on a cpu which lets a store pass a later load both ends may still
+# miss each other; a parked end thus also re-checks its ring after
+# a backstop timeout which doubles from ``_min_park`` up to
+# ``_max_park`` such that a lost bell costs some latency, not a hang.
+_min_park: float = 1e-3
+_max_park: float = 1.
+
+
+def _open_shm(
+    name: Optional[str] = None,
+    size: int = 0,
+) -> 'shared_memory.SharedMemory':
+    """Create (when no ``name`` is passed) or attach to a shared memory
+    segment without tying its lifetime to the ``multiprocessing``
+    resource tracker; segments are unlinked as soon as both ends have
+    attached.
+    """
+    create = name is None
+    try:
+        return shared_memory.SharedMemory(  # type: ignore
+            name=name, create=create, size=size, track=False)
+    except TypeError:
+        # py < 3.13
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(
+            shm._name, 'shared_memory')  # type: ignore
+        return shm
+
+
+class RingBuffer:
+    """A SPSC byte ring in a shared memory segment.
+
+    Head and tail are monotonically increasing byte counters which are
+    only ever written by the producer and consumer respectively.
+    """
+    def __init__(
+        self,
+        shm: 'shared_memory.SharedMemory',
+        owner: bool = False,
+    ) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._hdr = shm.buf[:_header_size].cast('Q')
+        self._data = shm.buf[_header_size:]
+        self.capacity = len(self._data)
+
+    @classmethod
+    def create(cls, size: int = _ring_size) -> 'RingBuffer':
+        ring = cls(_open_shm(size=_header_size + size), owner=True)
+        for i in range(len(ring._hdr)):
+            ring._hdr[i] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> 'RingBuffer':
+        return cls(_open_shm(name=name))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def unlink(self) -> None:
+        """Remove the segment's name; the mapping stays valid.
+        """
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+    def available(self) -> int:
+        hdr = self._hdr
+        return hdr[_HEAD] - hdr[_TAIL]
+
+    def free(self) -> int:
+        return self.capacity - self.available()
+
+    @property
+    def waiting(self) -> bool:
+        return bool(self._hdr[_WAITING])
+
+    @waiting.setter
+    def waiting(self, value: bool) -> None:
+        self._hdr[_WAITING] = int(value)
+
+    @property
+    def blocked(self) -> bool:
+        return bool(self._hdr[_BLOCKED])
+
+    @blocked.setter
+    def blocked(self, value: bool) -> None:
+        self._hdr[_BLOCKED] = int(value)
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._hdr[_CLOSED])
+
+    def write(self, data: memoryview) -> int:
+        """Write as much of ``data`` as fits, return the byte count.
+        """
+        hdr = self._hdr
+        head = hdr[_HEAD]
+        cap = self.capacity
+        n = min(len(data), cap - (head - hdr[_TAIL]))
+        if n <= 0:
+            return 0
+
+        start = head % cap
+        first = min(n, cap - start)
+        self._data[start:start + first] = data[:first]
+        if first < n:
+            self._data[:n - first] = data[first:n]
+
+        hdr[_HEAD] = head + n
+        return n
+
+    def read(self, max_bytes: int) -> bytes:
+        """Read up to ``max_bytes``, return ``b''`` if the ring is empty.
+        """
+        hdr = self._hdr
+        tail = hdr[_TAIL]
+        n = min(hdr[_HEAD] - tail, max_bytes)
+        if n <= 0:
+            return b''
+
+        cap = self.capacity
+        start = tail % cap
+        first = min(n, cap - start)
+        if first == n:
+            data = bytes(self._data[start:start + n])
+        else:
+            data = bytes(self._data[start:]) + bytes(self._data[:n - first])
+
+        hdr[_TAIL] = tail + n
+        return data
+
+    def close(self) -> None:
+        """Mark the ring closed and release our mapping.
+        """
+        if self._hdr is None:
+            return
+        self._hdr[_CLOSED] = 1
+        self._hdr.release()
+        self._data.release()
+        self._hdr = self._data = None  # type: ignore
+        self._shm.close()
+        self.unlink()
+
+
+class ShmStream(trio.abc.Stream):
+    """A byte stream over a pair of shared memory rings.
+
+    Exposes the "doorbell" socket as ``.socket`` such that it can be
+    used as a drop-in for a ``trio.SocketStream`` by ``MsgpackStream``.
+    """
+    def __init__(
+        self,
+        rx: RingBuffer,
+        tx: RingBuffer,
+        doorbell: trio.SocketStream,
+    ) -> None:
+        self._rx = rx
+        self._tx = tx
+        self._doorbell = doorbell
+        self._peer_closed = False
+        self._closed = False
+        # total bytes written to the tx ring
+        self.bytes_sent = 0
+        # the doorbell is shared by the sending and the receiving task;
+        # bells received (by either) but not yet waited for
+        self._rung: Set[int] = set()
+        self._listening = False
+        self._bell_received = trio.Event()
+        self._ring_lock = trio.StrictFIFOLock()
+
+    @property
+    def socket(self) -> trio.socket.SocketType:
+        return self._doorbell.socket
+
+    async def _ring(self, bell: int) -> None:
+        async with self._ring_lock:
+            await self._doorbell.send_all(bytes((bell,)))
+
+    async def _wait_for_bell(self, bell: int, timeout: float) -> None:
+        """Wait (up to ``timeout`` seconds) for the peer to ring ``bell``.
+
+        Whichever task waits first reads the doorbell and hands any
+        bells meant for the other on.
+        """
+        with trio.move_on_after(timeout):
+            while bell not in self._rung:
+                if self._listening:
+                    await self._bell_received.wait()
+                    continue
+
+                self._listening = True
+                try:
+                    bells = await self._doorbell.receive_some(2**10)
+                    if bells == b'':
+                        # wake everyone, rings are drained before eof
+                        # is signalled upwards
+                        self._peer_closed = True
+                        bells = bytes((_DATA_BELL, _SPACE_BELL))
+                    self._rung.update(bells)
+                finally:
+                    self._listening = False
+                    self._bell_received.set()
+                    self._bell_received = trio.Event()
+
+        self._rung.discard(bell)
+
+    async def send_all(self, data: Any) -> None:
+        tx = self._tx
+        view = memoryview(data).cast('B')
+        park = _min_park
+        while True:
+            if self._closed:
+                raise trio.ClosedResourceError
+            if tx.closed or self._peer_closed:
+                raise trio.BrokenResourceError("Peer closed the stream")
+
+            n = tx.write(view)
+            if n:
+                self.bytes_sent += n
+                view = view[n:]
+                park = _min_park
+                if tx.waiting:
+                    tx.waiting = False
+                    await self._ring(_DATA_BELL)
+
+            if not view:
+                break
+
+            if n:
+                continue
+
+            # ring is full; park until the consumer freed up space,
+            # re-checking after flagging to avoid missing a read which
+            # raced with the flag
+            tx.blocked = True
+            if tx.free():
+                tx.blocked = False
+                continue
+
+            await self._wait_for_bell(_SPACE_BELL, park)
+            park = min(park * 2, _max_park)
+            if not self._closed:
+                tx.blocked = False
+
+        await trio.lowlevel.checkpoint()
+
+    async def wait_send_all_might_not_block(self) -> None:
+        await trio.lowlevel.checkpoint()
+
+    async def receive_some(self, max_bytes: Optional[int] = None) -> bytes:
+        rx = self._rx
+        max_bytes = max_bytes or rx.capacity
+        park = _min_park
+        while True:
+            if self._closed:
+                raise trio.ClosedResourceError
+            data = rx.read(max_bytes)
+            if data:
+                if rx.blocked:
+                    rx.blocked = False
+                    try:
+                        # the data is already consumed from the ring
+                        with trio.CancelScope(shield=True):
+                            await self._ring(_SPACE_BELL)
+                    except trio.BrokenResourceError:
+                        pass  # the writer is gone anyway
+                else:
+                    await trio.lowlevel.checkpoint()
+                return data
+
+            if self._peer_closed or rx.closed:
+                return b''
+
+            # park on the doorbell, re-checking after flagging to
+            # avoid missing a write which raced with the flag
+            rx.waiting = True
+            if rx.available():
+                rx.waiting = False
+                continue
+
+            # a bell may be stale (rung for data we already drained)
+            # in which case we just loop around and park again
+            await self._wait_for_bell(_DATA_BELL, park)
+            park = min(park * 2, _max_park)
+            if not self._closed:
+                rx.waiting = False
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._rx.close()
+        self._tx.close()
+        await self._doorbell.aclose()
+
+
+def local_caps() -> Optional[bool]:
+    """This actor's shm capability as advertised in the handshake:
+    ``None`` if unsupported, otherwise whether we want it used.
+    """
+    from ._state import _runtime_vars
+    if not _shm_supported:
+        return None
+    return bool(_runtime_vars.get('_shm_transport'))
+
+
+def should_upgrade(
+    chan: 'Channel',  # type: ignore # noqa
+    peer_caps: Dict[str, Any],
+) -> bool:
+    """Decide if a freshly handshaked channel should move to shm.
+
+    Both ends must support it, at least one end must want it and the
+    peer must be on this host.
+    """
+    ours = local_caps()
+    theirs = peer_caps.get('shm')
+    if ours is None or theirs is None or not (ours or theirs):
+        return False
+    return chan.is_local()
+
+
+async def upgrade(chan: 'Channel') -> None:  # type: ignore # noqa
+    """Move ``chan`` onto a pair of shared memory rings.
+
+    The end which initiated the connection allocates both rings, sends
+    their names and waits for the peer to attach before unlinking them.
+    """
+    from ._ipc import MsgpackStream
+
+    msgstream = chan.msgstream
+    assert msgstream
+    sock_stream = msgstream.stream
+
+    if chan._initiator:
+        a2b = RingBuffer.create()
+        b2a = RingBuffer.create()
+        try:
+            await chan.send({'shm': (a2b.name, b2a.name)})
+            ack = await chan.recv()
+            if ack is None:
+                raise trio.BrokenResourceError(
+                    f"{chan} disconnected during the shm upgrade")
+            assert ack == {'shm': 'attached'}, f"Invalid shm ack {ack}"
+        except BaseException:
+            a2b.close()
+            b2a.close()
+            raise
+        a2b.unlink()
+        b2a.unlink()
+        rx, tx = b2a, a2b
+    else:
+        msg: Optional[Dict[str, Tuple[str, str]]] = await chan.recv()
+        if msg is None:
+            raise trio.BrokenResourceError(
+                f"{chan} disconnected during the shm upgrade")
+        a2b_name, b2a_name = msg['shm']
+        rx = RingBuffer.attach(a2b_name)
+        tx = RingBuffer.attach(b2a_name)
+        try:
+            await chan.send({'shm': 'attached'})
+        except BaseException:
+            rx.close()
+            tx.close()
+            raise
+
+    chan.msgstream = MsgpackStream(ShmStream(rx, tx, sock_stream))
+    log.info(f"Upgraded {chan} to shared memory transport")
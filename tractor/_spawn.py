@@ -1,10 +1,12 @@
 """
 Machinery for actor process spawning using multiple backends.
 """
+from functools import partial
+import os
 import sys
 import multiprocessing as mp
 import platform
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import trio
 from trio_typing import TaskStatus
@@ -34,6 +36,9 @@ log = get_logger('tractor')
 # placeholder for an mp start context if so using that backend
 _ctx: Optional[mp.context.BaseContext] = None
 _spawn_method: str = "spawn"
+# modules imported by the zygote process (see ``tractor._zygote``)
+# before it forks subactors
+_zygote_preload: List[str] = []
 
 
 if platform.system() == 'Windows':
@@ -57,7 +62,8 @@ def try_set_start_method(name: str) -> Optional[mp.context.BaseContext]:
     If the desired method is not supported this function will error.
     On Windows only the ``multiprocessing`` "spawn" method is offered
     besides the default ``trio`` which uses async wrapping around
-    ``subprocess.Popen``.
+    ``subprocess.Popen``. Where ``os.fork()`` is available the "zygote"
+    method forks subactors from a pre-warmed process instead.
     """
     global _ctx
     global _spawn_method
@@ -70,6 +76,9 @@ def try_set_start_method(name: str) -> Optional[mp.context.BaseContext]:
     # supported on all platforms
     methods += ['trio']
 
+    if hasattr(os, 'fork'):
+        methods += ['zygote']
+
     if name not in methods:
         raise ValueError(
             f"Spawn method `{name}` is invalid please choose one of {methods}"
@@ -77,7 +86,7 @@ def try_set_start_method(name: str) -> Optional[mp.context.BaseContext]:
     elif name == 'forkserver':
         _forkserver_override.override_stdlib()
         _ctx = mp.get_context(name)
-    elif name == 'trio':
+    elif name in ('trio', 'zygote'):
         _ctx = None
     else:
         _ctx = mp.get_context(name)
@@ -177,7 +186,17 @@ async def spawn_subactor(
             subactor.loglevel
         ]
 
-    proc = await trio.open_process(spawn_cmd)
+    if _spawn_method == 'zygote':
+        # XXX: imported here to avoid a double import warning when the
+        # zygote is run with ``python -m tractor._zygote``
+        from ._zygote import get_zygote
+
+        zygote = await get_zygote(current_actor())
+        proc = await zygote.spawn(
+            subactor.uid, subactor.loglevel, parent_addr)
+    else:
+        proc = await trio.open_process(spawn_cmd)
+
     try:
         yield proc
     finally:
@@ -223,7 +242,7 @@ async def new_proc(
     # mark the new actor with the global spawn method
     subactor._spawn_method = _spawn_method
 
-    if use_trio_run_in_process or _spawn_method == 'trio':
+    if use_trio_run_in_process or _spawn_method in ('trio', 'zygote'):
         async with trio.open_nursery() as nursery:
             async with spawn_subactor(
                 subactor,
@@ -245,6 +264,7 @@ async def new_proc(
                     "_parent_main_data": subactor._parent_main_data,
                     "enable_modules": subactor.enable_modules,
                     "_arb_addr": subactor._arb_addr,
+                    "thread_limit": subactor.thread_limit,
                     "bind_host": bind_addr[0],
                     "bind_port": bind_addr[1],
                     "_runtime_vars": _runtime_vars,
@@ -259,7 +279,7 @@ async def new_proc(
 
                 # wait for ActorNursery.wait() to be called
                 with trio.CancelScope(shield=True):
-                    await actor_nursery._join_procs.wait()
+                    await actor_nursery._wait_for_join(subactor, proc.wait)
 
                 if portal in actor_nursery._cancel_after_result_on_exit:
                     cancel_scope = await nursery.start(
@@ -403,7 +423,8 @@ async def mp_new_proc(
             # while user code is still doing it's thing. Only after the
             # nursery block closes do we allow subactor results to be
             # awaited and reported upwards to the supervisor.
-            await actor_nursery._join_procs.wait()
+            await actor_nursery._wait_for_join(
+                subactor, partial(proc_waiter, proc))
 
         finally:
             # XXX: in the case we were cancelled before the sub-proc
@@ -14,8 +14,13 @@ _current_actor: Optional['Actor'] = None  # type: ignore # noqa
 _runtime_vars: Dict[str, Any] = {
     '_debug_mode': False,
     '_is_root': False,
-    '_root_mailbox': (None, None)
+    '_root_mailbox': (None, None),
+    '_shm_transport': False,
+    '_oob_buffers': False,
 }
+# whether runtime "hot path" (per msg) debug logging is on, kept in sync
+# with the actor's log level by ``log.get_console_log()``
+_log_hot_path: bool = False
 
 
 def current_actor(err_on_no_runtime: bool = True) -> 'Actor':  # type: ignore # noqa
@@ -1,19 +1,92 @@
 import inspect
 from contextlib import contextmanager  # , asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Iterator, Optional
+from typing import Any, Iterator, Optional, Tuple
 import warnings
 
 import trio
 
-from ._ipc import Channel
+from ._ipc import Channel, _MSG_YIELD, _MSG_ERROR
 from ._exceptions import unpack_error
 from .log import get_logger
+from . import _state
 
 
 log = get_logger(__name__)
 
 
+# default depth of the local queue for msgs from a remote task, which
+# is also the default number of items a flow controlled stream's
+# producer may send ahead of its consumer, see
+# ``Portal.open_stream_from()``
+_default_buffer_size: int = 1000
+
+# what to do with a new stream item when the local queue is full:
+# - 'block': wait for the consumer (and use flow control if possible)
+# - 'drop-oldest': discard the oldest queued item
+# - 'drop-newest': discard the new item
+# - 'conflate-latest': discard all queued items, keeping only the new one
+_overflow_policies = ('block', 'drop-oldest', 'drop-newest', 'conflate-latest')
+
+
+def push_nowait(
+    send_chan: trio.abc.SendChannel,
+    recv_chan: trio.abc.ReceiveChannel,
+    msg: Tuple[int, Any, Any],
+    overflow: str,
+) -> None:
+    """Queue ``msg`` without blocking according to a (non-``'block'``)
+    ``overflow`` policy.
+
+    Only stream items are ever discarded; to make room for any other
+    (final) msg the oldest queued item is dropped.
+    """
+    is_item = msg[0] == _MSG_YIELD
+    if is_item and overflow == 'conflate-latest':
+        while True:
+            try:
+                recv_chan.receive_nowait()
+            except trio.WouldBlock:
+                break
+
+    try:
+        send_chan.send_nowait(msg)
+    except trio.WouldBlock:
+        if is_item and overflow == 'drop-newest':
+            if _state._log_hot_path:
+                log.debug("Dropped newest stream item")
+            return
+
+        recv_chan.receive_nowait()
+        if _state._log_hot_path:
+            log.debug("Dropped oldest stream item")
+        send_chan.send_nowait(msg)
+
+
+class Credits:
+    """Send credits for a flow controlled stream.
+
+    The (remote) consumer grants credits as it consumes items and the
+    producer spends one per item sent, waiting whenever it runs out.
+    """
+    def __init__(self, value: int) -> None:
+        self.value = value
+        self._granted = trio.Event()
+
+    def grant(self, n: int) -> None:
+        self.value += n
+        self._granted.set()
+
+    async def acquire(self) -> None:
+        while self.value <= 0:
+            # only replace the event once it fired such that a grant
+            # wakes *all* waiting tasks, not just the latest
+            if self._granted.is_set():
+                self._granted = trio.Event()
+            await self._granted.wait()
+        self.value -= 1
+
+
 @dataclass(frozen=True)
 class Context:
     """An IAC (inter-actor communication) context.
@@ -29,13 +102,15 @@ class Context:
 
     """
     chan: Channel
-    cid: str
+    cid: int
 
     # only set on the caller side
     _portal: Optional['Portal'] = None    # type: ignore # noqa
 
     # only set on the callee side
     _cancel_scope: Optional[trio.CancelScope] = None
+    # only set on the callee side of flow controlled streams
+    _credits: Optional[Credits] = None
 
     async def send_yield(self, data: Any) -> None:
 
@@ -45,10 +120,12 @@ class Context:
             DeprecationWarning,
             stacklevel=2,
         )
-        await self.chan.send({'yield': data, 'cid': self.cid})
+        if self._credits is not None:
+            await self._credits.acquire()
+        await self.chan.send_msg('yield', self.cid, data)
 
     async def send_stop(self) -> None:
-        await self.chan.send({'stop': True, 'cid': self.cid})
+        await self.chan.send_msg('stop', self.cid, True)
 
     async def cancel(self) -> None:
         """Cancel this inter-actor-task context.
@@ -137,24 +214,62 @@ class ReceiveMsgStream(trio.abc.ReceiveChannel):
         ctx: Context,
         rx_chan: trio.abc.ReceiveChannel,
         portal: 'Portal',  # type: ignore # noqa
+        window: Optional[int] = None,
     ) -> None:
         self._ctx = ctx
         self._rx_chan = rx_chan
         self._portal = portal
         self._shielded = False
+        # credit based flow control: consumed items are granted back to
+        # the producer in batches of half the window
+        self._window = window
+        self._consumed = 0
 
-    # delegate directly to underlying mem channel
     def receive_nowait(self):
-        return self._rx_chan.receive_nowait()
+        code, _, payload = self._rx_chan.receive_nowait()
+        if code == _MSG_YIELD:
+            if self._window:
+                n = self._consume()
+                if n:
+                    # can't wait on the grant here so hand it off
+                    actor = self._portal.actor
+                    actor._service_n.start_soon(self._send_credits, n)
+            return payload
+
+        if code == _MSG_ERROR:
+            raise unpack_error({'error': payload}, self._portal.channel)
+
+        raise ValueError(
+            f"{(code, self._ctx.cid, payload)} is an invalid response "
+            "packet for a stream?")
+
+    def _consume(self) -> int:
+        """Count a consumed item, returning the number of credits to
+        grant back (if any).
+        """
+        self._consumed += 1
+        if self._consumed < self._window // 2:  # type: ignore
+            return 0
 
-    async def receive(self):
+        n, self._consumed = self._consumed, 0
+        return n
+
+    async def _send_credits(self, n: int) -> None:
+        ctx = self._ctx
         try:
-            msg = await self._rx_chan.receive()
-            return msg['yield']
+            await ctx.chan.send_msg('credit', ctx.cid, n)
+        except (trio.ClosedResourceError, trio.BrokenResourceError):
+            log.debug(f"Failed to grant credits for {ctx.cid}")
 
-        except KeyError:
-            # internal error should never get here
-            assert msg.get('cid'), ("Received internal error at portal?")
+    async def receive(self):
+        try:
+            code, _, payload = await self._rx_chan.receive()
+            if code == _MSG_YIELD:
+                if self._window:
+                    n = self._consume()
+                    if n:
+                        await self._send_credits(n)
+                return payload
 
             # TODO: handle 2 cases with 3.10 match syntax
             # - 'stop'
@@ -162,9 +277,16 @@ class ReceiveMsgStream(trio.abc.ReceiveChannel):
             # possibly just handle msg['stop'] here!
 
             # TODO: test that shows stream raising an expected error!!!
-            if msg.get('error'):
+            if code == _MSG_ERROR:
                 # raise the error message
-                raise unpack_error(msg, self._portal.channel)
+                raise unpack_error({'error': payload}, self._portal.channel)
+
+            # with implicit stream acks a far end function which turns
+            # out not to be a stream is only detectable here
+            await self.aclose()
+            raise ValueError(
+                f"{(code, self._ctx.cid, payload)} is an invalid response "
+                "packet for a stream?")
 
         except (trio.ClosedResourceError, StopAsyncIteration):
             # XXX: this indicates that a `stop` message was
@@ -1,15 +1,20 @@
 """
 ``trio`` inspired apis and helpers
 """
+from dataclasses import dataclass
 from functools import partial
 import inspect
 import multiprocessing as mp
-from typing import Tuple, List, Dict, Optional
+import time
+from typing import (
+    Any, Awaitable, Callable, Tuple, List, Dict, Optional, Sequence
+)
 import typing
 import warnings
 
 import trio
 from async_generator import asynccontextmanager
+from trio_typing import TaskStatus
 
 from ._state import current_actor, is_main_process
 from .log import get_logger, get_loglevel
@@ -26,8 +31,68 @@ log = get_logger(__name__)
 _default_bind_addr: Tuple[str, int] = ('127.0.0.1', 0)
 
 
+@dataclass
+class SpawnStats:
+    """A snapshot of an ``ActorNursery``'s subprocess counts.
+    """
+    # ``None`` if unlimited
+    max_procs: Optional[int]
+    running: int
+    # spawn requests waiting for a process slot
+    queued: int
+    spawned: int
+    # total and max time spawn requests waited for a slot (seconds)
+    total_wait: float
+    max_wait: float
+    # idle standby actors and spawn requests served by one
+    standby: int
+    claimed: int
+
+
+@dataclass
+class SpawnTimings:
+    """Durations (in seconds) of the startup phases of a subactor.
+    """
+    # process creation up to the child's runtime starting
+    exec: float
+    # connecting back and handshaking with the parent
+    connect: float
+    # importing the ``enable_modules``
+    load: float
+    # starting the channel server and registering with the arbiter
+    register: float
+
+    @property
+    def total(self) -> float:
+        return self.exec + self.connect + self.load + self.register
+
+    @classmethod
+    def from_times(
+        cls,
+        started: float,
+        times: Dict[str, float],
+    ) -> 'SpawnTimings':
+        return cls(
+            exec=times['main'] - started,
+            connect=times['connected'] - times['main'],
+            load=times['loaded'] - times['connected'],
+            register=times['registered'] - times['loaded'],
+        )
+
+
 class ActorNursery:
     """Spawn scoped subprocess actors.
+
+    With ``max_procs`` at most that many subprocesses run at once; spawn
+    requests beyond the limit wait (in order) for a process to exit.
+    Actors from ``run_in_actor()`` are then reaped as soon as their
+    result arrives (instead of at nursery exit) to free their slot.
+
+    With ``standby`` that many booted (and registered) but idle actors
+    are kept ready; a spawn request claims one, which then takes on the
+    requested name and loads its ``enable_modules``, instead of waiting
+    for a new process. Claimed standby actors are replaced in the
+    background.
     """
     def __init__(
         self,
@@ -35,6 +100,8 @@ class ActorNursery:
         ria_nursery: trio.Nursery,
         da_nursery: trio.Nursery,
         errors: Dict[Tuple[str, str], Exception],
+        max_procs: Optional[int] = None,
+        standby: int = 0,
     ) -> None:
         # self.supervisor = supervisor  # TODO
         self._actor: Actor = actor
@@ -51,6 +118,96 @@ class ActorNursery:
         self._join_procs = trio.Event()
         self.errors = errors
 
+        if max_procs is not None and max_procs < 1:
+            raise ValueError(f"Max procs must be positive: {max_procs}")
+
+        if standby < 0:
+            raise ValueError(f"Standby actors can't be negative: {standby}")
+
+        self.max_procs = max_procs
+        self._proc_limiter: Optional[trio.CapacityLimiter] = (
+            trio.CapacityLimiter(max_procs) if max_procs else None)
+        # ``run_in_actor()`` subactors which may be reaped early
+        self._reap_early: Dict[Actor, trio.Event] = {}
+        self._spawned: int = 0
+        # wall clock time at which each subactor's process was spawned
+        self._spawn_times: Dict[Actor, float] = {}
+        # startup phase timings of actors from ``start_actors()``
+        self.spawn_timings: Dict[Tuple[str, str], SpawnTimings] = {}
+        self._spawn_wait: float = 0
+        self._max_spawn_wait: float = 0
+
+        self.standby = standby
+        # idle standby actors, oldest first
+        self._standby: List[Tuple[Actor, Portal]] = []
+        self._standby_starting: int = 0
+        self._standby_changed = trio.Event()
+        self._standby_cs = trio.CancelScope()
+        self._claimed: int = 0
+        # set once the process of a child exited
+        self._proc_exited: Dict[Actor, trio.Event] = {}
+
+    @property
+    def spawn_stats(self) -> SpawnStats:
+        limiter = self._proc_limiter
+        stats = limiter.statistics() if limiter else None
+        return SpawnStats(
+            max_procs=self.max_procs,
+            running=stats.borrowed_tokens if stats else len(self._children),
+            queued=stats.tasks_waiting if stats else 0,
+            spawned=self._spawned,
+            total_wait=self._spawn_wait,
+            max_wait=self._max_spawn_wait,
+            standby=len(self._standby),
+            claimed=self._claimed,
+        )
+
+    async def _run_proc(
+        self,
+        subactor: Actor,
+        *args,
+        task_status: TaskStatus[Portal] = trio.TASK_STATUS_IGNORED,
+    ) -> None:
+        """Run ``_spawn.new_proc()`` and release the subactor's process
+        slot (if limited) once its process is gone.
+        """
+        try:
+            await _spawn.new_proc(*args, task_status=task_status)
+        finally:
+            self._spawn_times.pop(subactor, None)
+            if self._proc_limiter is not None:
+                self._proc_limiter.release_on_behalf_of(subactor)
+
+            exited = self._proc_exited.pop(subactor, None)
+            if exited:
+                exited.set()
+
+    async def _wait_for_join(
+        self,
+        subactor: Actor,
+        proc_exit: Callable[[], Awaitable[Any]],
+    ) -> None:
+        """Wait until a subactor's process may be waited on; at nursery
+        exit, as soon as the process exited on its own (eg. after
+        ``Portal.cancel_actor()``) or, for a process limited nursery, as
+        soon as a ``run_in_actor()`` subactor's task was submitted.
+        """
+        async with trio.open_nursery() as n:
+
+            async def wait_on(
+                func: Callable[[], Awaitable[Any]]
+            ) -> None:
+                await func()
+                n.cancel_scope.cancel()
+
+            n.start_soon(wait_on, self._join_procs.wait)
+            n.start_soon(wait_on, proc_exit)
+            if self._proc_limiter is not None:
+                reap = self._reap_early.setdefault(subactor, trio.Event())
+                n.start_soon(wait_on, reap.wait)
+
+        self._reap_early.pop(subactor, None)
+
     async def start_actor(
         self,
         name: str,
@@ -60,13 +217,10 @@ class ActorNursery:
         enable_modules: List[str] = None,
         loglevel: str = None,  # set log level per subactor
         nursery: trio.Nursery = None,
+        thread_limit: Optional[int] = None,
     ) -> Portal:
         loglevel = loglevel or self._actor.loglevel or get_loglevel()
 
-        # configure and pass runtime state
-        _rtv = _state._runtime_vars.copy()
-        _rtv['_is_root'] = False
-
         enable_modules = enable_modules or []
 
         if rpc_module_paths:
@@ -84,10 +238,38 @@ class ActorNursery:
             enable_modules=enable_modules,
             loglevel=loglevel,
             arbiter_addr=current_actor()._arb_addr,
+            thread_limit=thread_limit,
         )
+        if self._standby and bind_addr == _default_bind_addr:
+            return await self._claim_standby(subactor, nursery)
+
+        return await self._start_proc(subactor, bind_addr, nursery)
+
+    async def _start_proc(
+        self,
+        subactor: Actor,
+        bind_addr: Tuple[str, int],
+        nursery: Optional[trio.Nursery],
+    ) -> Portal:
+        # configure and pass runtime state
+        _rtv = _state._runtime_vars.copy()
+        _rtv['_is_root'] = False
+
         parent_addr = self._actor.accept_addr
         assert parent_addr
 
+        if self._proc_limiter is not None:
+            # wait (in line) for a process slot
+            start = trio.current_time()
+            await self._proc_limiter.acquire_on_behalf_of(subactor)
+            waited = trio.current_time() - start
+            self._spawn_wait += waited
+            self._max_spawn_wait = max(self._max_spawn_wait, waited)
+
+        self._spawned += 1
+        self._spawn_times[subactor] = time.time()
+        self._proc_exited[subactor] = trio.Event()
+
         # start a task to spawn a process
         # blocks until process has been started and a portal setup
         nursery = nursery or self._da_nursery
@@ -95,8 +277,9 @@ class ActorNursery:
         # XXX: the type ignore is actually due to a `mypy` bug
         return await nursery.start(  # type: ignore
             partial(
-                _spawn.new_proc,
-                name,
+                self._run_proc,
+                subactor,
+                subactor.name,
                 self,
                 subactor,
                 self.errors,
@@ -106,6 +289,164 @@ class ActorNursery:
             )
         )
 
+    async def _claim_standby(
+        self,
+        subactor: Actor,
+        nursery: Optional[trio.Nursery],
+    ) -> Portal:
+        """Hand the identity and modules of the (not yet spawned)
+        ``subactor`` to the oldest idle standby actor.
+        """
+        standby, portal = self._standby.pop(0)
+        # refill in the background
+        self._standby_changed.set()
+
+        try:
+            await portal.run_from_ns(
+                'self',
+                '_claim',
+                name=subactor.name,
+                enable_modules=subactor.enable_modules,
+                loglevel=subactor.loglevel,
+                thread_limit=subactor.thread_limit,
+            )
+        except BaseException:
+            with trio.CancelScope(shield=True):
+                await portal.cancel_actor()
+            raise
+
+        self._rename_child(standby, subactor.name)
+        self._claimed += 1
+        log.info(f"Claimed standby actor {standby.uid}")
+
+        # the standby's process is managed from the daemon nursery
+        # but the requested nursery must still wait on it
+        if nursery is not None and nursery is not self._da_nursery:
+            nursery.start_soon(self._proc_exited[standby].wait)
+
+        return portal
+
+    def _rename_child(self, subactor: Actor, name: str) -> None:
+        """Re-key all (local) state of a child under its new name.
+        """
+        old = subactor.uid
+        new = subactor.uid = (name, old[1])
+        subactor.name = name
+
+        actor = self._actor
+        self._children[new] = self._children.pop(old)
+        if old in actor._actoruid2nursery:
+            actor._actoruid2nursery[new] = actor._actoruid2nursery.pop(old)
+
+        chans = actor._peers.pop(old, [])
+        for chan in chans:
+            chan.uid = new
+        if chans:
+            # the child may have already connected under its new uid
+            # (eg. to us as its arbiter)
+            actor._peers[new] = chans + actor._peers.get(new, [])
+
+        for uid, cid in [key for key in actor._cids2qs if key[0] == old]:
+            actor._cids2qs[(new, cid)] = actor._cids2qs.pop((uid, cid))
+
+    async def _start_standby(self) -> None:
+        try:
+            subactor = Actor(
+                '_standby',
+                enable_modules=[],
+                loglevel=self._actor.loglevel or get_loglevel(),
+                arbiter_addr=current_actor()._arb_addr,
+            )
+            portal = await self._start_proc(
+                subactor, _default_bind_addr, self._da_nursery)
+
+            try:
+                # only hand out fully booted (and registered) actors
+                await portal.run_from_ns('self', '_get_startup_times')
+            except BaseException:
+                with trio.CancelScope(shield=True):
+                    await portal.cancel_actor()
+                raise
+
+            self._standby.append((subactor, portal))
+
+        finally:
+            self._standby_starting -= 1
+
+    async def _keep_standby(self) -> None:
+        """Keep ``standby`` idle actors booted until stopped.
+        """
+        with self._standby_cs:
+            async with trio.open_nursery() as n:
+                while True:
+                    while (
+                        len(self._standby) + self._standby_starting
+                        < self.standby
+                    ):
+                        self._standby_starting += 1
+                        n.start_soon(self._start_standby)
+
+                    self._standby_changed = trio.Event()
+                    await self._standby_changed.wait()
+
+    def _stop_standby(self) -> List[Portal]:
+        """Stop replacing standby actors and return the idle ones.
+        """
+        self._standby_cs.cancel()
+        idle = [portal for _, portal in self._standby]
+        self._standby.clear()
+        return idle
+
+    async def _close_standby(self) -> None:
+        async with trio.open_nursery() as n:
+            for portal in self._stop_standby():
+                n.start_soon(portal.cancel_actor)
+
+    async def _reap(self, portal: Portal) -> None:
+        """Cancel the subactor behind ``portal`` and wait until its
+        process was reaped.
+        """
+        child = self._children.get(portal.channel.uid)
+        if child is None:  # already gone
+            return
+
+        exited = self._proc_exited[child[0]]
+        await portal.cancel_actor()
+        await exited.wait()
+
+    async def start_actors(
+        self,
+        names: Sequence[str],
+        **kwargs,
+    ) -> List[Portal]:
+        """Start an actor per name concurrently and return their portals
+        (in ``names`` order) once all have completed startup.
+
+        Keyword arguments are passed through to ``start_actor()``. The
+        duration of each actor's startup phases is recorded in
+        ``ActorNursery.spawn_timings`` by actor uid.
+        """
+        portals: List[Optional[Portal]] = [None] * len(names)
+
+        async def start(i: int, name: str) -> None:
+            portal = await self.start_actor(name, **kwargs)
+            uid = portal.channel.uid
+            subactor, _, _ = self._children[uid]
+
+            # the child only processes our requests once its startup
+            # is complete (modules loaded and registered)
+            times = await portal.run_from_ns('self', '_get_startup_times')
+            self.spawn_timings[uid] = SpawnTimings.from_times(
+                self._spawn_times.pop(subactor), times)
+            log.info(f"Started {uid} in {self.spawn_timings[uid]}")
+            portals[i] = portal
+
+        async with trio.open_nursery() as n:
+            for i, name in enumerate(names):
+                n.start_soon(start, i, name)
+
+        return portals  # type: ignore
+
     async def run_in_actor(
         self,
         fn: typing.Callable,
@@ -115,6 +456,7 @@ class ActorNursery:
         rpc_module_paths: Optional[List[str]] = None,
         enable_modules: List[str] = None,
         loglevel: str = None,  # set log level per subactor
+        thread_limit: Optional[int] = None,
         **kwargs,  # explicit args to ``fn``
     ) -> Portal:
         """Spawn a new actor, run a lone task, then terminate the actor and
@@ -139,14 +481,16 @@ class ActorNursery:
             loglevel=loglevel,
             # use the run_in_actor nursery
             nursery=self._ria_nursery,
+            thread_limit=thread_limit,
         )
 
         # XXX: don't allow stream funcs
-        if not (
-            inspect.iscoroutinefunction(fn) and
-            not getattr(fn, '_tractor_stream_function', False)
+        if (
+            inspect.isasyncgenfunction(fn) or
+            inspect.isgeneratorfunction(fn) or
+            getattr(fn, '_tractor_stream_function', False)
         ):
-            raise TypeError(f'{fn} must be an async function!')
+            raise TypeError(f'{fn} must be a non-streaming function!')
 
         # this marks the actor to be cancelled after its portal result
         # is retreived, see logic in `open_nursery()` below.
@@ -156,6 +500,11 @@ class ActorNursery:
             fn.__name__,
             **kwargs
         )
+        if self._proc_limiter is not None:
+            # free the process slot as soon as the result arrives
+            subactor, _, _ = self._children[portal.channel.uid]
+            self._reap_early.setdefault(subactor, trio.Event()).set()
+
         return portal
 
     async def cancel(self, hard_kill: bool = False) -> None:
@@ -166,6 +515,8 @@ class ActorNursery:
         directly without any far end graceful ``trio`` cancellation.
         """
         self.cancelled = True
+        # idle standby actors are cancelled along with all other children
+        self._stop_standby()
 
         log.warning(f"Cancelling nursery in {self._actor.uid}")
         with trio.move_on_after(3) as cs:
@@ -214,6 +565,8 @@ class ActorNursery:
 @asynccontextmanager
 async def _open_and_supervise_one_cancels_all_nursery(
     actor: Actor,
+    max_procs: Optional[int] = None,
+    standby: int = 0,
 ) -> typing.AsyncGenerator[ActorNursery, None]:
 
     # the collection of errors retreived from spawned sub-actors
@@ -242,8 +595,12 @@ async def _open_and_supervise_one_cancels_all_nursery(
                     actor,
                     ria_nursery,
                     da_nursery,
-                    errors
+                    errors,
+                    max_procs=max_procs,
+                    standby=standby,
                 )
+                if standby:
+                    da_nursery.start_soon(anursery._keep_standby)
                 try:
                     # spawning of actors happens in the caller's scope
                     # after we yield upwards
@@ -296,6 +653,7 @@ async def _open_and_supervise_one_cancels_all_nursery(
                 # where we didn't error in the caller's scope
                 log.debug("Waiting on all subactors to complete")
                 anursery._join_procs.set()
+                await anursery._close_standby()
 
                 # ria_nursery scope end
 
@@ -335,11 +693,18 @@ async def _open_and_supervise_one_cancels_all_nursery(
 
 @asynccontextmanager
 async def open_nursery(
+    max_procs: Optional[int] = None,
+    standby: int = 0,
     **kwargs,
 ) -> typing.AsyncGenerator[ActorNursery, None]:
     """Create and yield a new ``ActorNursery`` to be used for spawning
     structured concurrent subactors.
 
+    At most ``max_procs`` subactors are run at once, further spawn
+    requests wait in line (see ``ActorNursery.spawn_stats``). With
+    ``standby`` that many idle actors are kept booted such that spawn
+    requests can be served without waiting for a new process.
+
     When an actor is spawned a new trio task is started which
     invokes one of the process spawning backends to create and start
     a new subprocess. These tasks are started by one of two nurseries
@@ -367,14 +732,14 @@ async def open_nursery(
                 assert actor is current_actor()
 
                 async with _open_and_supervise_one_cancels_all_nursery(
-                    actor
+                    actor, max_procs=max_procs, standby=standby,
                 ) as anursery:
                     yield anursery
 
         else:  # sub-nursery case
 
             async with _open_and_supervise_one_cancels_all_nursery(
-                actor
+                actor, max_procs=max_procs, standby=standby,
             ) as anursery:
 
                 yield anursery
@@ -0,0 +1,383 @@
+"""
+The "zygote" spawning backend: subactors are forked from a pre-warmed
+template process instead of exec-ing a fresh interpreter each.
+
+The zygote is started (once per spawning actor) as ``python -m
+tractor._zygote`` and imports ``tractor`` (and thus ``trio``, ``msgpack``
+etc.) along with a configured list of modules up front. It never runs
+a ``trio`` loop; it only waits for spawn requests on a socket and forks
+a child per request which then boots the actor runtime exactly like
+``tractor._child`` would. The zygote reaps its children and reports
+their exit codes back to the spawning actor.
+"""
+from ast import literal_eval
+import argparse
+import importlib
+import math
+import os
+import select
+import signal
+import socket
+import sys
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+import trio
+from trio_typing import TaskStatus
+
+from .log import get_logger
+
+
+log = get_logger(__name__)
+
+
+class ZygoteProcess:
+    """A subactor process forked by a zygote.
+
+    Mimics the subset of the ``trio.Process`` api used by the spawning
+    machinery.
+    """
+    def __init__(self, zygote: 'Zygote', pid: int) -> None:
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self._zygote = zygote
+        # set on exit or once the zygote (and with it exit reporting)
+        # is gone
+        self._changed = trio.Event()
+        self._orphaned: bool = False
+        self._gone: bool = False
+
+    def __repr__(self) -> str:
+        if self.returncode is not None:
+            status = f"exited with status {self.returncode}"
+        elif self._gone:
+            status = "exited"
+        else:
+            status = "running"
+        return f"<ZygoteProcess {self.pid}: {status}>"
+
+    def _exited(self, returncode: int) -> None:
+        self.returncode = returncode
+        self._gone = True
+        self._changed.set()
+
+    def _orphan(self) -> None:
+        self._orphaned = True
+        self._changed.set()
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    async def wait(self) -> Optional[int]:
+        """Wait for the process to exit and return its exit code.
+
+        The exit code of a process which outlived its zygote is unknown
+        (``None``).
+        """
+        while not self._gone:
+            if not self._orphaned:
+                await self._changed.wait()
+                continue
+
+            # our zygote is gone and with it the exit notifications;
+            # poll until the (re-parented) process disappears
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                self._gone = True
+            else:
+                await trio.sleep(0.1)
+
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if not self._gone:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    async def aclose(self) -> None:
+        """Wait for the process to exit, killing it if cancelled.
+        """
+        try:
+            await self.wait()
+        finally:
+            if not self._gone:
+                self.kill()
+                with trio.CancelScope(shield=True):
+                    await self.wait()
+
+    async def __aenter__(self) -> 'ZygoteProcess':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+
+class Zygote:
+    """Handle to a zygote process which forks subactors on request.
+    """
+    def __init__(self, preload: List[str]) -> None:
+        self.preload = list(preload)
+        self.closed = False
+        self._sock: Optional[trio.socket.SocketType] = None
+        self._procs: Dict[int, ZygoteProcess] = {}
+        # one spawn request in flight at a time
+        self._lock = trio.Lock()
+        self._send_reply, self._recv_reply = trio.open_memory_channel(
+            math.inf)
+        self._done = trio.Event()
+
+    async def run(
+        self,
+        task_status: TaskStatus['Zygote'] = trio.TASK_STATUS_IGNORED,
+    ) -> None:
+        """Start the zygote and relay its replies until it exits.
+        """
+        sock, child_sock = socket.socketpair()
+        with child_sock:
+            proc = await trio.open_process(
+                [
+                    sys.executable,
+                    "-m",
+                    "tractor._zygote",
+                    "--fd",
+                    str(child_sock.fileno()),
+                ] + self.preload,
+                pass_fds=(child_sock.fileno(),),
+            )
+        log.info(f"Started zygote {proc} preloading {self.preload}")
+        self._sock = trio.socket.from_stdlib_socket(sock)
+        task_status.started(self)
+
+        try:
+            with self._send_reply:
+                buf = b''
+                while True:
+                    data = await self._sock.recv(4096)
+                    if not data:
+                        break
+
+                    *lines, buf = (buf + data).split(b'\n')
+                    for line in lines:
+                        self._handle_reply(line.decode())
+
+        finally:
+            self.closed = True
+            self._sock.close()
+            # children still alive are now re-parented to init
+            for zproc in self._procs.values():
+                zproc._orphan()
+            self._procs.clear()
+
+            # the zygote exits as soon as its socket closes
+            with trio.CancelScope(shield=True):
+                await proc.wait()
+
+            log.info(f"Zygote {proc} terminated")
+            self._done.set()
+
+    def _handle_reply(self, line: str) -> None:
+        kind, _, value = line.partition(' ')
+        if kind == 'pid':
+            zproc = self._procs[int(value)] = ZygoteProcess(self, int(value))
+            self._send_reply.send_nowait(zproc)
+
+        elif kind == 'exit':
+            pid, code = map(int, value.split())
+            zproc = self._procs.pop(pid, None)
+            if zproc:
+                zproc._exited(code)
+
+        elif kind == 'error':
+            self._send_reply.send_nowait(
+                RuntimeError(f"Zygote failed to spawn: {value}"))
+
+    async def spawn(
+        self,
+        uid: Tuple[str, str],
+        loglevel: Optional[str],
+        parent_addr: Tuple[str, int],
+    ) -> ZygoteProcess:
+        """Fork a new subactor process.
+        """
+        async with self._lock:
+            if self.closed:
+                raise RuntimeError("Zygote is closed")
+
+            assert self._sock
+            # the reply must be consumed by the request which caused it
+            with trio.CancelScope(shield=True):
+                msg = repr((uid, loglevel, parent_addr)).encode() + b'\n'
+                while msg:
+                    sent = await self._sock.send(msg)
+                    msg = msg[sent:]
+
+                try:
+                    reply = await self._recv_reply.receive()
+                except trio.EndOfChannel:
+                    raise RuntimeError("Zygote terminated") from None
+
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+    async def aclose(self) -> None:
+        """Stop the zygote; already forked processes keep running.
+        """
+        if not self.closed and self._sock:
+            self._sock.shutdown(socket.SHUT_WR)
+
+        await self._done.wait()
+
+
+async def get_zygote(actor: 'Actor') -> Zygote:  # type: ignore # noqa
+    """Return the zygote used by ``actor`` to spawn subactors, starting
+    it on first use.
+    """
+    from . import _spawn
+
+    async with actor._zygote_lock:
+        if actor._zygote is None or actor._zygote.closed:
+            actor._zygote = await actor._root_n.start(
+                Zygote(_spawn._zygote_preload).run)
+
+    return actor._zygote
+
+
+def _child_main(
+    sock: socket.socket,
+    wakeup_fds: Tuple[int, int],
+    uid: Tuple[str, str],
+    loglevel: Optional[str],
+    parent_addr: Tuple[str, int],
+) -> None:
+    """Boot the actor runtime in a freshly forked child (never returns).
+    """
+    code = 0
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # don't inherit the zygote's ignored ctrl-c; start out like an
+        # exec-ed child and let the runtime set up its own handling
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        sock.close()
+        for fd in wakeup_fds:
+            os.close(fd)
+
+        from ._actor import Actor
+        from ._entry import _trio_main
+
+        subactor = Actor(
+            uid[0],
+            uid=uid[1],
+            loglevel=loglevel,
+            spawn_method="zygote",
+        )
+        _trio_main(subactor, parent_addr=parent_addr)
+
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def _reap(sock: socket.socket) -> None:
+    """Report the exit codes of all terminated children.
+    """
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+
+        if not pid:
+            return
+
+        if os.WIFSIGNALED(status):
+            code = -os.WTERMSIG(status)
+        else:
+            code = os.WEXITSTATUS(status)
+
+        try:
+            sock.sendall(f"exit {pid} {code}\n".encode())
+        except OSError:
+            pass
+
+
+def _serve(sock: socket.socket) -> None:
+    """Fork a subactor per request received on ``sock`` until it closes.
+    """
+    # SIGCHLD wakes the loop through this pipe to reap children
+    wakeup_fds = rfd, wfd = os.pipe()
+    os.set_blocking(wfd, False)
+    signal.set_wakeup_fd(wfd)
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+
+    buf = b''
+    while True:
+        ready, _, _ = select.select([sock, rfd], [], [])
+        if rfd in ready:
+            os.read(rfd, 4096)
+            _reap(sock)
+
+        if sock not in ready:
+            continue
+
+        data = sock.recv(4096)
+        if not data:
+            return
+
+        *lines, buf = (buf + data).split(b'\n')
+        for line in lines:
+            uid, loglevel, parent_addr = literal_eval(line.decode())
+            try:
+                pid = os.fork()
+            except OSError as err:
+                sock.sendall(f"error {err}\n".encode())
+                continue
+
+            if pid == 0:
+                _child_main(sock, wakeup_fds, uid, loglevel, parent_addr)
+
+            sock.sendall(f"pid {pid}\n".encode())
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fd", type=int)
+    parser.add_argument("preload", nargs='*')
+    args = parser.parse_args()
+
+    # pre-import the runtime such that forked children don't have to
+    import tractor  # noqa
+    from . import _spawn
+
+    # our children spawn through their own zygotes
+    _spawn.try_set_start_method('zygote')
+    _spawn._zygote_preload = args.preload
+
+    for modpath in args.preload:
+        try:
+            importlib.import_module(modpath)
+        except Exception:
+            log.exception(f"Zygote failed to preload {modpath}")
+
+    # the parent owns the terminal's signals
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    with socket.socket(fileno=args.fd) as sock:
+        _serve(sock)
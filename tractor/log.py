@@ -4,9 +4,9 @@ Log like a forester!
 import sys
 from functools import partial
 import logging
-import colorlog  # type: ignore
 from typing import Optional
 
+from . import _state
 from ._state import ActorContextInfo
 
 
@@ -49,6 +49,17 @@ BOLD_PALETTE = {
         level: f"bold_{color}" for level, color in STD_PALETTE.items()}
 }
 
+# Runtime "hot path" (per msg) logging is written as,
+#
+#     if _state._log_hot_path:
+#         log.debug("Delivering %s to %s", msg, cid)
+#
+# such that when debug records aren't emitted each call costs a single
+# attribute lookup; the msg is never formatted and the dynamic
+# actor/task name lookups (``ActorContextInfo``) aren't done. The flag
+# is set from the level passed to ``get_console_log()`` which every
+# actor (including subactors, via their ``loglevel``) calls at startup.
+
 
 def get_logger(
     name: str = None,
@@ -82,6 +93,28 @@ def get_logger(
     return logger
 
 
+class ColoredFormatter(logging.Formatter):
+    """Format records using ``colorlog`` which is only imported once the
+    first record is emitted; most actors never emit one at the default
+    level.
+    """
+    _formatter: Optional[logging.Formatter] = None
+
+    def format(self, record: logging.LogRecord) -> str:
+        if self._formatter is None:
+            import colorlog  # type: ignore
+
+            self._formatter = colorlog.ColoredFormatter(
+                LOG_FORMAT,
+                datefmt=DATE_FORMAT,
+                log_colors=STD_PALETTE,
+                secondary_log_colors=BOLD_PALETTE,
+                style='{',
+            )
+
+        return self._formatter.format(record)
+
+
 def get_console_log(
     level: str = None,
     **kwargs,
@@ -97,20 +130,14 @@ def get_console_log(
         return log
 
     log.setLevel(level.upper() if not isinstance(level, int) else level)
+    _state._log_hot_path = logger.isEnabledFor(logging.DEBUG)
 
     if not any(
         handler.stream == sys.stderr  # type: ignore
         for handler in logger.handlers if getattr(handler, 'stream', None)
     ):
         handler = logging.StreamHandler()
-        formatter = colorlog.ColoredFormatter(
-            LOG_FORMAT,
-            datefmt=DATE_FORMAT,
-            log_colors=STD_PALETTE,
-            secondary_log_colors=BOLD_PALETTE,
-            style='{',
-        )
-        handler.setFormatter(formatter)
+        handler.setFormatter(ColoredFormatter())
         logger.addHandler(handler)
 
     return log